@@ -169,6 +169,12 @@ class AnimationHelper():
 
     def get_frames_per_second(self, roots):
         """Scan all blocks and return a reasonable number for FPS."""
+        return self.get_frames_per_second_from_key_times(self.get_key_times(roots))
+
+    @staticmethod
+    def get_key_times(roots):
+        """Return the times of all keys in the given trees. Only reads the
+        pyffi data, so this can run on a worker thread."""
         # find all key times
         key_times = []
         for root in roots:
@@ -191,6 +197,11 @@ class AnimationHelper():
             for uvdata in root.tree(block_type=NifFormat.NiUVData):
                 for uvgroup in uvdata.uv_groups:
                     key_times.extend(key.time for key in uvgroup.keys)
+        return key_times
+
+    @staticmethod
+    def get_frames_per_second_from_key_times(key_times):
+        """Return a reasonable number for FPS, given the times of all keys."""
         # not animated, return a reasonable default
         if not key_times:
             return 30
@@ -229,23 +229,19 @@ class Armature():
                         # to the armature
                         # so let's find that bone!
                         nif_bone_name = self.nif_export.objecthelper.get_full_name(parent_bone_name)
-                        for bone_block in self.nif_export.dict_blocks:
-                            if isinstance(bone_block, NifFormat.NiNode) and \
-                                bone_block.name.decode() == nif_bone_name:
-                                # ok, we should parent to block
-                                # instead of to parent_block
-                                # two problems to resolve:
-                                #   - blender bone matrix is not the exported
-                                #     bone matrix!
-                                #   - blender objects parented to bone have
-                                #     extra translation along the Y axis
-                                #     with length of the bone ("tail")
-                                # this is handled in the get_object_srt function
-                                self.nif_export.objecthelper.export_node(b_obj_child, 'localspace',
-                                                 bone_block, b_obj_child.name)
-                                break
-                        else:
-                            assert(False) # BUG!
+                        bone_blocks = self.nif_export.objecthelper.get_named_nodes(nif_bone_name)
+                        assert(bone_blocks) # BUG!
+                        # ok, we should parent to block
+                        # instead of to parent_block
+                        # two problems to resolve:
+                        #   - blender bone matrix is not the exported
+                        #     bone matrix!
+                        #   - blender objects parented to bone have
+                        #     extra translation along the Y axis
+                        #     with length of the bone ("tail")
+                        # this is handled in the get_object_srt function
+                        self.nif_export.objecthelper.export_node(b_obj_child, 'localspace',
+                                         bone_blocks[0], b_obj_child.name)
                             
                             
     def get_bone_rest_matrix(self, bone, space, extra = True, tail = False):
@@ -39,8 +39,11 @@
 
 import bpy
 import mathutils
+import numpy
 
 from pyffi.formats.nif import NifFormat
+from io_scene_nif.geometrysys import bounding_volume
+from io_scene_nif.geometrysys.mesh_partition import MeshPartition
 from io_scene_nif.utility import nif_utils
 from io_scene_nif.utility.nif_logging import NifLog
 from io_scene_nif.utility.nif_global import NifOp
@@ -308,15 +311,11 @@ class bhkshape_export():
         if not b_obj.data.vertices:
             NifLog.warn("Skipping collision object {0} without vertices.".format(b_obj))
             return None
-        b_vertlist = [vert.co for vert in b_obj.data.vertices]
-
-        minx = min([b_vert[0] for b_vert in b_vertlist])
-        miny = min([b_vert[1] for b_vert in b_vertlist])
-        minz = min([b_vert[2] for b_vert in b_vertlist])
-        maxx = max([b_vert[0] for b_vert in b_vertlist])
-        maxy = max([b_vert[1] for b_vert in b_vertlist])
-        maxz = max([b_vert[2] for b_vert in b_vertlist])
-        
+        b_coords = MeshPartition.foreach_get(b_obj.data.vertices, "co", numpy.float32, 3)
+        minimum, maximum = bounding_volume.get_bounding_box(b_coords)
+        minx, miny, minz = minimum.tolist()
+        maxx, maxy, maxz = maximum.tolist()
+
         calc_bhkshape_radius = (maxx - minx + maxy - miny + maxz - minz) / (6.0 * self.HAVOK_SCALE)
         if(b_obj.game.radius - calc_bhkshape_radius > NifOp.props.epsilon):
             radius = calc_bhkshape_radius
@@ -385,14 +384,10 @@ class bhkshape_export():
 
         elif b_obj.game.collision_bounds_type in {'CYLINDER', 'CAPSULE'}:
             # take average radius and calculate end points
-            localradius = (maxx + maxy - minx - miny) / 4.0
+            first_point, second_point, localradius = bounding_volume.get_capsule(b_coords)
             transform = b_obj.matrix_local.transposed()
-            vert1 = mathutils.Vector( [ (maxx + minx)/2.0,
-                                       (maxy + miny)/2.0,
-                                       maxz - localradius ] )
-            vert2 = mathutils.Vector( [ (maxx + minx) / 2.0,
-                                       (maxy + miny) / 2.0,
-                                       minz + localradius ] )
+            vert1 = mathutils.Vector(first_point.tolist())
+            vert2 = mathutils.Vector(second_point.tolist())
             vert1 = vert1 * transform
             vert2 = vert2 * transform
 
@@ -512,14 +507,11 @@ class bound_export():
     def export_bounding_box(self, b_obj, block_parent, bsbound=False):
         """Export a Morrowind or Oblivion bounding box."""
         # calculate bounding box extents
-        b_vertlist = [vert.co for vert in b_obj.data.vertices]
-
-        minx = min([b_vert[0] for b_vert in b_vertlist])
-        miny = min([b_vert[1] for b_vert in b_vertlist])
-        minz = min([b_vert[2] for b_vert in b_vertlist])
-        maxx = max([b_vert[0] for b_vert in b_vertlist])
-        maxy = max([b_vert[1] for b_vert in b_vertlist])
-        maxz = max([b_vert[2] for b_vert in b_vertlist])
+        b_coords = MeshPartition.foreach_get(b_obj.data.vertices, "co", numpy.float32, 3)
+        minimum, maximum = bounding_volume.get_bounding_box(b_coords)
+        minx, miny, minz = minimum.tolist()
+        maxx, maxy, maxz = maximum.tolist()
+        center_x, center_y, center_z = ((minimum + maximum) * 0.5).tolist()
 
         if bsbound:
             n_bbox = self.nif_export.objecthelper.create_block("BSBound")
@@ -546,9 +538,9 @@ class bound_export():
             # set name, flags, translation, and radius
             n_bbox.name = "Bounding Box"
             n_bbox.flags = 4
-            n_bbox.translation.x = (minx + maxx) * 0.5 + b_obj.location[0]
-            n_bbox.translation.y = (minx + maxx) * 0.5 + b_obj.location[1]
-            n_bbox.translation.z = (minx + maxx) * 0.5 + b_obj.location[2]
+            n_bbox.translation.x = center_x + b_obj.location[0]
+            n_bbox.translation.y = center_y + b_obj.location[1]
+            n_bbox.translation.z = center_z + b_obj.location[2]
             n_bbox.rotation.set_identity()
             n_bbox.has_bounding_box = True
 
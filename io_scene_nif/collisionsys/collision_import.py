@@ -45,6 +45,8 @@ import operator
 
 from pyffi.formats.nif import NifFormat
 from pyffi.utils.quickhull import qhull3d
+from io_scene_nif.geometrysys.mesh_builder import MeshBuilder
+from io_scene_nif.geometrysys.topology import build_polygons
 from io_scene_nif.objectsys.object_import import NiObject
 from io_scene_nif.utility.nif_logging import NifLog
 from io_scene_nif.utility.nif_global import NifOp
@@ -628,46 +630,10 @@ class poly_gen():
     def __init__(self, parent):
         self.nif_import = parent
 
-    def col_poly_gen(self, poly_gens):
-        f_map = [None]*len(poly_gens)
-        b_f_index = len(self.polygons)
-        bf2_index = len(self.polygons)
-        bl_index = len(self.loops)
-        poly_count = len(poly_gens)
-        self.polygons.add(poly_count)
-        llp_count_list = list()
-        for l_count in poly_gens:
-            for lp_count in l_count:
-                llp_count_list.append(lp_count)
-        self.loops.add(len(llp_count_list))
-        num_new_faces = 0 # counter for debugging
-        unique_faces = list() # to avoid duplicate polygons
-        tri_point_list = list()
-        for i, f in enumerate(poly_gens):
-            # get face index
-            f_verts = [vert_index for vert_index in f]
-            if tuple(f_verts) in unique_faces:
-                continue
-            unique_faces.append(tuple(f_verts))
-            f_map[i] = b_f_index
-            tri_point_list.append(len(poly_gens[i]))
-            ls_list = list()
-            b_f_index += 1
-            num_new_faces += 1
-        for ls1 in range(0, num_new_faces * (tri_point_list[len(ls_list)]), (tri_point_list[len(ls_list)])):
-            ls_list.append((ls1 + bl_index))
-        for i in range(len(unique_faces)):
-            if f_map[i] is None:
-                continue
-            self.polygons[f_map[i]].loop_start = ls_list[(f_map[i] - bf2_index)]
-            self.polygons[f_map[i]].loop_total = len(unique_faces[(f_map[i] - bf2_index)])
-            l = 0
-            lp_points = [loop_point for loop_point in poly_gens[(f_map[i] - bf2_index)]]
-            while l < (len(poly_gens[(f_map[i] - bf2_index)])):
-                self.loops[(l + (bl_index))].vertex_index = lp_points[l]
-                l += 1
-            bl_index += (len(poly_gens[(f_map[i] - bf2_index)]))            
-        return self
-    
-    
-    
+    @staticmethod
+    def col_poly_gen(b_mesh, poly_gens):
+        """Add polygons to a collision mesh, skipping degenerate and
+        duplicate polygons, and return the mesh."""
+        _, b_loop_vertices, b_loop_totals = build_polygons(poly_gens)
+        MeshBuilder(b_mesh).add_polygons(b_loop_vertices, b_loop_totals)
+        return b_mesh
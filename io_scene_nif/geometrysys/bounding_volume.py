@@ -0,0 +1,144 @@
+"""This script contains helper methods to compute bounding volumes of vertex coordinates."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+
+import numpy
+
+
+def _as_coords(coords):
+    """Get coordinates as rows of (x, y, z) floats."""
+    return numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+
+
+def get_bounding_box(coords):
+    """Get the axis aligned bounding box of vertex coordinates.
+
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :return: The minimum and the maximum corner of the box, which are both
+        zero if there are no coordinates.
+    :rtype: :class:`tuple`
+    """
+    coords = _as_coords(coords)
+    if not len(coords):
+        return numpy.zeros(3), numpy.zeros(3)
+    return coords.min(axis=0), coords.max(axis=0)
+
+
+def get_box_sphere(coords):
+    """Get the bounding sphere of vertex coordinates around the center of
+    their bounding box, as PyFFI's ``update_center_radius`` computes it.
+
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :return: The center and the radius.
+    :rtype: :class:`tuple`
+    """
+    coords = _as_coords(coords)
+    minimum, maximum = get_bounding_box(coords)
+    center = (minimum + maximum) * 0.5
+    if not len(coords):
+        return center, 0.0
+    return center, float(numpy.sqrt(((coords - center) ** 2).sum(axis=1).max()))
+
+
+def get_ritter_sphere(coords):
+    """Get the bounding sphere of vertex coordinates with Ritter's
+    algorithm: start with the sphere through two distant vertices, and grow
+    it towards the farthest vertex outside it, until it holds all vertices.
+
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :return: The center and the radius.
+    :rtype: :class:`tuple`
+    """
+    coords = _as_coords(coords)
+    if not len(coords):
+        return numpy.zeros(3), 0.0
+    # a vertex far from the first one, and a vertex far from that one
+    first = coords[((coords - coords[0]) ** 2).sum(axis=1).argmax()]
+    second = coords[((coords - first) ** 2).sum(axis=1).argmax()]
+    center = (first + second) * 0.5
+    radius = float(numpy.sqrt(((second - first) ** 2).sum())) * 0.5
+    while True:
+        dists = numpy.sqrt(((coords - center) ** 2).sum(axis=1))
+        farthest = dists.argmax()
+        dist = float(dists[farthest])
+        if dist <= radius * (1.0 + 1e-6):
+            # the largest distance is the exact radius of the final center
+            return center, dist
+        # move the sphere towards the vertex, just enough to hold it
+        new_radius = (radius + dist) * 0.5
+        center = center + (coords[farthest] - center) * ((new_radius - radius) / dist)
+        radius = new_radius
+
+
+def get_bounding_sphere(coords):
+    """Get the smaller of the bounding sphere around the center of the
+    bounding box, and the bounding sphere of Ritter's algorithm.
+
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :return: The center and the radius.
+    :rtype: :class:`tuple`
+    """
+    box_center, box_radius = get_box_sphere(coords)
+    center, radius = get_ritter_sphere(coords)
+    if box_radius <= radius:
+        return box_center, box_radius
+    return center, radius
+
+
+def get_capsule(coords):
+    """Fit a capsule along the z axis to vertex coordinates. Its radius is
+    the average of the half extents of the bounding box in x and y, and its
+    end points are on the axis of the box, one radius inside its top and
+    bottom.
+
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :return: The top and bottom end points, and the radius.
+    :rtype: :class:`tuple`
+    """
+    minimum, maximum = get_bounding_box(coords)
+    radius = float(maximum[0] + maximum[1] - minimum[0] - minimum[1]) / 4.0
+    center = (minimum + maximum) / 2.0
+    first_point = numpy.array([center[0], center[1], maximum[2] - radius])
+    second_point = numpy.array([center[0], center[1], minimum[2] + radius])
+    return first_point, second_point, radius
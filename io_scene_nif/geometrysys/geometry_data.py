@@ -0,0 +1,259 @@
+"""This script contains helper methods to transfer arrays to and from NiGeometryData blocks."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+
+def _check_rows(n_data, rows, name):
+    """Raise a ValueError if the number of rows does not match the number of
+    vertices of the geometry data.
+    """
+    if len(rows) != n_data.num_vertices:
+        raise ValueError("expected {0} {1}, got {2}".format(
+            n_data.num_vertices, name, len(rows)))
+
+
+# pyffi has no bulk setter for arrays of structs, so the values are copied
+# one by one; but rather than through the attribute properties, which call
+# set_value on the basic instance that pyffi keeps as _<name>_value_ for
+# every attribute, the values are stored directly on those instances, which
+# is about ten times faster. set_value only converts to float, and rows
+# which come from float64 arrays through tolist are floats already. Structs
+# which do not keep their values that way are set through their attributes.
+
+def _has_value_instances(n_items, names):
+    """Whether the structs of an array keep the basic instance of every
+    named attribute as _<name>_value_; judged by the first struct."""
+    for n_item in n_items:
+        return all(hasattr(n_item, "_{0}_value_".format(name)) for name in names)
+    return True
+
+
+def _set_attributes(n_items, rows, names):
+    """Copy rows of values into a sized array of structs, through the
+    public attributes."""
+    for n_item, row in zip(n_items, rows):
+        for name, value in zip(names, row):
+            setattr(n_item, name, value)
+
+
+def _set_vectors(n_vectors, vectors):
+    """Copy rows of (x, y, z) values into a sized array of vectors."""
+    if not _has_value_instances(n_vectors, ("x", "y", "z")):
+        _set_attributes(n_vectors, vectors.tolist(), ("x", "y", "z"))
+        return
+    for n_vec, (x, y, z) in zip(n_vectors, vectors.tolist()):
+        n_vec._x_value_._value = x
+        n_vec._y_value_._value = y
+        n_vec._z_value_._value = z
+
+
+def set_vertices(n_data, coords):
+    """Set the vertex count, the vertex flag and all vertex coordinates of
+    the geometry data.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    """
+    coords = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+    n_data.num_vertices = len(coords)
+    n_data.has_vertices = True
+    n_data.vertices.update_size()
+    _set_vectors(n_data.vertices, coords)
+
+
+def set_bounding_sphere(n_data, center, radius):
+    """Set the center and the radius of the geometry data.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param center: The (x, y, z) center.
+    :type center: :class:`numpy.ndarray`
+    :param radius: The radius.
+    :type radius: :class:`float`
+    """
+    n_data.center.x, n_data.center.y, n_data.center.z = numpy.asarray(
+        center, dtype=numpy.float64).tolist()
+    n_data.radius = radius
+
+
+def set_normals(n_data, normals):
+    """Set the normal flag and all normals of the geometry data. The
+    vertices must have been set already.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param normals: The normals, one (x, y, z) row per vertex.
+    :type normals: :class:`numpy.ndarray`
+    """
+    normals = numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)
+    _check_rows(n_data, normals, "normals")
+    n_data.has_normals = True
+    n_data.normals.update_size()
+    _set_vectors(n_data.normals, normals)
+
+
+def set_tangent_space(n_data, tangents, bitangents):
+    """Set the tangent space flag and all tangents and bitangents of the
+    geometry data, as stored by Fallout 3 and later games. The
+    normals must have been set already.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param tangents: The tangents, one (x, y, z) row per vertex.
+    :type tangents: :class:`numpy.ndarray`
+    :param bitangents: The bitangents, one (x, y, z) row per vertex.
+    :type bitangents: :class:`numpy.ndarray`
+    """
+    tangents = numpy.asarray(tangents, dtype=numpy.float64).reshape(-1, 3)
+    bitangents = numpy.asarray(bitangents, dtype=numpy.float64).reshape(-1, 3)
+    _check_rows(n_data, tangents, "tangents")
+    _check_rows(n_data, bitangents, "bitangents")
+    n_data.extra_vectors_flags = 16
+    n_data.tangents.update_size()
+    n_data.bitangents.update_size()
+    _set_vectors(n_data.tangents, tangents)
+    _set_vectors(n_data.bitangents, bitangents)
+
+
+def set_vertex_colors(n_data, colors):
+    """Set the vertex color flag and all vertex colors of the geometry data.
+    The vertices must have been set already.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param colors: The colors, one (r, g, b, a) row per vertex.
+    :type colors: :class:`numpy.ndarray`
+    """
+    colors = numpy.asarray(colors, dtype=numpy.float64).reshape(-1, 4)
+    _check_rows(n_data, colors, "vertex colors")
+    n_data.has_vertex_colors = True
+    n_data.vertex_colors.update_size()
+    if not _has_value_instances(n_data.vertex_colors, ("r", "g", "b", "a")):
+        _set_attributes(n_data.vertex_colors, colors.tolist(), ("r", "g", "b", "a"))
+        return
+    for n_vcol, (r, g, b, a) in zip(n_data.vertex_colors, colors.tolist()):
+        n_vcol._r_value_._value = r
+        n_vcol._g_value_._value = g
+        n_vcol._b_value_._value = b
+        n_vcol._a_value_._value = a
+
+
+def set_uv_sets(n_data, uv_sets):
+    """Set the uv set counts, the uv flag and all uv coordinates of the
+    geometry data. The vertices must have been set already. The
+    coordinates are stored as given, so the caller takes care of flipping
+    the v coordinate.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :param uv_sets: The uv coordinates, one array of (u, v) rows per uv set.
+    :type uv_sets: :class:`numpy.ndarray`
+    """
+    uv_sets = numpy.asarray(uv_sets, dtype=numpy.float64).reshape(
+        len(uv_sets), n_data.num_vertices, 2)
+    n_data.num_uv_sets = len(uv_sets)
+    n_data.bs_num_uv_sets = len(uv_sets)
+    n_data.has_uv = True
+    n_data.uv_sets.update_size()
+    for n_uv_set, uv_set in zip(n_data.uv_sets, uv_sets.tolist()):
+        if not _has_value_instances(n_uv_set, ("u", "v")):
+            _set_attributes(n_uv_set, uv_set, ("u", "v"))
+            continue
+        for n_uv, (u, v) in zip(n_uv_set, uv_set):
+            n_uv._u_value_._value = u
+            n_uv._v_value_._value = v
+
+
+def get_vertices(n_data):
+    """Get all vertex coordinates of the geometry data.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :return: The vertex coordinates, one (x, y, z) row per vertex.
+    :rtype: :class:`numpy.ndarray`
+    """
+    return numpy.array([(v.x, v.y, v.z) for v in n_data.vertices],
+                       dtype=numpy.float64).reshape(-1, 3)
+
+
+def get_normals(n_data):
+    """Get all normals of the geometry data.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :return: The normals, one (x, y, z) row per vertex, or ``None`` if the
+        data has no normals.
+    :rtype: :class:`numpy.ndarray`
+    """
+    if not n_data.normals:
+        return None
+    return numpy.array([(n.x, n.y, n.z) for n in n_data.normals],
+                       dtype=numpy.float64).reshape(-1, 3)
+
+
+def get_vertex_colors(n_data):
+    """Get all vertex colors of the geometry data.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :return: The colors, one (r, g, b, a) row per vertex, or ``None`` if the
+        data has no vertex colors.
+    :rtype: :class:`numpy.ndarray`
+    """
+    if not n_data.vertex_colors:
+        return None
+    return numpy.array([(c.r, c.g, c.b, c.a) for c in n_data.vertex_colors],
+                       dtype=numpy.float64).reshape(-1, 4)
+
+
+def get_uv_sets(n_data):
+    """Get all uv coordinates of the geometry data, as stored in the file.
+
+    :param n_data: The geometry data.
+    :type n_data: :class:`pyffi.formats.nif.NifFormat.NiGeometryData`
+    :return: The uv coordinates, one array of (u, v) rows per uv set.
+    :rtype: :class:`numpy.ndarray`
+    """
+    return numpy.array([[(uv.u, uv.v) for uv in n_uv_set]
+                        for n_uv_set in n_data.uv_sets],
+                       dtype=numpy.float64).reshape(
+                           len(n_data.uv_sets), n_data.num_vertices, 2)
@@ -0,0 +1,110 @@
+"""This script contains a process pool to compute export geometry."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import multiprocessing
+import sys
+
+
+class GeometryPool():
+    """Compute the geometry of exported shapes on worker processes, while
+    the main thread goes on walking the scene.
+
+    Every job is a pure function of plain data, extracted from Blender on
+    the main thread. Its result is handed to a finish callback, which
+    attaches it to the block tree. Callbacks run on the main thread, in
+    the order in which the jobs were submitted, when :meth:`finish` is
+    called::
+
+        pool = GeometryPool()
+        try:
+            for ...:
+                pool.submit(build_tri_geometry, args, attach_geometry)
+            pool.finish()
+        finally:
+            pool.shutdown()
+
+    Worker processes are forked, as they cannot import bpy by themselves,
+    and they are only started on the first :meth:`submit`, so exports
+    without any geometry do not pay for them. Forking a process which
+    runs system frameworks is only safe on Linux: elsewhere, or if
+    processes is 0, jobs are computed and finished right away on the main
+    thread.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self.pool = None
+        self.jobs = []
+
+    def has_workers(self):
+        """Whether jobs are computed on worker processes.
+
+        :rtype: :class:`bool`
+        """
+        return self.processes != 0 and sys.platform.startswith("linux")
+
+    def submit(self, compute, args, finish):
+        """Start ``compute(*args)``, and queue ``finish(result)``.
+
+        :param compute: A picklable function.
+        :param args: The picklable arguments of compute.
+        :type args: :class:`tuple`
+        :param finish: Called on the main thread with the result.
+        """
+        if not self.has_workers():
+            finish(compute(*args))
+        else:
+            if self.pool is None:
+                self.pool = multiprocessing.get_context("fork").Pool(self.processes)
+            self.jobs.append((self.pool.apply_async(compute, args), finish))
+
+    def finish(self):
+        """Wait for all jobs, and call their finish callbacks in order.
+        Exceptions raised by a job are raised again here."""
+        jobs, self.jobs = self.jobs, []
+        for result, finish in jobs:
+            finish(result.get())
+
+    def shutdown(self):
+        """Stop the worker processes, dropping any unfinished jobs."""
+        self.jobs = []
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
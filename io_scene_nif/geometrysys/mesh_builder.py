@@ -0,0 +1,202 @@
+"""This script contains helper methods to build Blender meshes in bulk."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_weld import inverse_map
+
+
+class MeshBuilder():
+    """Appends geometry to a Blender mesh in bulk. Every element type is
+    grown with a single ``add`` call, and every attribute is written with a
+    single ``foreach_set`` pass, rather than adding and setting elements one
+    at a time.
+    """
+
+    def __init__(self, b_mesh):
+        self.b_mesh = b_mesh
+
+    @staticmethod
+    def transform_coords(coords, transform):
+        """Transform an array of coordinates the same way as
+        ``vector * transform`` does for a single mathutils vector.
+
+        :param coords: The coordinates, one row per vertex.
+        :type coords: :class:`numpy.ndarray`
+        :param transform: The 4x4 transformation matrix.
+        :type transform: :class:`mathutils.Matrix`
+        :return: The transformed coordinates, one row per vertex.
+        :rtype: :class:`numpy.ndarray`
+        """
+        n_mat = numpy.array(transform, dtype=numpy.float64)
+        return numpy.dot(coords, n_mat[:3, :3]) + n_mat[3, :3]
+
+    @staticmethod
+    def foreach_update(collection, attr, start, values, dtype, width=1):
+        """Set an attribute on all elements of a bpy collection from index
+        start onwards, in a single ``foreach_set`` call.
+
+        Blender can only set an attribute on the whole collection at once,
+        so values of the elements before start are read back first.
+
+        :param collection: The bpy collection, for instance ``b_mesh.loops``.
+        :param attr: Name of the attribute to set.
+        :type attr: :class:`str`
+        :param start: Index of the first element to set.
+        :type start: :class:`int`
+        :param values: The new values, ``width`` per element.
+        :param dtype: The numpy type of the attribute.
+        :param width: Number of values per element.
+        :type width: :class:`int`
+        """
+        buf = numpy.empty(len(collection) * width, dtype=dtype)
+        if start:
+            collection.foreach_get(attr, buf)
+        buf[start * width:] = numpy.asarray(values, dtype=dtype).ravel()
+        collection.foreach_set(attr, buf)
+
+    @staticmethod
+    def foreach_assign(collection, attr, indices, values, dtype, width=1):
+        """Set an attribute on the elements of a bpy collection at the given
+        indices, in a single ``foreach_set`` call. Other elements keep their
+        values.
+
+        :param collection: The bpy collection, for instance ``b_mesh.loops``.
+        :param attr: Name of the attribute to set.
+        :type attr: :class:`str`
+        :param indices: Indices of the elements to set.
+        :param values: The new values, one row of ``width`` per element.
+        :param dtype: The numpy type of the attribute.
+        :param width: Number of values per element.
+        :type width: :class:`int`
+        """
+        buf = numpy.empty((len(collection), width), dtype=dtype)
+        collection.foreach_get(attr, buf.ravel())
+        buf[indices] = numpy.asarray(values, dtype=dtype).reshape(-1, width)
+        collection.foreach_set(attr, buf.ravel())
+
+    def get_loop_vertices(self):
+        """Return the vertex index of every loop of the mesh.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        b_loops = self.b_mesh.loops
+        loop_vertices = numpy.empty(len(b_loops), dtype=numpy.int32)
+        b_loops.foreach_get("vertex_index", loop_vertices)
+        return loop_vertices
+
+    @staticmethod
+    def set_shape_key(b_key, coords, v_map):
+        """Set the coordinates of a shape key in a single ``foreach_set``
+        call. Vertex v_map[i] of the key gets coordinates coords[i]; if
+        several vertices map to the same key vertex, the last one is used.
+        Extra coordinates or map entries are ignored.
+
+        :param b_key: The shape key block.
+        :type b_key: :class:`bpy.types.ShapeKey`
+        :param coords: The coordinates, one row per vertex.
+        :type coords: :class:`numpy.ndarray`
+        :param v_map: The vertex map.
+        """
+        num_verts = min(len(coords), len(v_map))
+        inverse = inverse_map(v_map[:num_verts], len(b_key.data))
+        b_v_indices = numpy.flatnonzero(inverse >= 0)
+        MeshBuilder.foreach_assign(b_key.data, "co", b_v_indices,
+                                   coords[inverse[b_v_indices]], numpy.float32, 3)
+
+    def add_vertices(self, coords):
+        """Append vertices to the mesh.
+
+        :param coords: The vertex coordinates, one (x, y, z) row per vertex.
+        :return: Index of the first added vertex.
+        :rtype: :class:`int`
+        """
+        b_vertices = self.b_mesh.vertices
+        start = len(b_vertices)
+        coords = numpy.asarray(coords, dtype=numpy.float32).reshape(-1, 3)
+        if len(coords):
+            b_vertices.add(len(coords))
+            self.foreach_update(b_vertices, "co", start, coords, numpy.float32, 3)
+        return start
+
+    def add_polygons(self, loop_vertices, loop_totals):
+        """Append polygons, and their loops, to the mesh.
+
+        :param loop_vertices: Blender vertex index of every new loop, in
+            polygon order.
+        :param loop_totals: Number of loops of every new polygon.
+        :return: Index of the first added polygon.
+        :rtype: :class:`int`
+        """
+        b_polygons = self.b_mesh.polygons
+        b_loops = self.b_mesh.loops
+        poly_start = len(b_polygons)
+        loop_start = len(b_loops)
+        loop_totals = numpy.asarray(loop_totals, dtype=numpy.int32)
+        if not len(loop_totals):
+            return poly_start
+        loop_starts = numpy.empty_like(loop_totals)
+        loop_starts[0] = loop_start
+        loop_starts[1:] = loop_start + numpy.cumsum(loop_totals[:-1])
+        b_loops.add(int(loop_totals.sum()))
+        b_polygons.add(len(loop_totals))
+        self.foreach_update(b_loops, "vertex_index", loop_start, loop_vertices, numpy.int32)
+        self.foreach_update(b_polygons, "loop_start", poly_start, loop_starts, numpy.int32)
+        self.foreach_update(b_polygons, "loop_total", poly_start, loop_totals, numpy.int32)
+        return poly_start
+
+    def set_polygon_attributes(self, start, use_smooth, material_index):
+        """Set smoothing and material index on all polygons from index start
+        onwards.
+
+        :param start: Index of the first polygon to set.
+        :type start: :class:`int`
+        :param use_smooth: Whether the polygons are smooth shaded.
+        :type use_smooth: :class:`bool`
+        :param material_index: The material slot of the polygons.
+        :type material_index: :class:`int`
+        """
+        b_polygons = self.b_mesh.polygons
+        count = len(b_polygons) - start
+        if count <= 0:
+            return
+        self.foreach_update(b_polygons, "use_smooth", start,
+                            numpy.full(count, use_smooth, dtype=bool), bool)
+        self.foreach_update(b_polygons, "material_index", start,
+                            numpy.full(count, material_index, dtype=numpy.int32), numpy.int32)
@@ -0,0 +1,194 @@
+"""This script contains helper methods to read a mesh in bulk for export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+
+class MeshPartition():
+    """Reads the polygons, loops and vertices of a Blender mesh with a
+    single ``foreach_get`` pass per attribute, and buckets the polygons by
+    material, so that exporting one shape per material does not walk the
+    whole mesh for every material.
+
+    The attributes are stored as numpy arrays, one row per element. The
+    loops of a material are cut out by :meth:`get_slice`.
+    """
+
+    def __init__(self, b_mesh):
+        self.b_mesh = b_mesh
+        b_polygons = b_mesh.polygons
+        b_loops = b_mesh.loops
+        b_vertices = b_mesh.vertices
+
+        self.material_indices = self.foreach_get(b_polygons, "material_index", numpy.int32)
+        self.loop_starts = self.foreach_get(b_polygons, "loop_start", numpy.int32)
+        self.loop_totals = self.foreach_get(b_polygons, "loop_total", numpy.int32)
+        self.use_smooth = self.foreach_get(b_polygons, "use_smooth", bool)
+        self.poly_normals = self.foreach_get(b_polygons, "normal", numpy.float32, 3)
+        self.loop_vertices = self.foreach_get(b_loops, "vertex_index", numpy.int32)
+        self.vertex_coords = self.foreach_get(b_vertices, "co", numpy.float32, 3)
+        self.vertex_normals = self.foreach_get(b_vertices, "normal", numpy.float32, 3)
+        self.material_polygons = None
+        self.uv_layers = {}
+        self.alpha = None
+        self.colors = None
+
+    @staticmethod
+    def foreach_get(collection, attr, dtype, width=1):
+        """Read an attribute of all elements of a bpy collection.
+
+        :param collection: The bpy collection, for instance ``b_mesh.loops``.
+        :param attr: Name of the attribute to read.
+        :type attr: :class:`str`
+        :param dtype: The numpy type of the attribute.
+        :param width: Number of values per element.
+        :type width: :class:`int`
+        :return: The values, one row of ``width`` per element if width > 1.
+        :rtype: :class:`numpy.ndarray`
+        """
+        buf = numpy.empty(len(collection) * width, dtype=dtype)
+        if len(buf):
+            collection.foreach_get(attr, buf)
+        if width > 1:
+            buf = buf.reshape(-1, width)
+        return buf
+
+    def get_polygons(self, material_index=None):
+        """Return the indices of the polygons with the given material index,
+        in mesh order, or of all polygons if material_index is ``None``.
+
+        :rtype: :class:`list`
+        """
+        if material_index is None:
+            return list(range(len(self.material_indices)))
+        if self.material_polygons is None:
+            # stable sort keeps mesh order within every material
+            order = numpy.argsort(self.material_indices, kind='mergesort')
+            materials, starts = numpy.unique(self.material_indices[order], return_index=True)
+            self.material_polygons = dict(
+                zip(materials.tolist(), numpy.split(order, starts[1:])))
+        return self.material_polygons.get(material_index, numpy.empty(0, dtype=numpy.int64)).tolist()
+
+    def get_uvs(self, name):
+        """Return the uv coordinates of every loop for the uv layer with the
+        given name, read on first use.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        if name not in self.uv_layers:
+            self.uv_layers[name] = self.foreach_get(
+                self.b_mesh.uv_layers[name].data, "uv", numpy.float32, 2)
+        return self.uv_layers[name]
+
+    def get_alpha(self):
+        """Return the alpha of every loop, which is the value (brightness)
+        of the second vertex color layer, or ``None`` if there is no second
+        layer.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        if self.alpha is None and len(self.b_mesh.vertex_colors) > 1:
+            self.alpha = self.foreach_get(
+                self.b_mesh.vertex_colors[1].data, "color", numpy.float32, 3).max(axis=1)
+        return self.alpha
+
+    def get_colors(self, use_alpha):
+        """Return the (r, g, b, a) vertex color of every loop, read on first
+        use. The color comes from the first vertex color layer, the alpha
+        from :meth:`get_alpha` if use_alpha is ``True``, or 1.0 otherwise.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        if self.colors is None:
+            colors = numpy.ones((len(self.loop_vertices), 4), dtype=numpy.float32)
+            colors[:, :3] = self.foreach_get(
+                self.b_mesh.vertex_colors[0].data, "color", numpy.float32, 3)
+            if use_alpha:
+                colors[:, 3] = self.get_alpha()
+            self.colors = colors
+        return self.colors
+
+    def get_slice(self, polygons, uv_names=(), colors=False, use_alpha=False):
+        """Cut out the given polygons, with their loops, uvs and colors.
+
+        :param polygons: Indices of the polygons.
+        :param uv_names: Names of the uv layers to include.
+        :param colors: Whether to include vertex colors.
+        :type colors: :class:`bool`
+        :param use_alpha: Passed to :meth:`get_colors`.
+        :type use_alpha: :class:`bool`
+        :rtype: :class:`MeshSlice`
+        """
+        polygons = numpy.asarray(polygons, dtype=numpy.int64)
+        loop_starts = self.loop_starts[polygons]
+        loop_totals = self.loop_totals[polygons]
+        # index of every loop of the polygons, polygon after polygon
+        offsets = numpy.cumsum(loop_totals) - loop_totals
+        loops = (numpy.arange(loop_totals.sum(), dtype=numpy.int64)
+                 + numpy.repeat(loop_starts - offsets, loop_totals))
+        return MeshSlice(
+            polygons, loop_totals, self.use_smooth[polygons],
+            self.poly_normals[polygons], self.loop_vertices[loops],
+            self.vertex_coords, self.vertex_normals,
+            [self.get_uvs(name)[loops] for name in uv_names],
+            self.get_colors(use_alpha)[loops] if colors else None)
+
+
+class MeshSlice():
+    """Some polygons of a mesh, with only their own loops, uvs and colors,
+    to be sent to a worker process. Vertex indices refer to all vertices of
+    the mesh, so ``vertex_coords`` and ``vertex_normals`` are not cut.
+
+    ``polygons`` holds the index of every polygon in the mesh, the other
+    polygon attributes are numbered from 0, and the loops of polygon i
+    start at ``loop_starts[i]``.
+    """
+
+    def __init__(self, polygons, loop_totals, use_smooth, poly_normals, loop_vertices,
+                 vertex_coords, vertex_normals, uvs=(), colors=None):
+        self.polygons = numpy.asarray(polygons, dtype=numpy.int64)
+        self.loop_totals = numpy.asarray(loop_totals, dtype=numpy.int64)
+        self.loop_starts = numpy.cumsum(self.loop_totals) - self.loop_totals
+        self.use_smooth = numpy.asarray(use_smooth, dtype=bool)
+        self.poly_normals = numpy.asarray(poly_normals, dtype=numpy.float32).reshape(-1, 3)
+        self.loop_vertices = numpy.asarray(loop_vertices, dtype=numpy.int64)
+        self.vertex_coords = numpy.asarray(vertex_coords, dtype=numpy.float32).reshape(-1, 3)
+        self.vertex_normals = numpy.asarray(vertex_normals, dtype=numpy.float32).reshape(-1, 3)
+        self.uvs = [numpy.asarray(uv, dtype=numpy.float32).reshape(-1, 2) for uv in uvs]
+        self.colors = None if colors is None else numpy.asarray(colors, dtype=numpy.float32).reshape(-1, 4)
@@ -0,0 +1,124 @@
+"""This script contains helper methods to export shape keys as geometry morphs."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+
+def get_vertmap_indices(vertmap):
+    """Flatten a vertex map, which lists for every Blender vertex the NIF
+    vertices it was exported to (or ``None``), into two index arrays.
+
+    :param vertmap: The vertex map.
+    :type vertmap: :class:`list`
+    :return: A pair (b_indices, n_indices), where Blender vertex
+        b_indices[i] was exported to NIF vertex n_indices[i].
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    b_indices = []
+    n_indices = []
+    for b_v_index, vert_indices in enumerate(vertmap):
+        if vert_indices:
+            b_indices.extend([b_v_index] * len(vert_indices))
+            n_indices.extend(vert_indices)
+    return (numpy.array(b_indices, dtype=numpy.int64),
+            numpy.array(n_indices, dtype=numpy.int64))
+
+
+def get_morph_vectors(key_coords, base_coords, vertmap_indices, num_vertices):
+    """Compute the morph vectors of a shape key for all NIF vertices.
+
+    :param key_coords: The shape key coordinates of every Blender vertex.
+    :type key_coords: :class:`numpy.ndarray`
+    :param base_coords: The coordinates to subtract from the shape key
+        coordinates, or ``None`` to export the coordinates as they are
+        (as is done for the base key).
+    :type base_coords: :class:`numpy.ndarray`
+    :param vertmap_indices: The flattened vertex map, as returned by
+        :func:`get_vertmap_indices`.
+    :param num_vertices: The number of NIF vertices.
+    :type num_vertices: :class:`int`
+    :return: The morph vector of every NIF vertex.
+    :rtype: :class:`numpy.ndarray`
+    """
+    b_indices, n_indices = vertmap_indices
+    key_coords = numpy.asarray(key_coords, dtype=numpy.float32).reshape(-1, 3)
+    if base_coords is not None:
+        key_coords = key_coords - numpy.asarray(base_coords, dtype=numpy.float32).reshape(-1, 3)
+    vectors = numpy.zeros((num_vertices, 3), dtype=numpy.float32)
+    vectors[n_indices] = key_coords[b_indices]
+    return vectors
+
+
+def set_morph_vectors(n_morph, vectors):
+    """Set the vector count and all vectors of a morph at once.
+
+    :param n_morph: The morph.
+    :type n_morph: :class:`pyffi.formats.nif.NifFormat.Morph`
+    :param vectors: The morph vectors, one (x, y, z) row per vertex.
+    :type vectors: :class:`numpy.ndarray`
+    """
+    vectors = numpy.asarray(vectors, dtype=numpy.float64).reshape(-1, 3)
+    n_morph.arg = len(vectors)
+    n_morph.vectors.update_size()
+    for n_vec, (x, y, z) in zip(n_morph.vectors, vectors.tolist()):
+        n_vec.x = x
+        n_vec.y = y
+        n_vec.z = z
+
+
+def set_float_keys(n_data, times, values):
+    """Set linear float keys, as found on morphs and float data, at once.
+
+    :param n_data: The morph or float data.
+    :param times: The time of every key.
+    :type times: :class:`numpy.ndarray`
+    :param values: The value of every key.
+    :type values: :class:`numpy.ndarray`
+    """
+    n_data.interpolation = NifFormat.KeyType.LINEAR_KEY
+    n_data.num_keys = len(times)
+    n_data.keys.update_size()
+    for n_key, time, value in zip(n_data.keys,
+                                  numpy.asarray(times, dtype=numpy.float64).tolist(),
+                                  numpy.asarray(values, dtype=numpy.float64).tolist()):
+        n_key.arg = n_data.interpolation
+        n_key.time = time
+        n_key.value = value
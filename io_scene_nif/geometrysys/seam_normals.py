@@ -0,0 +1,97 @@
+"""This script contains helper methods to smooth normals across seams between meshes."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_weld import quantize, unique_rows
+
+
+def _group_sum(groups, values, num_groups):
+    """Sum the rows of values per group."""
+    return numpy.column_stack([
+        numpy.bincount(groups, weights=values[:, i], minlength=num_groups)
+        for i in range(values.shape[1])])
+
+
+def _normalize(vectors):
+    """Normalize all rows, leaving zero rows untouched."""
+    lengths = numpy.sqrt(numpy.einsum("ij,ij->i", vectors, vectors))
+    lengths[lengths == 0] = 1.0
+    return vectors / lengths[:, None]
+
+
+def get_seam_normals(coords, mesh_indices, normals, resolution, tolerance=0.2):
+    """Compute smooth normals for loops whose vertex position is shared with
+    a loop of another mesh. Positions are hashed on their coordinates
+    quantized with the given resolution. The normal of a shared position is
+    the average of the polygon normals of all its loops, leaving out the
+    polygons whose normal deviates too much from the average.
+
+    :param coords: The vertex coordinates of every loop.
+    :type coords: :class:`numpy.ndarray`
+    :param mesh_indices: The index of the mesh of every loop.
+    :type mesh_indices: :class:`numpy.ndarray`
+    :param normals: The polygon normal of every loop.
+    :type normals: :class:`numpy.ndarray`
+    :param resolution: Number of hash steps per unit of distance.
+    :type resolution: :class:`int`
+    :param tolerance: Polygons whose normal fits the average normal less
+        than the best fitting polygon minus this tolerance are left out.
+    :type tolerance: :class:`float`
+    :return: A triple (is_seam, seam_normals, num_seams), where is_seam
+        tells whether the loop is on a seam, seam_normals is the smooth
+        normal of every loop, and num_seams is the number of shared positions.
+    :rtype: :class:`tuple`
+    """
+    normals = numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)
+    mesh_indices = numpy.asarray(mesh_indices, dtype=numpy.int64)
+    groups, first = unique_rows(quantize(coords, resolution).reshape(-1, 3))
+    num_groups = len(first)
+    # a position is a seam if loops of more than one mesh share it
+    mesh_groups = groups[unique_rows(numpy.column_stack((groups, mesh_indices)))[1]]
+    is_seam = numpy.bincount(mesh_groups, minlength=num_groups) > 1
+    # average normal, and fitness of every polygon
+    norm = _normalize(_group_sum(groups, normals, num_groups))
+    fit = numpy.einsum("ij,ij->i", normals, norm[groups])
+    bestfit = numpy.full(num_groups, -numpy.inf)
+    numpy.maximum.at(bestfit, groups, fit)
+    # recalculate normals only taking into account well-fitting polygons
+    fits = fit >= bestfit[groups] - tolerance
+    norm = _normalize(_group_sum(groups, normals * fits[:, None], num_groups))
+    return is_seam[groups], norm[groups], int(numpy.count_nonzero(is_seam))
@@ -0,0 +1,492 @@
+"""This script contains helper methods to split skinned geometry into partitions with a limited number of bones."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+
+import collections
+import hashlib
+import heapq
+
+import numpy
+
+from io_scene_nif.geometrysys import tri_strips
+from io_scene_nif.geometrysys import vertex_cache
+
+#: Number of skin partitions kept by :func:`get_skin_partition`, so
+#: exporting an unchanged mesh again does not partition it again.
+CACHE_SIZE = 16
+
+_cache = collections.OrderedDict()
+
+
+class SkinPartition():
+    """The data of one skin partition block, as plain arrays.
+
+    ``bones`` lists the skin bones of the partition, padded with the first
+    bone if bones are padded, and ``vertex_map`` the geometry vertex of
+    every partition vertex. For every partition vertex, ``weights`` and
+    ``bone_indices`` hold the weights and their bones, as indices into
+    ``bones``. The faces are either ``strips`` or ``triangles``, as
+    partition vertex indices.
+    """
+
+    def __init__(self, body_part, bones):
+        self.body_part = body_part
+        self.bones = bones
+        self.vertex_map = None
+        self.weights = None
+        self.bone_indices = None
+        self.strips = None
+        self.triangles = None
+
+
+def _count_bones(mask):
+    """Count the bones of a bit mask."""
+    return bin(mask).count("1")
+
+
+def _get_bones(mask):
+    """List the bones of a bit mask, in increasing order."""
+    bones = []
+    bone = 0
+    while mask:
+        if mask & 1:
+            bones.append(bone)
+        mask >>= 1
+        bone += 1
+    return bones
+
+
+def _get_vertex_masks(weights):
+    """Get the bit mask of the bones influencing every vertex."""
+    masks = [0] * len(weights)
+    vertices, bones = numpy.nonzero(weights)
+    for vertex, bone in zip(vertices.tolist(), bones.tolist()):
+        masks[vertex] |= 1 << bone
+    return masks
+
+
+def limit_bones_per_vertex(weights, maxbonespervertex):
+    """Keep the largest weights of every vertex, and normalize them again.
+    Of equal weights, the one of the first bone is kept.
+
+    :param weights: The weight of every bone (column) on every vertex (row).
+        It is modified in place.
+    :type weights: :class:`numpy.ndarray`
+    :param maxbonespervertex: Maximum number of bones per vertex.
+    :type maxbonespervertex: :class:`int`
+    :return: The largest weight which was dropped.
+    :rtype: :class:`float`
+    """
+    if weights.shape[1] <= maxbonespervertex or not len(weights):
+        return 0.0
+    # columns of the largest weights first
+    order = numpy.argsort(-weights, axis=1, kind="mergesort")
+    rows = numpy.arange(len(weights))[:, None]
+    dropped = order[:, maxbonespervertex:]
+    lost = weights[rows, dropped]
+    changed = (lost != 0).any(axis=1)
+    weights[rows, dropped] = 0.0
+    weights[changed] /= weights[changed].sum(axis=1)[:, None]
+    return float(lost.max())
+
+
+def _limit_bones_per_triangle(weights, masks, triangles, maxbonesperpartition):
+    """Remove the bones with least weight from every triangle with too many
+    bones, and normalize the weights of its vertices again. Bones which are
+    the only bone of a vertex are kept. The weights and the vertex masks
+    are modified in place. Return the largest weight which was removed.
+    """
+    lostweight = 0.0
+    for tri in triangles:
+        while True:
+            tri_mask = masks[tri[0]] | masks[tri[1]] | masks[tri[2]]
+            if _count_bones(tri_mask) <= maxbonesperpartition:
+                break
+            keep = 0
+            for vertex in tri:
+                if _count_bones(masks[vertex]) == 1:
+                    keep |= masks[vertex]
+            bones = _get_bones(tri_mask & ~keep)
+            if not bones:
+                raise ValueError(
+                    "cannot remove anymore bones in this skin; "
+                    "increase maxbonesperpartition and try again")
+            bone_weights = weights[numpy.ix_(tri, bones)].sum(axis=0)
+            bone = bones[int(numpy.argmin(bone_weights))]
+            for vertex in set(tri):
+                if masks[vertex] >> bone & 1:
+                    lostweight = max(lostweight, float(weights[vertex, bone]))
+                    weights[vertex, bone] = 0.0
+                    weights[vertex] /= weights[vertex].sum()
+                    masks[vertex] &= ~(1 << bone)
+    return lostweight
+
+
+def _get_parts(triangles, trianglepartmap, masks, maxbonesperpartition):
+    """Pack the triangles into as few partitions as possible. Triangles with
+    the same bones and body part are packed together, largest bone sets
+    first. Every set goes to the partition of its body part to which it adds
+    the fewest bones, or to a new partition if it fits nowhere. Partitions
+    which fit together are merged at the end. Return the
+    bone mask, the body part and the triangle indices of every partition.
+    """
+    groups = collections.OrderedDict()
+    for tri_index, (tri, body_part) in enumerate(zip(triangles, trianglepartmap)):
+        mask = masks[tri[0]] | masks[tri[1]] | masks[tri[2]]
+        groups.setdefault((body_part, mask), []).append(tri_index)
+    queue = [(-_count_bones(mask), order, body_part, mask)
+             for order, (body_part, mask) in enumerate(groups)]
+    heapq.heapify(queue)
+    parts = []
+    while queue:
+        num_bones, order, body_part, mask = heapq.heappop(queue)
+        best_part = None
+        best_added = None
+        for part in parts:
+            if part[1] != body_part:
+                continue
+            num_union = _count_bones(part[0] | mask)
+            if num_union > maxbonesperpartition:
+                continue
+            added = num_union - _count_bones(part[0])
+            if best_part is None or added < best_added:
+                best_part = part
+                best_added = added
+                if not added:
+                    break
+        if best_part is None:
+            best_part = [0, body_part, []]
+            parts.append(best_part)
+        best_part[0] |= mask
+        best_part[2].extend(groups[(body_part, mask)])
+    # merge partitions which fit together
+    merged_parts = []
+    for part in parts:
+        for merged_part in merged_parts:
+            if (merged_part[1] == part[1]
+                    and _count_bones(merged_part[0] | part[0]) <= maxbonesperpartition):
+                merged_part[0] |= part[0]
+                merged_part[2].extend(part[2])
+                break
+        else:
+            merged_parts.append(part)
+    for part in merged_parts:
+        part[2].sort()
+    return merged_parts
+
+
+def _share_bones(parts, maxbonesperpartition):
+    """Group consecutive partitions which can use the same set of bones, and
+    give every partition the bones of its group.
+    """
+    shared_parts = []
+    while parts:
+        shared = [parts[0]]
+        shared_mask = parts[0][0]
+        other_parts = []
+        for part in parts[1:]:
+            if _count_bones(shared_mask | part[0]) <= maxbonesperpartition:
+                shared_mask |= part[0]
+                shared.append(part)
+            else:
+                other_parts.append(part)
+        for part in shared:
+            part[0] = shared_mask
+        shared_parts.extend(shared)
+        parts = other_parts
+    return shared_parts
+
+
+def _get_first_use(faces):
+    """Get the unique vertices of a flat list of faces, in order of first
+    use.
+    """
+    faces = numpy.asarray(faces, dtype=numpy.int64)
+    first = numpy.unique(faces, return_index=True)[1]
+    return faces[numpy.sort(first)]
+
+
+def _get_partition(part, triangles, weights, maxbonesperpartition,
+                   maxbonespervertex, stripify, stitchstrips, padbones):
+    """Get the block data of a partition, with its triangles optimized for
+    the vertex cache.
+    """
+    mask, body_part, tri_indices = part
+    bones = _get_bones(mask)
+    tris = triangles[tri_indices]
+    # number the vertices of the partition, to order its triangles
+    vertices, local_tris = numpy.unique(tris, return_inverse=True)
+    local_tris = local_tris.reshape(-1, 3).tolist()
+    order = vertex_cache.get_triangle_order(local_tris, len(vertices))
+    local_tris = [local_tris[i] for i in order]
+    if stripify:
+        strips = tri_strips.stripify(local_tris, stitchstrips=stitchstrips)
+        faces = [vertex for strip in strips for vertex in strip]
+    else:
+        faces = [vertex for tri in local_tris for vertex in tri]
+    # number them again, by first use
+    vertex_order = _get_first_use(faces)
+    new_index = numpy.zeros(len(vertices), dtype=numpy.int64)
+    new_index[vertex_order] = numpy.arange(len(vertex_order))
+    vertex_map = vertices[vertex_order]
+
+    num_bones = maxbonesperpartition if padbones else len(bones)
+    partition = SkinPartition(body_part, bones + [0] * (num_bones - len(bones)))
+    partition.vertex_map = vertex_map
+    padded = numpy.zeros((len(vertex_map), max(num_bones, maxbonespervertex)))
+    padded[:, :len(bones)] = weights[numpy.ix_(vertex_map, bones)]
+    if padbones:
+        # every bone on every vertex, sorted by bone
+        bone_indices = numpy.tile(numpy.arange(num_bones), (len(vertex_map), 1))
+        partition.weights = padded
+    else:
+        # largest weight first, unused weights refer to the first bone
+        bone_indices = numpy.argsort(-padded, axis=1, kind="mergesort")[:, :maxbonespervertex]
+        partition.weights = padded[numpy.arange(len(vertex_map))[:, None], bone_indices]
+        bone_indices[partition.weights == 0] = 0
+    partition.bone_indices = bone_indices
+    if stripify:
+        partition.strips = [new_index[strip].tolist() for strip in strips]
+    else:
+        partition.triangles = [tuple(tri) for tri in new_index[local_tris].tolist()]
+    return partition
+
+
+def _as_arrays(triangles, weights, trianglepartmap):
+    """Convert the input of a skin partition to arrays; weights are copied,
+    as they are modified."""
+    triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+    weights = numpy.array(weights, dtype=numpy.float64).reshape(len(weights), -1)
+    if trianglepartmap is None:
+        trianglepartmap = numpy.zeros(len(triangles), dtype=numpy.int64)
+    else:
+        trianglepartmap = numpy.asarray(trianglepartmap, dtype=numpy.int64)
+        if len(trianglepartmap) != len(triangles):
+            raise ValueError(
+                "trianglepartmap has %i body parts for %i triangles"
+                % (len(trianglepartmap), len(triangles)))
+    return triangles, weights, trianglepartmap
+
+
+def _get_limits(maxbonesperpartition=4, maxbonespervertex=4, stripify=True,
+                stitchstrips=False, padbones=False, maximize_bone_sharing=False):
+    """Gather the options of a skin partition, with their defaults."""
+    return (maxbonesperpartition, maxbonespervertex, bool(stripify),
+            bool(stitchstrips), bool(padbones), bool(maximize_bone_sharing))
+
+
+def _get_key(triangles, trianglepartmap, weights, limits):
+    """Hash the input of a skin partition."""
+    digest = hashlib.sha1()
+    for array in (triangles, trianglepartmap, weights):
+        digest.update(repr(array.shape).encode())
+        digest.update(numpy.ascontiguousarray(array).tobytes())
+    digest.update(repr(limits).encode())
+    return digest.hexdigest()
+
+
+def get_skin_partition(triangles, weights, trianglepartmap=None,
+                       maxbonesperpartition=4, maxbonespervertex=4,
+                       stripify=True, stitchstrips=False, padbones=False,
+                       maximize_bone_sharing=False):
+    """Split skinned triangles into partitions, each influenced by at most
+    maxbonesperpartition bones. First, bones with least weight are dropped
+    from vertices with too many bones, and then from triangles with too many
+    bones. The partitions of the last :data:`CACHE_SIZE` calls are cached,
+    by a hash of the arguments, so an unchanged skin is partitioned only
+    once. The result is shared, and must not be modified. The cache is per
+    process: see :func:`cache_skin_partition`.
+
+    :param triangles: The triangles, as triples of vertex indices.
+    :type triangles: :class:`numpy.ndarray`
+    :param weights: The weight of every bone (column) on every vertex (row).
+    :type weights: :class:`numpy.ndarray`
+    :param trianglepartmap: The body part of every triangle. Triangles of
+        different body parts never share a partition. A :exc:`ValueError`
+        is raised if its length differs from the number of triangles.
+    :type trianglepartmap: :class:`list`
+    :param maxbonesperpartition: Maximum number of bones per partition.
+    :type maxbonesperpartition: :class:`int`
+    :param maxbonespervertex: Maximum number of bones per vertex, which is
+        also the number of weights of every partition vertex.
+    :type maxbonespervertex: :class:`int`
+    :param stripify: Whether to stripify the partitions.
+    :type stripify: :class:`bool`
+    :param stitchstrips: Whether to stitch the strips of every partition.
+    :type stitchstrips: :class:`bool`
+    :param padbones: Whether to pad every partition to maxbonesperpartition
+        bones, with all bones on every vertex, sorted by bone.
+    :type padbones: :class:`bool`
+    :param maximize_bone_sharing: Whether to let consecutive partitions use
+        the same bones.
+    :type maximize_bone_sharing: :class:`bool`
+    :return: The partitions, and the largest weight which was dropped.
+    :rtype: :class:`tuple`
+    """
+    if padbones and maxbonesperpartition != maxbonespervertex:
+        raise ValueError(
+            "when padding bones maxbonesperpartition must be "
+            "equal to maxbonespervertex")
+    triangles, weights, trianglepartmap = _as_arrays(triangles, weights, trianglepartmap)
+    key = _get_key(triangles, trianglepartmap, weights, _get_limits(
+        maxbonesperpartition, maxbonespervertex, stripify, stitchstrips, padbones,
+        maximize_bone_sharing))
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    lostweight = limit_bones_per_vertex(weights, maxbonespervertex)
+    masks = _get_vertex_masks(weights)
+    tri_list = triangles.tolist()
+    lostweight = max(lostweight, _limit_bones_per_triangle(
+        weights, masks, tri_list, maxbonesperpartition))
+    parts = _get_parts(tri_list, trianglepartmap.tolist(), masks, maxbonesperpartition)
+    if maximize_bone_sharing:
+        parts = _share_bones(parts, maxbonesperpartition)
+    partitions = [_get_partition(part, triangles, weights, maxbonesperpartition,
+                                 maxbonespervertex, stripify, stitchstrips, padbones)
+                  for part in parts]
+
+    result = partitions, lostweight
+    cache_skin_partition(key, result)
+    return result
+
+
+def get_cache_key(triangles, weights, trianglepartmap=None, **partition_args):
+    """Return the key under which :func:`get_skin_partition` caches the
+    partitions of its arguments.
+
+    :rtype: :class:`str`
+    """
+    triangles, weights, trianglepartmap = _as_arrays(triangles, weights, trianglepartmap)
+    return _get_key(triangles, trianglepartmap, weights, _get_limits(**partition_args))
+
+
+def cache_skin_partition(key, result):
+    """Keep the result of :func:`get_skin_partition` in the cache of this
+    process. Partitions computed on worker processes are passed back this
+    way, so that workers forked for a later export find them.
+
+    :param key: As returned by :func:`get_cache_key`.
+    :type key: :class:`str`
+    :param result: The partitions, and the largest weight which was dropped.
+    :type result: :class:`tuple`
+    """
+    _cache[key] = result
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def set_skin_partition(n_skinpart, partitions):
+    """Store partitions in a skin partition block.
+
+    :param n_skinpart: The skin partition block.
+    :type n_skinpart: :class:`pyffi.formats.nif.NifFormat.NiSkinPartition`
+    :param partitions: The partitions, as returned by
+        :func:`get_skin_partition`.
+    :type partitions: :class:`list`
+    """
+    n_skinpart.num_skin_partition_blocks = len(partitions)
+    n_skinpart.skin_partition_blocks.update_size()
+    for n_block, partition in zip(n_skinpart.skin_partition_blocks, partitions):
+        num_vertices, num_weights = partition.weights.shape
+        n_block.num_vertices = num_vertices
+        n_block.num_bones = len(partition.bones)
+        n_block.num_weights_per_vertex = num_weights
+        n_block.bones.update_size()
+        for i, bone in enumerate(partition.bones):
+            n_block.bones[i] = bone
+        n_block.has_vertex_map = True
+        n_block.vertex_map.update_size()
+        for i, vertex in enumerate(partition.vertex_map.tolist()):
+            n_block.vertex_map[i] = vertex
+        n_block.has_vertex_weights = True
+        n_block.vertex_weights.update_size()
+        for n_weights, weights in zip(n_block.vertex_weights, partition.weights.tolist()):
+            for i, weight in enumerate(weights):
+                n_weights[i] = weight
+        n_block.has_faces = True
+        if partition.strips is not None:
+            n_block.num_strips = len(partition.strips)
+            n_block.num_triangles = sum(len(strip) - 2 for strip in partition.strips)
+            n_block.strip_lengths.update_size()
+            for i, strip in enumerate(partition.strips):
+                n_block.strip_lengths[i] = len(strip)
+            n_block.strips.update_size()
+            for n_strip, strip in zip(n_block.strips, partition.strips):
+                for i, vertex in enumerate(strip):
+                    n_strip[i] = vertex
+        else:
+            n_block.num_strips = 0
+            n_block.num_triangles = len(partition.triangles)
+            n_block.strip_lengths.update_size()
+            n_block.strips.update_size()
+            n_block.triangles.update_size()
+            for n_tri, (v_1, v_2, v_3) in zip(n_block.triangles, partition.triangles):
+                n_tri.v_1 = v_1
+                n_tri.v_2 = v_2
+                n_tri.v_3 = v_3
+        n_block.has_bone_indices = True
+        n_block.bone_indices.update_size()
+        for n_indices, indices in zip(n_block.bone_indices, partition.bone_indices.tolist()):
+            for i, index in enumerate(indices):
+                n_indices[i] = index
+
+
+def set_dismember_partitions(n_skininst, partitions):
+    """Store the body part of every partition in a dismember skin instance.
+    A partition starts a new bone set unless it uses the same bones as the
+    previous one, and caps are hidden in the editor.
+
+    :param n_skininst: The skin instance.
+    :type n_skininst: :class:`pyffi.formats.nif.NifFormat.BSDismemberSkinInstance`
+    :param partitions: The partitions, as returned by
+        :func:`get_skin_partition`.
+    :type partitions: :class:`list`
+    """
+    n_skininst.num_partitions = len(partitions)
+    n_skininst.partitions.update_size()
+    last_bones = None
+    for n_part, partition in zip(n_skininst.partitions, partitions):
+        n_part.body_part = partition.body_part
+        n_part.part_flag.pf_start_net_boneset = int(partition.bones != last_bones)
+        n_part.part_flag.pf_editor_visible = int(
+            partition.body_part < 100 or partition.body_part >= 1000)
+        last_bones = partition.bones
@@ -0,0 +1,190 @@
+"""This script contains helper methods to calculate the tangent space of a mesh."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_weld import unique_rows
+
+#: Name of the extra data holding the tangent space, as used by Oblivion.
+TANGENT_SPACE_EXTRA_DATA_NAME = b'Tangent space (binormal & tangent vectors)'
+
+# number of hash steps per unit, as in pyffi's tangent space update: only
+# location and normal matter, uvs and colors only count if they are huge
+VERTEX_FACTOR = 1000
+NORMAL_FACTOR = 1000
+UV_FACTOR = 0.01
+VCOL_FACTOR = 0.01
+
+
+def float_to_int(values):
+    """Round float values to the nearest integer, halfway values away from
+    zero, and nan to zero.
+
+    :param values: The float values.
+    :type values: :class:`numpy.ndarray`
+    :rtype: :class:`numpy.ndarray`
+    """
+    values = numpy.nan_to_num(numpy.asarray(values, dtype=numpy.float64))
+    return numpy.trunc(numpy.where(values > 0, values + 0.5, values - 0.5)).astype(numpy.int64)
+
+
+def get_vertex_groups(coords, normals, uv_sets=None, colors=None):
+    """Group vertices which have the same location and normal, so they get
+    the same tangent space, and no seam shows along uv seams.
+
+    :param coords: The vertex coordinates.
+    :type coords: :class:`numpy.ndarray`
+    :param normals: The vertex normals.
+    :type normals: :class:`numpy.ndarray`
+    :param uv_sets: The uv coordinates, one array of (u, v) rows per uv set.
+    :type uv_sets: :class:`numpy.ndarray`
+    :param colors: The vertex colors, or ``None``.
+    :type colors: :class:`numpy.ndarray`
+    :return: The group of every vertex.
+    :rtype: :class:`numpy.ndarray`
+    """
+    num_vertices = len(coords)
+    keys = [float_to_int(numpy.asarray(coords, dtype=numpy.float64) * VERTEX_FACTOR),
+            float_to_int(numpy.asarray(normals, dtype=numpy.float64) * NORMAL_FACTOR)]
+    if uv_sets is not None and len(uv_sets):
+        uv_sets = numpy.asarray(uv_sets, dtype=numpy.float64)
+        keys.append(float_to_int(uv_sets.swapaxes(0, 1).reshape(num_vertices, -1) * UV_FACTOR))
+    if colors is not None:
+        keys.append(float_to_int(numpy.asarray(colors, dtype=numpy.float64) * VCOL_FACTOR))
+    return unique_rows(numpy.hstack([key.reshape(num_vertices, -1) for key in keys]))[0]
+
+
+def normalize(vectors):
+    """Normalize all rows, leaving rows of zero length untouched.
+
+    :param vectors: The vectors.
+    :type vectors: :class:`numpy.ndarray`
+    :return: The normalized vectors, and whether each row had zero length.
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    vectors = numpy.asarray(vectors, dtype=numpy.float64).reshape(-1, 3)
+    lengths = numpy.sqrt(numpy.einsum("ij,ij->i", vectors, vectors))
+    is_zero = lengths == 0
+    return vectors / numpy.where(is_zero, 1.0, lengths)[:, None], is_zero
+
+
+def get_tangent_space(coords, normals, uvs, triangles, groups):
+    """Calculate the tangent and bitangent of every vertex, from the
+    triangle directions of increasing u and v, summed over all triangles of
+    each vertex group, and made orthonormal to the normal.
+
+    :param coords: The vertex coordinates.
+    :type coords: :class:`numpy.ndarray`
+    :param normals: The vertex normals.
+    :type normals: :class:`numpy.ndarray`
+    :param uvs: The (u, v) coordinates of every vertex, as stored in the nif.
+    :type uvs: :class:`numpy.ndarray`
+    :param triangles: The triangles, one row of three vertex indices each.
+    :type triangles: :class:`numpy.ndarray`
+    :param groups: The group of every vertex, as returned by
+        :func:`get_vertex_groups`.
+    :type groups: :class:`numpy.ndarray`
+    :return: The tangents and the bitangents.
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    coords = numpy.asarray(coords, dtype=numpy.float64).reshape(-1, 3)
+    uvs = numpy.asarray(uvs, dtype=numpy.float64).reshape(-1, 2)
+    triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+    groups = numpy.asarray(groups, dtype=numpy.int64)
+    num_groups = int(groups.max()) + 1 if len(groups) else 0
+    # skip triangles which are degenerate after grouping
+    tri_groups = groups[triangles]
+    triangles = triangles[(tri_groups[:, 0] != tri_groups[:, 1])
+                          & (tri_groups[:, 1] != tri_groups[:, 2])
+                          & (tri_groups[:, 2] != tri_groups[:, 0])]
+    v_2v_1 = coords[triangles[:, 1]] - coords[triangles[:, 0]]
+    v_3v_1 = coords[triangles[:, 2]] - coords[triangles[:, 0]]
+    w2w1 = uvs[triangles[:, 1]] - uvs[triangles[:, 0]]
+    w3w1 = uvs[triangles[:, 2]] - uvs[triangles[:, 0]]
+    # sign of the surface of the triangle in texture space
+    r_sign = numpy.where(w2w1[:, 0] * w3w1[:, 1] - w3w1[:, 0] * w2w1[:, 1] >= 0, 1.0, -1.0)
+    # contribution of every triangle to the tangents and bitangents
+    sdir, s_is_zero = normalize(
+        (w3w1[:, 1:] * v_2v_1 - w2w1[:, 1:] * v_3v_1) * r_sign[:, None])
+    tdir, t_is_zero = normalize(
+        (w2w1[:, :1] * v_3v_1 - w3w1[:, :1] * v_2v_1) * r_sign[:, None])
+    is_valid = ~(s_is_zero | t_is_zero)
+    # sum per group, in the order of the triangles and their vertices
+    tri_groups = groups[triangles[is_valid]].ravel()
+    sdir = numpy.repeat(sdir[is_valid], 3, axis=0)
+    tdir = numpy.repeat(tdir[is_valid], 3, axis=0)
+    bitan = numpy.zeros((num_groups, 3))
+    tan = numpy.zeros((num_groups, 3))
+    for i in range(3):
+        bitan[:, i] = numpy.bincount(tri_groups, weights=sdir[:, i], minlength=num_groups)
+        tan[:, i] = numpy.bincount(tri_groups, weights=tdir[:, i], minlength=num_groups)
+    # every group takes the normal of its first vertex; normals of zero
+    # length are replaced by the y axis
+    first = numpy.unique(groups, return_index=True)[1]
+    norms, n_is_zero = normalize(numpy.asarray(normals, dtype=numpy.float64).reshape(-1, 3)[first])
+    norms[n_is_zero] = (0.0, 1.0, 0.0)
+    # turn normal, bitangent and tangent into a base via Gram-Schmidt
+    bitan -= norms * numpy.einsum("ij,ij->i", norms, bitan)[:, None]
+    bitan, b_is_zero = normalize(bitan)
+    tan -= norms * numpy.einsum("ij,ij->i", norms, tan)[:, None]
+    tan -= bitan * numpy.einsum("ij,ij->i", bitan, tan)[:, None]
+    tan, t_is_zero = normalize(tan)
+    # pick any base if there is not enough data
+    is_zero = b_is_zero | t_is_zero
+    if is_zero.any():
+        zero_norms = norms[is_zero]
+        zero_bitan, x_is_zero = normalize(numpy.cross((1.0, 0.0, 0.0), zero_norms))
+        zero_bitan[x_is_zero] = normalize(numpy.cross((0.0, 1.0, 0.0), zero_norms[x_is_zero]))[0]
+        bitan[is_zero] = zero_bitan
+        tan[is_zero] = numpy.cross(zero_norms, zero_bitan)
+    return tan[groups], bitan[groups]
+
+
+def get_binary_data(tangents, bitangents):
+    """Pack the tangent space as stored in the binary extra data of
+    Oblivion: all tangents followed by all bitangents, as little endian
+    floats.
+
+    :param tangents: The tangents.
+    :type tangents: :class:`numpy.ndarray`
+    :param bitangents: The bitangents.
+    :type bitangents: :class:`numpy.ndarray`
+    :rtype: :class:`bytes`
+    """
+    return numpy.vstack((tangents, bitangents)).astype("<f4").tobytes()
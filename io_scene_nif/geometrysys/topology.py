@@ -0,0 +1,124 @@
+"""This script contains helper methods to build the polygon topology of imported meshes."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_weld import unique_rows
+
+
+def rotate_to_min(faces):
+    """Rotate every face so that its lowest vertex index comes first,
+    keeping the winding order. Faces that only differ by the vertex they
+    start at become equal rows.
+
+    :param faces: The faces, one row of vertex indices per face.
+    :type faces: :class:`numpy.ndarray`
+    :return: The rotated faces.
+    :rtype: :class:`numpy.ndarray`
+    """
+    num_faces, face_size = faces.shape
+    shift = numpy.argmin(faces, axis=1)
+    columns = (numpy.arange(face_size) + shift[:, None]) % face_size
+    return faces[numpy.arange(num_faces)[:, None], columns]
+
+
+def build_polygons(polygons, v_map=None):
+    """Remove degenerate and duplicate polygons, and return the topology of
+    the remaining ones as flat loop arrays.
+
+    A polygon is degenerate if it has less than three vertices, or if it
+    uses a vertex more than once. A polygon is a duplicate of an earlier one
+    if it has the same vertices in the same winding order, possibly starting
+    at a different vertex; the same vertices in opposite winding order make
+    a different polygon, as used for double sided geometry.
+
+    :param polygons: The polygons, each a sequence of vertex indices.
+    :param v_map: Optional vertex index map, applied to the polygons first.
+    :return: A triple (f_map, loop_vertices, loop_totals), where polygon i
+        becomes new polygon f_map[i], or is removed if f_map[i] is -1;
+        loop_vertices holds the vertex indices of the new polygons one after
+        the other, and loop_totals the number of vertices of each.
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    face_sizes = set(len(polygon) for polygon in polygons)
+    if len(face_sizes) > 1:
+        return _build_mixed_polygons(polygons, v_map)
+
+    num_faces = len(polygons)
+    face_size = face_sizes.pop() if face_sizes else 0
+    faces = numpy.array(polygons, dtype=numpy.int64).reshape(num_faces, face_size)
+    if v_map is not None:
+        faces = numpy.asarray(v_map, dtype=numpy.int64)[faces]
+
+    f_map = numpy.full(num_faces, -1, dtype=numpy.int64)
+    if face_size < 3:
+        return f_map, numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+
+    sorted_faces = numpy.sort(faces, axis=1)
+    valid = numpy.flatnonzero(numpy.all(sorted_faces[:, 1:] != sorted_faces[:, :-1], axis=1))
+    # first occurrences are numbered in order, so kept faces stay in order
+    _, first = unique_rows(rotate_to_min(faces[valid]))
+    kept = valid[first]
+    f_map[kept] = numpy.arange(len(kept))
+    return f_map, faces[kept].ravel(), numpy.full(len(kept), face_size, dtype=numpy.int64)
+
+
+def _build_mixed_polygons(polygons, v_map):
+    """Implementation of :func:`build_polygons` for polygons with differing
+    numbers of vertices, using a set of rotated vertex tuples."""
+    f_map = numpy.full(len(polygons), -1, dtype=numpy.int64)
+    loop_vertices = []
+    loop_totals = []
+    unique_faces = set()
+    for i, polygon in enumerate(polygons):
+        if v_map is not None:
+            f_verts = [v_map[vert_index] for vert_index in polygon]
+        else:
+            f_verts = list(polygon)
+        if len(f_verts) < 3 or len(set(f_verts)) < len(f_verts):
+            continue
+        shift = f_verts.index(min(f_verts))
+        key = tuple(f_verts[shift:] + f_verts[:shift])
+        if key in unique_faces:
+            continue
+        unique_faces.add(key)
+        f_map[i] = len(loop_totals)
+        loop_vertices.extend(f_verts)
+        loop_totals.append(len(f_verts))
+    return f_map, numpy.array(loop_vertices, dtype=numpy.int64), numpy.array(loop_totals, dtype=numpy.int64)
@@ -0,0 +1,331 @@
+"""This script contains helper methods to build the geometry of a trishape."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+from io_scene_nif.geometrysys import bounding_volume
+from io_scene_nif.geometrysys import skin_partition
+from io_scene_nif.geometrysys import tangent_space
+from io_scene_nif.geometrysys import tri_strips
+from io_scene_nif.geometrysys import vertex_cache
+from io_scene_nif.geometrysys import vertex_hash
+
+
+class TriGeometry():
+    """The vertices and triangles of a trishape, as plain lists, and the
+    arrays derived from them, so they can be passed between processes.
+
+    ``vertmap[i]`` lists the nif vertices made from blender vertex i, or is
+    ``None`` if the vertex is not used. ``polygons_without_bodypart`` lists
+    the polygons which are not in any body part. ``acmr`` holds the average
+    cache miss ratio before and after :meth:`optimize_vertex_cache`, if it
+    was called.
+
+    The bounding sphere, uv sets, tangent space, strips and skin are
+    ``None`` until their ``update_*`` method is called.
+    """
+
+    def __init__(self, num_vertices):
+        self.vertlist = []
+        self.normlist = []
+        self.vcollist = []
+        self.uvlist = []
+        self.trilist = []
+        self.bodypartfacemap = []
+        self.polygons_without_bodypart = []
+        self.vertmap = [None] * num_vertices
+        self.acmr = None
+        self.center = None
+        self.radius = None
+        self.uv_sets = None
+        self.tangents = None
+        self.bitangents = None
+        self.strips = None
+        self.num_strips = None
+        self.skin_bones = None
+        self.skin_vertices = None
+        self.skin_weights = None
+        self.skin_spheres = None
+        self.partitions = None
+        self.lostweight = None
+        self.partition_key = None
+
+    def optimize_vertex_cache(self):
+        """Reorder the triangles, and then the vertices, for the
+        post-transform vertex cache. The body part of every triangle and the
+        vertex map follow the new order. Nothing is done if some polygons are
+        not in any body part, as the export fails anyway.
+        """
+        if self.polygons_without_bodypart or not self.trilist:
+            return
+        num_vertices = len(self.vertlist)
+        acmr_before = vertex_cache.get_acmr(self.trilist)
+        tri_order = vertex_cache.get_triangle_order(self.trilist, num_vertices)
+        self.trilist = [self.trilist[i] for i in tri_order]
+        self.bodypartfacemap = [self.bodypartfacemap[i] for i in tri_order]
+        vert_order = vertex_cache.get_vertex_order(self.trilist, num_vertices)
+        new_index = [None] * num_vertices
+        for new, old in enumerate(vert_order):
+            new_index[old] = new
+        self.vertlist = [self.vertlist[i] for i in vert_order]
+        if self.normlist:
+            self.normlist = [self.normlist[i] for i in vert_order]
+        if self.vcollist:
+            self.vcollist = [self.vcollist[i] for i in vert_order]
+        if self.uvlist:
+            self.uvlist = [self.uvlist[i] for i in vert_order]
+        self.trilist = [tuple(new_index[i] for i in tri) for tri in self.trilist]
+        self.vertmap = [[new_index[i] for i in vert_indices] if vert_indices else vert_indices
+                        for vert_indices in self.vertmap]
+        self.acmr = (acmr_before, vertex_cache.get_acmr(self.trilist))
+
+    def update_bounding_sphere(self):
+        """Compute the bounding sphere of the vertices."""
+        self.center, self.radius = bounding_volume.get_bounding_sphere(self.vertlist)
+
+    def update_uv_sets(self, num_uv_sets):
+        """Gather the uvs into one array of (u, v) rows per uv set, with the
+        v coordinate flipped, as nif follows the OpenGL standard.
+
+        :param num_uv_sets: Number of uvs of every vertex.
+        :type num_uv_sets: :class:`int`
+        """
+        uv_sets = numpy.array(self.uvlist, dtype=numpy.float64).reshape(
+            len(self.vertlist), num_uv_sets, 2).swapaxes(0, 1)
+        uv_sets[:, :, 1] = 1.0 - uv_sets[:, :, 1]
+        self.uv_sets = uv_sets
+
+    def update_tangent_space(self):
+        """Normalize the normals, and compute the tangent space from the
+        first uv set. Vertices which only differ in their other uv sets or
+        in their color share their tangent space.
+        """
+        self.normlist = tangent_space.normalize(self.normlist)[0]
+        self.tangents, self.bitangents = tangent_space.get_tangent_space(
+            self.vertlist, self.normlist, self.uv_sets[0], self.trilist,
+            tangent_space.get_vertex_groups(
+                self.vertlist, self.normlist, self.uv_sets, self.vcollist or None))
+
+    def update_strips(self, stitchstrips):
+        """Stripify the triangles.
+
+        :param stitchstrips: Whether to stitch all strips into one.
+        :type stitchstrips: :class:`bool`
+        """
+        strips = tri_strips.stripify(self.trilist)
+        self.num_strips = len(strips)
+        if stitchstrips:
+            strips = [tri_strips.stitch_strips(strips)]
+        self.strips = strips
+
+    def update_skin(self, bone_weights, partition_args=None):
+        """Map the bone weights of the blender vertices onto the vertices,
+        and compute the bounding sphere of every skin bone, that is of
+        every bone which influences at least one vertex. Then split the
+        triangles into skin partitions, if partition_args is given.
+
+        :param bone_weights: For every bone, a (blender vertex indices,
+            normalized weights) pair of arrays.
+        :param partition_args: Keyword arguments of
+            :func:`~io_scene_nif.geometrysys.skin_partition.get_skin_partition`,
+            or ``None``.
+        :type partition_args: :class:`dict`
+        """
+        num_vertices = len(self.vertlist)
+        # the blender vertex of every vertex
+        b_vertices = numpy.zeros(num_vertices, dtype=numpy.int64)
+        for b_v_index, vert_indices in enumerate(self.vertmap):
+            if vert_indices:
+                b_vertices[vert_indices] = b_v_index
+        coords = numpy.array(self.vertlist, dtype=numpy.float64).reshape(-1, 3)
+        skin_weights = numpy.zeros((num_vertices, len(bone_weights)))
+        self.skin_bones = []
+        self.skin_vertices = []
+        self.skin_spheres = []
+        for bone_index, (b_v_indices, b_v_weights) in enumerate(bone_weights):
+            b_influenced = numpy.zeros(len(self.vertmap), dtype=bool)
+            b_influenced[b_v_indices] = True
+            vert_indices = numpy.flatnonzero(b_influenced[b_vertices])
+            # only bones which influence this shape are skin bones
+            if not len(vert_indices):
+                continue
+            b_weights = numpy.zeros(len(self.vertmap))
+            b_weights[b_v_indices] = b_v_weights
+            skin_weights[:, len(self.skin_bones)] = b_weights[b_vertices]
+            self.skin_bones.append(bone_index)
+            self.skin_vertices.append(vert_indices.tolist())
+            self.skin_spheres.append(bounding_volume.get_bounding_sphere(coords[vert_indices]))
+        self.skin_weights = skin_weights[:, :len(self.skin_bones)]
+        if partition_args is not None:
+            self.partition_key = skin_partition.get_cache_key(
+                self.trilist, self.skin_weights, self.bodypartfacemap, **partition_args)
+            self.partitions, self.lostweight = skin_partition.get_skin_partition(
+                self.trilist, self.skin_weights, trianglepartmap=self.bodypartfacemap,
+                **partition_args)
+
+    def cache_skin_partition(self):
+        """Keep the skin partition in the cache of this process, if it was
+        computed. Call this on the main thread: the skin partition cache of
+        a worker process is lost with it, but workers forked later start
+        with the cache of the main thread.
+        """
+        if self.partition_key is not None:
+            skin_partition.cache_skin_partition(
+                self.partition_key, (self.partitions, self.lostweight))
+
+
+def build_tri_geometry(mesh, has_uvs, has_normals, epsilon, flip, bodypartgroups,
+                       optimize_cache=False, has_tangent_space=False, stripify=False,
+                       stitchstrips=False, bone_weights=None, partition_args=None):
+    """Extract all unique (vertex, uv, normal, vertex color) quads of the
+    polygons of a mesh slice, and triangulate the polygons. Polygons with
+    fewer than three vertices are skipped. Then compute everything else the
+    geometry data and the skin need, so that only copying is left to do.
+
+    :param mesh: The polygons to export, with their uvs and colors.
+    :type mesh: :class:`~io_scene_nif.geometrysys.mesh_partition.MeshSlice`
+    :param has_uvs: Whether to store uvs.
+    :param has_normals: Whether to store normals.
+    :param epsilon: Tolerance for merging uvs, normals and colors.
+    :param flip: Whether to flip the winding of the triangles.
+    :param bodypartgroups: List of body part (name, index, vertex set), or
+        ``None`` if body parts are not exported.
+    :param optimize_cache: Whether to reorder triangles and vertices for the
+        vertex cache.
+    :param has_tangent_space: Whether to compute the tangent space.
+    :param stripify: Whether to stripify the triangles.
+    :param stitchstrips: Whether to stitch the strips.
+    :param bone_weights: Passed to :meth:`TriGeometry.update_skin`, or
+        ``None`` if the shape is not skinned.
+    :param partition_args: Passed to :meth:`TriGeometry.update_skin`.
+    :rtype: :class:`TriGeometry`
+    """
+    geometry = TriGeometry(len(mesh.vertex_coords))
+    loop_totals = mesh.loop_totals
+    # polygons with fewer than three loops are skipped, with their loops
+    poly_indices = numpy.flatnonzero(loop_totals >= 3)
+    loop_indices = numpy.flatnonzero(numpy.repeat(loop_totals >= 3, loop_totals))
+    loop_polys = numpy.repeat(numpy.arange(len(loop_totals)), loop_totals)[loop_indices]
+    loop_vertices = mesh.loop_vertices[loop_indices]
+
+    # the (vert, uv-vert, normal, vcol) quad of every loop: only vertices
+    # with the same vertex index are compared, and they must have the same
+    # uvs, normals and colors
+    loop_uvs = numpy.zeros((len(mesh.uvs), len(loop_indices), 2), dtype=numpy.float32)
+    for uv_index, uv_layer in enumerate(mesh.uvs):
+        loop_uvs[uv_index] = uv_layer[loop_indices]
+    loop_uvs = loop_uvs.transpose(1, 0, 2)
+    quad_attrs = [loop_uvs.reshape(len(loop_indices), 2 * len(mesh.uvs))]
+    if has_normals:
+        # smooth = vertex normal, non-smooth = face normal
+        loop_normals = numpy.where(
+            mesh.use_smooth[loop_polys][:, None],
+            mesh.vertex_normals[loop_vertices], mesh.poly_normals[loop_polys])
+        quad_attrs.append(loop_normals)
+    if mesh.colors is not None:
+        loop_colors = mesh.colors[loop_indices]
+        quad_attrs.append(loop_colors)
+    quad_indices, quad_loops = vertex_hash.find_vertices(
+        loop_vertices, numpy.hstack(quad_attrs), epsilon)
+
+    # the first loop of every quad adds it
+    quad_vertices = loop_vertices[quad_loops]
+    vertmap = geometry.vertmap
+    for quad_index, vertex_index in enumerate(quad_vertices.tolist()):
+        if not vertmap[vertex_index]:
+            vertmap[vertex_index] = []
+        vertmap[vertex_index].append(quad_index)
+    geometry.vertlist = mesh.vertex_coords[quad_vertices].tolist()
+    if has_normals:
+        geometry.normlist = loop_normals[quad_loops].tolist()
+    if mesh.colors is not None:
+        geometry.vcollist = loop_colors[quad_loops].tolist()
+    if has_uvs:
+        geometry.uvlist = loop_uvs[quad_loops].tolist()
+
+    # now add the (hopefully, convex) faces, in triangle fans
+    poly_tris = loop_totals[poly_indices] - 2
+    tri_polys = numpy.repeat(poly_indices, poly_tris)
+    # the quads of the loops of every polygon start here
+    poly_starts = numpy.cumsum(loop_totals[poly_indices]) - loop_totals[poly_indices]
+    tri_starts = numpy.repeat(poly_starts, poly_tris)
+    tri_offsets = numpy.arange(len(tri_polys)) - numpy.repeat(numpy.cumsum(poly_tris) - poly_tris, poly_tris)
+    triangles = numpy.column_stack((
+        quad_indices[tri_starts],
+        quad_indices[tri_starts + 1 + tri_offsets],
+        quad_indices[tri_starts + 2 + tri_offsets]))
+    if flip:
+        triangles = triangles[:, (0, 2, 1)]
+    geometry.trilist = [tuple(tri) for tri in triangles.tolist()]
+    # add body part numbers
+    if not bodypartgroups:
+        geometry.bodypartfacemap = [0] * len(triangles)
+    else:
+        loop_starts = mesh.loop_starts.tolist()
+        all_loop_vertices = mesh.loop_vertices.tolist()
+        for poly_index, num_tris in zip(poly_indices.tolist(), poly_tris.tolist()):
+            loop_start = loop_starts[poly_index]
+            poly_vertices = set(all_loop_vertices[loop_start:loop_start + num_tris + 2])
+            for bodypartname, bodypartindex, bodypartverts in bodypartgroups:
+                if poly_vertices <= bodypartverts:
+                    geometry.bodypartfacemap.extend([bodypartindex] * num_tris)
+                    break
+            else:
+                # this signals an error
+                geometry.polygons_without_bodypart.extend(
+                    [int(mesh.polygons[poly_index])] * num_tris)
+        if geometry.polygons_without_bodypart:
+            # the export fails, and the body part map does not cover all
+            # triangles, so nothing else is computed
+            return geometry
+    if optimize_cache:
+        geometry.optimize_vertex_cache()
+    if not geometry.vertlist:
+        # nothing is exported
+        return geometry
+    geometry.update_bounding_sphere()
+    if has_uvs:
+        geometry.update_uv_sets(len(mesh.uvs))
+        if has_tangent_space and has_normals and mesh.uvs:
+            geometry.update_tangent_space()
+    if stripify:
+        geometry.update_strips(stitchstrips)
+    if bone_weights is not None:
+        geometry.update_skin(bone_weights, partition_args)
+    return geometry
@@ -0,0 +1,179 @@
+"""This script contains helper methods to convert triangles to triangle strips, using an edge adjacency table."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+
+def get_adjacency(triangles):
+    """Find the neighbour of every triangle across each of its edges. Edge i
+    of a triangle goes from its vertex i to its vertex i + 1. A neighbour
+    shares the edge in opposite direction, so both triangles have the same
+    winding.
+
+    :param triangles: The triangles, one row of three vertex indices each.
+    :type triangles: :class:`numpy.ndarray`
+    :return: For every edge, the index of the opposite edge, that is three
+        times its triangle plus its index in the triangle, or -1 if the edge
+        is on a border.
+    :rtype: :class:`numpy.ndarray`
+    """
+    triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+    if not len(triangles):
+        return numpy.zeros(0, dtype=numpy.int64)
+    num_vertices = int(triangles.max()) + 1
+    starts = triangles.ravel()
+    ends = triangles[:, (1, 2, 0)].ravel()
+    keys = starts * num_vertices + ends
+    order = numpy.argsort(keys, kind="mergesort")
+    sorted_keys = keys[order]
+    # look up the reversed edge of every edge
+    reversed_keys = ends * num_vertices + starts
+    pos = numpy.minimum(numpy.searchsorted(sorted_keys, reversed_keys), len(keys) - 1)
+    return numpy.where(sorted_keys[pos] == reversed_keys, order[pos], -1)
+
+
+def stripify(triangles, stitchstrips=False):
+    """Convert triangles to strips, greedily, keeping the triangle order as
+    far as possible. Every triangle which is not yet in a strip starts a new
+    strip, which is extended both ways across edges to triangles not yet in
+    a strip. Of the three directions in which the strip can cross the
+    triangle, the one giving the longest strip is taken. Degenerate
+    triangles are dropped.
+
+    :param triangles: The triangles, as triples of vertex indices.
+    :type triangles: :class:`list`
+    :param stitchstrips: Whether to stitch all strips into a single strip.
+    :type stitchstrips: :class:`bool`
+    :return: The strips, as lists of vertex indices.
+    :rtype: :class:`list`
+    """
+    triangles = [tuple(tri) for tri in triangles
+                 if tri[0] != tri[1] and tri[1] != tri[2] and tri[2] != tri[0]]
+    adjacency = get_adjacency(triangles).tolist()
+    is_added = [False] * len(triangles)
+
+    def walk(t, i, vertices, flipped, tri_indices, in_strip):
+        """Extend a strip, whose last triangle is t, across edge i of t, as
+        long as possible. A flipped strip has its vertices in reverse
+        order, so its triangles have the opposite winding.
+        """
+        while True:
+            edge = adjacency[3 * t + i]
+            if edge < 0 or is_added[edge // 3] or edge // 3 in in_strip:
+                return
+            t, j = divmod(edge, 3)
+            tri_indices.append(t)
+            in_strip.add(t)
+            vertices.append(triangles[t][(j + 2) % 3])
+            # even triangles of a strip leave through the edge after the
+            # shared one, odd triangles through the edge before it
+            if (len(vertices) & 1) != flipped:
+                i = (j + 1) % 3
+            else:
+                i = (j + 2) % 3
+
+    def get_strip(start, rotation):
+        """Find the strip through the given triangle, rotated so it starts
+        with its vertex ``rotation``. Return the triangles and the vertices
+        of the strip.
+        """
+        tri = triangles[start]
+        v0, v1, v2 = tri[rotation], tri[(rotation + 1) % 3], tri[(rotation + 2) % 3]
+        tri_indices = [start]
+        in_strip = {start}
+        # forwards, leaving through edge v1 v2
+        vertices = [v0, v1, v2]
+        walk(start, (rotation + 1) % 3, vertices, False, tri_indices, in_strip)
+        # backwards, leaving through edge v0 v1
+        num_forward = len(tri_indices)
+        back_vertices = [v2, v1, v0]
+        walk(start, rotation, back_vertices, True, tri_indices, in_strip)
+        # keep an even number of triangles before the first triangle,
+        # so it keeps its winding
+        if (len(tri_indices) - num_forward) & 1:
+            tri_indices.pop()
+            back_vertices.pop()
+        return tri_indices, back_vertices[:2:-1] + vertices
+
+    strips = []
+    for start in range(len(triangles)):
+        if is_added[start]:
+            continue
+        # take the longest of the three strips through the triangle
+        tri_indices, strip = max((get_strip(start, rotation) for rotation in range(3)),
+                                 key=lambda result: len(result[0]))
+        for t in tri_indices:
+            is_added[t] = True
+        strips.append(strip)
+    if stitchstrips and strips:
+        return [stitch_strips(strips)]
+    return strips
+
+
+def stitch_strips(strips):
+    """Join strips into a single strip with degenerate triangles. Every
+    strip starts at an even position, so all triangles keep their winding.
+
+    :param strips: The strips, as lists of vertex indices.
+    :type strips: :class:`list`
+    :return: The stitched strip.
+    :rtype: :class:`list`
+    """
+    result = []
+    for strip in strips:
+        if result:
+            if len(result) & 1:
+                result.extend((result[-1], strip[0], strip[0]))
+            else:
+                result.extend((result[-1], strip[0]))
+        result.extend(strip)
+    return result
+
+
+def get_num_degenerates(strips):
+    """Count the degenerate triangles of strips, such as those added by
+    stitching.
+
+    :param strips: The strips, as lists of vertex indices.
+    :type strips: :class:`list`
+    :rtype: :class:`int`
+    """
+    return sum(1 for strip in strips for k in range(len(strip) - 2)
+               if strip[k] == strip[k + 1] or strip[k + 1] == strip[k + 2]
+               or strip[k + 2] == strip[k])
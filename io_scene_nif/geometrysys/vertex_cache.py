@@ -0,0 +1,185 @@
+"""This script contains helper methods to optimize the triangle and vertex order of a mesh for the post-transform vertex cache."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import collections
+
+
+#: Number of vertices in the simulated vertex cache.
+CACHE_SIZE = 32
+
+# vertex scoring constants of Tom Forsyth's linear-speed vertex cache
+# optimisation
+CACHE_DECAY_POWER = 1.5
+LAST_TRI_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+
+
+def get_acmr(triangles, cache_size=CACHE_SIZE):
+    """Calculate the average cache miss ratio of a triangle list, that is,
+    the number of vertices transformed per triangle, on a FIFO cache.
+
+    :param triangles: The triangles, as triples of vertex indices.
+    :type triangles: :class:`list`
+    :param cache_size: Number of vertices in the cache.
+    :type cache_size: :class:`int`
+    :return: The number of cache misses per triangle.
+    :rtype: :class:`float`
+    """
+    if not triangles:
+        return 0.0
+    cache = collections.deque()
+    cached = set()
+    misses = 0
+    for triangle in triangles:
+        for vertex in triangle:
+            if vertex not in cached:
+                misses += 1
+                cache.append(vertex)
+                cached.add(vertex)
+                if len(cache) > cache_size:
+                    cached.remove(cache.popleft())
+    return misses / len(triangles)
+
+
+def _get_vertex_score(cache_position, num_triangles, cache_size):
+    """Score a vertex from its position in the LRU cache (-1 if it is not
+    cached) and its number of remaining triangles.
+    """
+    if not num_triangles:
+        return -1.0
+    if cache_position < 0:
+        score = 0.0
+    elif cache_position < 3:
+        # the vertices of the last triangle get a fixed score, so there
+        # is no preference for any of them
+        score = LAST_TRI_SCORE
+    else:
+        score = (1.0 - (cache_position - 3) / (cache_size - 3)) ** CACHE_DECAY_POWER
+    # boost vertices with few remaining triangles, to get rid of them quickly
+    return score + VALENCE_BOOST_SCALE * num_triangles ** -VALENCE_BOOST_POWER
+
+
+def get_triangle_order(triangles, num_vertices, cache_size=CACHE_SIZE):
+    """Order triangles for the post-transform vertex cache, following Tom
+    Forsyth's linear-speed vertex cache optimisation: the next triangle is
+    always the best scoring triangle among those using a cached vertex.
+
+    :param triangles: The triangles, as triples of vertex indices.
+    :type triangles: :class:`list`
+    :param num_vertices: The number of vertices.
+    :type num_vertices: :class:`int`
+    :param cache_size: Number of vertices in the simulated LRU cache.
+    :type cache_size: :class:`int`
+    :return: The indices of the triangles, in optimized order.
+    :rtype: :class:`list`
+    """
+    # triangles of every vertex
+    vertex_triangles = [[] for i in range(num_vertices)]
+    for tri_index, triangle in enumerate(triangles):
+        for vertex in triangle:
+            vertex_triangles[vertex].append(tri_index)
+    num_remaining = [len(tris) for tris in vertex_triangles]
+    vertex_scores = [_get_vertex_score(-1, num, cache_size) for num in num_remaining]
+    triangle_scores = [sum(vertex_scores[vertex] for vertex in triangle)
+                       for triangle in triangles]
+    is_added = [False] * len(triangles)
+    cache = []
+    order = []
+    # triangles are scanned in order when no cached vertex has a triangle
+    # left, so the search for a new start is linear over the whole mesh
+    next_unadded = 0
+    best_triangle = max(range(len(triangles)), key=triangle_scores.__getitem__,
+                        default=None)
+    while best_triangle is not None:
+        order.append(best_triangle)
+        is_added[best_triangle] = True
+        triangle = triangles[best_triangle]
+        for vertex in triangle:
+            num_remaining[vertex] -= 1
+            vertex_triangles[vertex].remove(best_triangle)
+        # move the vertices of the triangle to the front of the cache
+        cache = ([vertex for i, vertex in enumerate(triangle) if vertex not in triangle[:i]]
+                 + [vertex for vertex in cache if vertex not in triangle])
+        # update the scores of all vertices which were in the cache
+        for cache_position, vertex in enumerate(cache):
+            score = _get_vertex_score(
+                cache_position if cache_position < cache_size else -1,
+                num_remaining[vertex], cache_size)
+            delta = score - vertex_scores[vertex]
+            vertex_scores[vertex] = score
+            for tri_index in vertex_triangles[vertex]:
+                triangle_scores[tri_index] += delta
+        del cache[cache_size:]
+        # best triangle using a cached vertex
+        best_triangle = None
+        best_score = -1.0
+        for vertex in cache:
+            for tri_index in vertex_triangles[vertex]:
+                if triangle_scores[tri_index] > best_score:
+                    best_triangle = tri_index
+                    best_score = triangle_scores[tri_index]
+        if best_triangle is None:
+            while next_unadded < len(triangles) and is_added[next_unadded]:
+                next_unadded += 1
+            if next_unadded < len(triangles):
+                best_triangle = next_unadded
+    return order
+
+
+def get_vertex_order(triangles, num_vertices):
+    """Order vertices by their first use in a triangle list, so vertices are
+    fetched sequentially. Unused vertices go last, in their original order.
+
+    :param triangles: The triangles, as triples of vertex indices.
+    :type triangles: :class:`list`
+    :param num_vertices: The number of vertices.
+    :type num_vertices: :class:`int`
+    :return: The old index of every new vertex.
+    :rtype: :class:`list`
+    """
+    is_used = [False] * num_vertices
+    order = []
+    for triangle in triangles:
+        for vertex in triangle:
+            if not is_used[vertex]:
+                is_used[vertex] = True
+                order.append(vertex)
+    order.extend(vertex for vertex in range(num_vertices) if not is_used[vertex])
+    return order
@@ -0,0 +1,147 @@
+"""This script contains helper methods to read and fill vertex groups in bulk."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+
+def group_weights(vertices, weights):
+    """Group vertex weights by weight, so that every group can be assigned
+    with a single ``VertexGroup.add`` call.
+
+    If a vertex is listed more than once, only its last weight is kept, as
+    would be the case when adding the weights one by one with ``'REPLACE'``.
+
+    :param vertices: The vertex indices.
+    :param weights: The weight of each vertex.
+    :return: A list of (weight, vertex index list) pairs, sorted by weight.
+    :rtype: :class:`list`
+    """
+    vertices = numpy.asarray(vertices, dtype=numpy.int64)
+    weights = numpy.asarray(weights, dtype=numpy.float64)
+    if not len(vertices):
+        return []
+    # first occurrence in reversed order is the last occurrence
+    _, last = numpy.unique(vertices[::-1], return_index=True)
+    last = len(vertices) - 1 - last
+    vertices = vertices[last]
+    unique_weights, weight_index = numpy.unique(weights[last], return_inverse=True)
+    order = numpy.argsort(weight_index, kind="mergesort")
+    splits = numpy.cumsum(numpy.bincount(weight_index))[:-1]
+    return [(float(weight), group.tolist())
+            for weight, group in zip(unique_weights, numpy.split(vertices[order], splits))]
+
+
+class VertexGroupWeights():
+    """Sparse vertex by vertex group weight matrix, in compressed sparse row
+    form: the groups of vertex i are ``groups[indptr[i]:indptr[i + 1]]``, with
+    the matching ``weights``.
+
+    The matrix is extracted from the mesh in a single pass, after which the
+    members of a group, the unweighted vertices and the weight normalization
+    factors are derived without walking the vertices again.
+    """
+
+    def __init__(self, vertex_groups):
+        """Build the matrix.
+
+        :param vertex_groups: For every vertex, a sequence of
+            (group index, weight) pairs.
+        """
+        indptr = [0]
+        groups = []
+        weights = []
+        for vertex_group in vertex_groups:
+            for group, weight in vertex_group:
+                groups.append(group)
+                weights.append(weight)
+            indptr.append(len(groups))
+        self.indptr = numpy.array(indptr, dtype=numpy.int64)
+        self.groups = numpy.array(groups, dtype=numpy.int64)
+        self.weights = numpy.array(weights, dtype=numpy.float64)
+        # row (vertex index) of every entry
+        self.vertices = numpy.repeat(numpy.arange(len(indptr) - 1), numpy.diff(self.indptr))
+
+    @classmethod
+    def from_mesh(cls, b_mesh):
+        """Extract the vertex group weights of a Blender mesh.
+
+        :param b_mesh: The mesh.
+        :type b_mesh: :class:`bpy.types.Mesh`
+        """
+        return cls([(g.group, g.weight) for g in b_vert.groups] for b_vert in b_mesh.vertices)
+
+    def get_weights(self, group):
+        """Return the vertices in a group, in increasing order, and their
+        weights.
+
+        :param group: The vertex group index.
+        :type group: :class:`int`
+        :return: A (vertex indices, weights) pair of arrays.
+        """
+        mask = (self.groups == group)
+        return self.vertices[mask], self.weights[mask]
+
+    def get_vertices(self, group):
+        """Return the set of vertices in a group, whatever their weight.
+
+        :param group: The vertex group index.
+        :type group: :class:`int`
+        :rtype: :class:`set`
+        """
+        return set(self.vertices[self.groups == group].tolist())
+
+    def get_unweighted(self):
+        """Return the vertices which are not in any group.
+
+        :rtype: :class:`numpy.ndarray`
+        """
+        return numpy.flatnonzero(numpy.diff(self.indptr) == 0)
+
+    def get_norms(self, groups):
+        """Return for every vertex the sum of its weights in the given
+        groups, summed in the order of groups.
+
+        :param groups: The vertex group indices.
+        :rtype: :class:`numpy.ndarray`
+        """
+        norms = numpy.zeros(len(self.indptr) - 1, dtype=numpy.float64)
+        for group in groups:
+            vertices, weights = self.get_weights(group)
+            norms[vertices] += weights
+        return norms
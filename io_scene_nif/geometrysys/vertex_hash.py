@@ -0,0 +1,253 @@
+"""This script contains a spatial hash to find duplicate export vertices."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import math
+
+import numpy
+
+
+class VertexHash():
+    """Find export vertices whose attributes (uvs, normal, color) match within
+    epsilon, in constant time per lookup.
+
+    Attributes are quantized into a single cell many times wider than
+    epsilon, and a neighbouring cell is only probed along components which
+    lie within epsilon of a cell border. The grid is laid out so that
+    common values such as 0.0, 0.5 and 1.0 are far from any border. Lookups
+    which repeat earlier attributes exactly are answered from a dictionary.
+    Only vertices sharing the same blender vertex are ever merged.
+
+    Of all matching vertices, the one added first is returned, exactly as a
+    linear scan over the previously added vertices would find it.
+
+    :func:`find_vertices` does the lookups of a whole mesh at once.
+    """
+
+    CELL_SIZE = 64
+    """Minimal width of a cell, as a multiple of epsilon. Cells only hold the
+    vertices of one blender vertex, so they can be wide, which keeps values
+    away from the borders."""
+
+    CELL_OFFSET = 0.5
+    """Offset of the grid, as a fraction of a cell."""
+
+    def __init__(self, epsilon):
+        self.epsilon = epsilon
+        # a power of two, so the grid is exact, and values which are
+        # multiples of the cell, such as 0.0, 0.5 and 1.0, sit in the middle
+        # of a cell
+        self.cell = 2.0 ** math.ceil(math.log2(self.CELL_SIZE * epsilon)) if epsilon > 0 else 1.0
+        # a neighbour can only match within epsilon of the border; search
+        # a bit further, to stay clear of rounding
+        self.margin = 1.5 * epsilon / self.cell
+        self.cells = {}
+        # attributes -> index of the first matching vertex; as vertices are
+        # only ever added with higher indices, a found match stays the first
+        self.matches = {}
+        self.num_vertices = 0
+
+    def get_key(self, attributes):
+        """Return the key of the cell of the attributes."""
+        offset = self.CELL_OFFSET
+        cell = self.cell
+        return tuple(map(math.floor, [value / cell + offset for value in attributes]))
+
+    def get_keys(self, attributes):
+        """Return the key of the cell of every row of attributes, and
+        whether any component of the row is near a cell border.
+
+        :param attributes: The attributes, one row per vertex.
+        :type attributes: :class:`numpy.ndarray`
+        :rtype: :class:`tuple` of :class:`numpy.ndarray`
+        """
+        positions = attributes / self.cell + self.CELL_OFFSET
+        keys = numpy.floor(positions)
+        is_near = ((numpy.floor(positions - self.margin) != keys)
+                   | (numpy.floor(positions + self.margin) != keys)).any(axis=1)
+        return keys.astype(numpy.int64), is_near
+
+    def get_cells(self, attributes):
+        """Return the keys of all cells that can hold a match: the cell of
+        the attributes, and its neighbours along the components near a
+        border."""
+        offset = self.CELL_OFFSET
+        cell = self.cell
+        margin = self.margin
+        positions = [value / cell + offset for value in attributes]
+        key = tuple(map(math.floor, positions))
+        low = tuple(map(math.floor, [pos - margin for pos in positions]))
+        high = tuple(map(math.floor, [pos + margin for pos in positions]))
+        keys = [key]
+        for i, neighbour in enumerate(low):
+            if neighbour == key[i]:
+                neighbour = high[i]
+                if neighbour == key[i]:
+                    continue
+            keys.extend([other[:i] + (neighbour,) + other[i + 1:] for other in keys])
+        return keys
+
+    def find_in_cells(self, vertex_index, attributes, keys):
+        """Return the index of the first added vertex in the given cells
+        that matches, or ``None`` if there is none."""
+        found = None
+        for key in keys:
+            for index, other in self.cells.get((vertex_index, key), ()):
+                if found is not None and index > found:
+                    break
+                if all(abs(value - other_value) <= self.epsilon
+                       for value, other_value in zip(attributes, other)):
+                    found = index
+                    break
+        return found
+
+    def find(self, vertex_index, attributes):
+        """Return the index of the first added vertex that matches, or
+        ``None`` if there is none.
+
+        :param vertex_index: The blender vertex index.
+        :param attributes: Sequence of floats to compare.
+        """
+        attributes = tuple(attributes)
+        found = self.matches.get((vertex_index, attributes))
+        if found is None:
+            found = self.find_in_cells(vertex_index, attributes, self.get_cells(attributes))
+            if found is not None:
+                self.matches[(vertex_index, attributes)] = found
+        return found
+
+    def add(self, vertex_index, attributes, index, key=None):
+        """Add a vertex; indices must be added in increasing order, and only
+        for attributes that :meth:`find` did not match."""
+        attributes = tuple(attributes)
+        if key is None:
+            key = self.get_key(attributes)
+        self.cells.setdefault((vertex_index, key), []).append((index, attributes))
+        # no earlier vertex matches, so this one is the first match
+        self.matches[(vertex_index, attributes)] = index
+        self.num_vertices = index + 1
+
+
+def _get_row_hashes(columns):
+    """Return a 64 bit hash of every row of an integer array."""
+    hashes = numpy.zeros(len(columns), dtype=numpy.uint64)
+    for column in columns.T:
+        # FNV style; products wrap around
+        hashes = (hashes * numpy.uint64(0x100000001b3)) ^ column
+    return hashes
+
+
+def _get_unique_rows(columns):
+    """Return the first row of every distinct row of an integer array, in
+    order, and for every row, the index of its distinct row."""
+    _, first, inverse = numpy.unique(
+        _get_row_hashes(columns), return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    if not (columns[first[inverse]] == columns).all():
+        # hash collision: sort the rows themselves
+        rows = numpy.ascontiguousarray(columns)
+        row_bytes = rows.view(numpy.dtype((numpy.void, rows.itemsize * rows.shape[1]))).ravel()
+        _, first, inverse = numpy.unique(row_bytes, return_index=True, return_inverse=True)
+        inverse = inverse.ravel()
+    # number the distinct rows in order of first occurrence
+    order = numpy.argsort(first)
+    rank = numpy.empty(len(order), dtype=numpy.int64)
+    rank[order] = numpy.arange(len(order))
+    return first[order], rank[inverse]
+
+
+def find_vertices(vertex_indices, attributes, epsilon):
+    """Merge rows of vertex attributes, as looking up every row in turn in
+    a :class:`VertexHash`, and adding it as a new vertex if it does not
+    match any vertex added before, would do.
+
+    Equal rows always get the same vertex, so only the distinct rows are
+    looked up. A row which is alone in its cell, and not near a border,
+    cannot match any other row, so it is a new vertex and is not looked up
+    at all.
+
+    :param vertex_indices: The blender vertex index of every row.
+    :type vertex_indices: :class:`numpy.ndarray`
+    :param attributes: The floats to compare, one row per lookup.
+    :type attributes: :class:`numpy.ndarray`
+    :param epsilon: Tolerance for every attribute.
+    :type epsilon: :class:`float`
+    :return: The vertex index of every row, and the row of every vertex,
+        that is the first row which has it.
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    vertex_indices = numpy.asarray(vertex_indices, dtype=numpy.int64)
+    num_rows = len(vertex_indices)
+    if not num_rows:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    attributes = numpy.asarray(attributes, dtype=numpy.float64)
+    if attributes.ndim != 2:
+        attributes = attributes.reshape(num_rows, -1)
+    # rows are equal if their bits are
+    first, rows = _get_unique_rows(numpy.column_stack((
+        vertex_indices.view(numpy.uint64),
+        numpy.ascontiguousarray(attributes).view(numpy.uint64))))
+    unique_vertices = vertex_indices[first]
+    unique_attributes = attributes[first]
+    vertex_hash = VertexHash(epsilon)
+    keys, is_near = vertex_hash.get_keys(unique_attributes)
+    # distinct rows which share their cell with another row
+    _, cells = _get_unique_rows(numpy.column_stack((
+        unique_vertices.view(numpy.uint64), keys.view(numpy.uint64))))
+    is_shared = (numpy.bincount(cells)[cells] > 1)
+    is_added = ~(is_near | is_shared)
+    num_isolated_before = numpy.cumsum(is_added) - is_added
+    results = numpy.empty(len(first), dtype=numpy.int64)
+    num_added = 0
+    for row in numpy.flatnonzero(is_near | is_shared).tolist():
+        vertex_index = int(unique_vertices[row])
+        row_attributes = tuple(unique_attributes[row].tolist())
+        key = tuple(keys[row].tolist())
+        found = vertex_hash.find_in_cells(
+            vertex_index, row_attributes,
+            vertex_hash.get_cells(row_attributes) if is_near[row] else (key,))
+        if found is None:
+            # as many vertices as were added before, by any row
+            found = int(num_isolated_before[row]) + num_added
+            vertex_hash.add(vertex_index, row_attributes, found, key)
+            is_added[row] = True
+            num_added += 1
+        results[row] = found
+    vertex_order = numpy.cumsum(is_added) - 1
+    results[is_added] = vertex_order[is_added]
+    return results[rows], first[is_added]
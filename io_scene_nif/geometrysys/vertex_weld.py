@@ -0,0 +1,130 @@
+"""This script contains helper methods to weld vertices with identical location and normal."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy
+
+
+def quantize(values, resolution):
+    """Quantize float values to integers, truncating towards zero exactly
+    like ``int(value * resolution)`` does.
+
+    :param values: The float values.
+    :type values: :class:`numpy.ndarray`
+    :param resolution: Number of integer steps per unit.
+    :type resolution: :class:`int`
+    :return: The quantized values.
+    :rtype: :class:`numpy.ndarray`
+    """
+    return numpy.trunc(numpy.asarray(values, dtype=numpy.float64) * resolution).astype(numpy.int64)
+
+
+def unique_rows(keys):
+    """Find the unique rows of an integer array, numbered in order of first
+    occurrence.
+
+    :param keys: The keys, one row per element.
+    :type keys: :class:`numpy.ndarray`
+    :return: A pair (index_map, first_index), where index_map[i] is the
+        number of the unique row of element i, and first_index[j] is the
+        index of the first element having unique row j.
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    keys = numpy.asarray(keys)
+    num_keys = len(keys)
+    if not num_keys:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    keys = keys.reshape(num_keys, -1)
+    # lexsort is stable, so within each group of equal rows the first
+    # element in sorted order is also the first one in the original order
+    order = numpy.lexsort(keys.T[::-1])
+    sorted_keys = keys[order]
+    is_first = numpy.empty(num_keys, dtype=bool)
+    is_first[0] = True
+    numpy.any(sorted_keys[1:] != sorted_keys[:-1], axis=1, out=is_first[1:])
+    group_sorted = numpy.cumsum(is_first) - 1
+    group_first = order[is_first]
+    # renumber the groups in order of first occurrence
+    group_rank = numpy.argsort(group_first, kind="mergesort")
+    group_number = numpy.empty_like(group_rank)
+    group_number[group_rank] = numpy.arange(len(group_rank))
+    index_map = numpy.empty(num_keys, dtype=numpy.int64)
+    index_map[order] = group_number[group_sorted]
+    return index_map, group_first[group_rank]
+
+
+def weld_vertices(coords, normals, vertex_resolution, normal_resolution):
+    """Merge vertices whose location, and normal if present, are equal up
+    to the given resolutions. Two vertices are merged when they have the
+    same key, the key being the tuple of ``int(x * vertex_resolution)`` for
+    every coordinate x and ``int(n * normal_resolution)`` for every normal
+    component n.
+
+    :param coords: The vertex coordinates, one row per vertex.
+    :type coords: :class:`numpy.ndarray`
+    :param normals: The vertex normals, one row per vertex, or ``None``.
+    :type normals: :class:`numpy.ndarray`
+    :param vertex_resolution: Number of key steps per unit of distance.
+    :type vertex_resolution: :class:`int`
+    :param normal_resolution: Number of key steps per unit of normal.
+    :type normal_resolution: :class:`int`
+    :return: A pair (v_map, unique), where vertex i maps to welded vertex
+        v_map[i], and welded vertex j is the original vertex unique[j].
+    :rtype: :class:`tuple` of :class:`numpy.ndarray`
+    """
+    keys = quantize(coords, vertex_resolution).reshape(-1, 3)
+    if normals is not None:
+        keys = numpy.hstack((keys, quantize(normals, normal_resolution).reshape(-1, 3)))
+    return unique_rows(keys)
+
+
+def inverse_map(v_map, size):
+    """Invert a vertex map, picking the last vertex if several vertices map
+    to the same welded vertex.
+
+    :param v_map: The vertex map, vertex i maps to welded vertex v_map[i].
+    :param size: Number of welded vertices.
+    :type size: :class:`int`
+    :return: For every welded vertex, the last vertex mapped to it, or -1
+        if no vertex maps to it.
+    :rtype: :class:`numpy.ndarray`
+    """
+    v_map = numpy.asarray(v_map, dtype=numpy.int64)
+    inverse = numpy.full(size, -1, dtype=numpy.int64)
+    numpy.maximum.at(inverse, v_map, numpy.arange(len(v_map)))
+    return inverse
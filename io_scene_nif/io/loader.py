@@ -0,0 +1,117 @@
+"""This module is used to load the files of an import concurrently"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2016, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+from concurrent.futures import ThreadPoolExecutor
+
+from io_scene_nif.utility.nif_logging import NifLog
+
+
+class FileLoader():
+    """Parse the files of an import on a pool of worker threads, so that
+    side files such as keyframe and FaceGen files are read while the main
+    thread works on the nif.
+
+    Only waiting on the disk overlaps: parsing is pure Python, and holds
+    the global interpreter lock, so files are not parsed any faster than
+    one after another. What is gained is reading a file while another one
+    is parsed or imported, which matters for slow or network drives.
+
+    Messages logged by the workers are queued by :class:`NifLog` and passed
+    on when the main thread picks up a result, and exceptions raised while
+    loading are raised again at that point, for instance::
+
+        with FileLoader() as loader:
+            nif_future = loader.submit(NifFile.load_nif, nif_path)
+            kf_future = loader.submit(KFFile.load_kf, kf_path)
+            nif_data = loader.result(nif_future)
+            ...
+            kf_data = loader.result(kf_future)
+    """
+
+    def __init__(self, max_workers=3):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(wait=exc_type is None)
+        return False
+
+    def submit(self, load, *args):
+        """Start ``load(*args)`` on a worker thread.
+
+        :return: A future for the result, to be passed to :meth:`result`.
+        :rtype: :class:`concurrent.futures.Future`
+        """
+        future = self.executor.submit(load, *args)
+        self.futures.append(future)
+        return future
+
+    @staticmethod
+    def result(future):
+        """Wait for a load to finish, report its messages and return its
+        result. Exceptions raised by the load are raised again here.
+
+        :param future: A future returned by :meth:`submit`, or ``None``.
+        :return: The result of the load, or ``None`` if future is ``None``.
+        """
+        if future is None:
+            return None
+        try:
+            return future.result()
+        finally:
+            NifLog.flush()
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads.
+
+        :param wait: Whether to wait for all loads to finish. If not, loads
+            which have not started yet are cancelled, and those which have
+            finish in the background, their results being dropped; use
+            this once the import failed.
+        :type wait: :class:`bool`
+        """
+        if not wait:
+            for future in self.futures:
+                future.cancel()
+        self.futures = []
+        self.executor.shutdown(wait=wait)
+        NifLog.flush()
@@ -38,10 +38,15 @@
 # ***** END LICENSE BLOCK *****
 
 
+import struct
+
 from pyffi.formats.nif import NifFormat
 from io_scene_nif.utility.nif_logging import NifLog
 from io_scene_nif.utility.nif_utils import NifError
 
+# first version that stores the size of every block in the header
+BLOCK_SIZE_VERSION = 0x14020007
+
 class NifFile():
     """Class to load and save a NifFile"""
     
@@ -67,4 +72,204 @@ class NifFile():
                 raise NifError("Not a NIF file.")
             
         return nif_data
-        
\ No newline at end of file
+
+    @staticmethod
+    def load_nif_selective(file_path, names=None, skip_types=()):
+        """Loads only part of a nif from the given file path.
+
+        Only blocks reachable from the roots are read, where the roots are
+        the blocks named in names, or the roots of the file if names is
+        ``None``. Blocks pointed to (rather than referred to) by a read
+        block are read too, but their children are not. The payload of
+        blocks of a type in skip_types is never read; such blocks keep
+        their default values.
+
+        Skipping blocks needs the block sizes from the header, so files
+        older than 20.2.0.7 are read completely, and only the roots are
+        selected. The same goes if pyffi lacks the link fixing state which
+        the selective reader takes over.
+
+        :param file_path: Path of the nif file.
+        :param names: Names of the blocks to use as roots, or ``None``.
+        :type names: :class:`set` of :class:`str` or :class:`bytes`
+        :param skip_types: Block types whose payload is not read.
+        :type skip_types: :class:`tuple`
+        :return: The nif data.
+        """
+        NifLog.info("Importing {0}".format(file_path))
+
+        nif_data = NifFormat.Data()
+
+        # open file for binary reading
+        with open(file_path, "rb") as nif_stream:
+            # check if nif file is valid
+            nif_data.inspect_version_only(nif_stream)
+            if nif_data.version == -1:
+                raise NifError("Unsupported NIF version.")
+            elif nif_data.version < 0:
+                raise NifError("Not a NIF file.")
+            NifLog.info("NIF file version: {0}".format(nif_data.version, "x"))
+            if nif_data.version < BLOCK_SIZE_VERSION or not _SelectiveReader.is_supported():
+                NifLog.info("Reading file")
+                nif_data.read(nif_stream)
+                if names is not None:
+                    names = set(name.encode() if isinstance(name, str) else name for name in names)
+                    nif_data.roots = [block for block in nif_data.blocks
+                                      if isinstance(block, NifFormat.NiObjectNET)
+                                      and block.name in names]
+            else:
+                NifLog.info("Reading selected blocks")
+                _SelectiveReader(nif_data, nif_stream, skip_types).read(names)
+
+        return nif_data
+
+
+class _SelectiveBlockDict(dict):
+    """Maps block index to block, like the dictionary pyffi uses while
+    fixing links, but creates the blocks on first access, so that blocks
+    are only created once something links to them."""
+
+    def __init__(self, reader):
+        dict.__init__(self)
+        self.reader = reader
+
+    def __missing__(self, block_index):
+        block = self.reader.create_block(block_index)
+        self[block_index] = block
+        return block
+
+
+class _SelectiveReader():
+    """Reads the blocks of a nif on demand, seeking to each block through
+    the block sizes of the header. It takes over the link stack, string
+    list and block dictionary which pyffi keeps on the data while reading.
+    """
+
+    #: The attributes of pyffi's nif data used for fixing links.
+    LINK_ATTRIBUTES = ("_link_stack", "_string_list", "_block_dct")
+
+    def __init__(self, nif_data, nif_stream, skip_types):
+        self.data = nif_data
+        self.stream = nif_stream
+        self.skip_types = tuple(skip_types)
+        # maps id of every created block to its index
+        self.block_indices = {}
+
+    @classmethod
+    def is_supported(cls):
+        """Whether pyffi fixes links the way this reader expects."""
+        return all(hasattr(NifFormat.Data, name) for name in cls.LINK_ATTRIBUTES)
+
+    def read(self, names):
+        data = self.data
+        data.header.read(self.stream, data=data)
+        header = data.header
+        # offset of every block, and of the footer
+        self.offsets = [self.stream.tell()]
+        for size in header.block_size:
+            self.offsets.append(self.offsets[-1] + size)
+
+        data._link_stack = []
+        data._string_list = [s for s in header.strings]
+        data._block_dct = _SelectiveBlockDict(self)
+        self.read_blocks = set()
+
+        # read footer
+        self.stream.seek(self.offsets[-1])
+        ftr = NifFormat.Footer()
+        ftr.read(self.stream, data)
+        ftr.fix_links(data)
+        if names is None:
+            data.roots = list(ftr.roots)
+        else:
+            data.roots = self.find_named_blocks(
+                set(name.encode() if isinstance(name, str) else name for name in names))
+
+        # read everything the roots refer to
+        follow = list(data.roots)
+        followed = set()
+        while follow:
+            block = follow.pop()
+            if id(block) in followed:
+                continue
+            followed.add(id(block))
+            self.read_block(block)
+            links = block.get_links(data)
+            refs = block.get_refs(data)
+            for ref in refs:
+                follow.append(ref)
+            # blocks up the tree are read, but not their children
+            ref_ids = set(id(ref) for ref in refs)
+            for link in links:
+                if id(link) not in ref_ids:
+                    self.read_block(link)
+        data.blocks = [data._block_dct[block_index]
+                       for block_index in sorted(data._block_dct)
+                       if block_index in self.read_blocks]
+        NifLog.info("Read {0} of {1} blocks".format(len(data.blocks), header.num_blocks))
+
+    def get_block_type(self, block_index):
+        """Return the block type name and extra data stream info."""
+        header = self.data.header
+        block_type = header.block_types[header.block_type_index[block_index] & 0xfff]
+        block_type = block_type.decode("ascii")
+        if block_type.startswith("NiDataStream\x01"):
+            block_type, usage, access = block_type.split("\x01")
+            return block_type, (int(usage), int(access))
+        return block_type, None
+
+    def get_block_class(self, block_index):
+        """Return the pyffi class of a block. Raise a NifError if the index
+        or the type of the block is invalid."""
+        if not 0 <= block_index < self.data.header.num_blocks:
+            raise NifError("Invalid block index {0}: corrupt NIF file?".format(block_index))
+        block_type, _ = self.get_block_type(block_index)
+        try:
+            return getattr(NifFormat, block_type)
+        except AttributeError:
+            raise NifError("Unknown block type '{0}'.".format(block_type))
+
+    def create_block(self, block_index):
+        block = self.get_block_class(block_index)()
+        self.block_indices[id(block)] = block_index
+        return block
+
+    def get_index(self, block):
+        return self.block_indices[id(block)]
+
+    def read_block(self, block):
+        """Read the payload of a block and fix its links, unless it was
+        read already or its type is skipped."""
+        block_index = self.get_index(block)
+        if block_index in self.read_blocks:
+            return
+        self.read_blocks.add(block_index)
+        if isinstance(block, self.skip_types):
+            return
+        data = self.data
+        self.stream.seek(self.offsets[block_index])
+        block.read(self.stream, data)
+        _, stream_info = self.get_block_type(block_index)
+        if stream_info:
+            block.usage = stream_info[0]
+            block.access.populate_attribute_values(stream_info[1], data)
+        if self.stream.tell() != self.offsets[block_index + 1]:
+            NifLog.warn("Block size check failed for {0}: corrupt NIF file?".format(block.__class__.__name__))
+        # the link stack only holds the links of this block
+        block.fix_links(data)
+
+    def find_named_blocks(self, names):
+        """Find the blocks with the given names, reading only their name.
+        In nifs with block sizes, the name is the first field of every
+        NiObjectNET, stored as an index in the header string list."""
+        data = self.data
+        header = data.header
+        blocks = []
+        for block_index in range(header.num_blocks):
+            if not issubclass(self.get_block_class(block_index), NifFormat.NiObjectNET):
+                continue
+            self.stream.seek(self.offsets[block_index])
+            string_index, = struct.unpack(data._byte_order + 'i', self.stream.read(4))
+            if 0 <= string_index < len(header.strings) and header.strings[string_index] in names:
+                blocks.append(data._block_dct[block_index])
+        return blocks
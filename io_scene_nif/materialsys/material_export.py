@@ -100,10 +100,7 @@ class Material():
         # search for duplicate
         # (ignore the name string as sometimes import needs to create different
         # materials even when NiMaterialProperty is the same)
-        for block in self.nif_export.dict_blocks:
-            if not isinstance(block, NifFormat.NiMaterialProperty):
-                continue
-
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiMaterialProperty):
             # when optimization is enabled, ignore material name
             if self.nif_export.EXPORT_OPTIMIZE_MATERIALS:
                 ignore_strings = not(block.name in specialnames)
@@ -93,6 +93,10 @@ class NifCommon:
     
     # dictionary of texture files, to reuse textures
     dict_textures = {}
+
+    # dictionary of resolved texture paths, maps import folder and texture
+    # file name to found file and image
+    dict_texture_sources = {}
     dict_mesh_uvlayers = []
 
     VERTEX_RESOLUTION = 1000
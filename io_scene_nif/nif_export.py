@@ -39,8 +39,10 @@
 
 
 from io_scene_nif.nif_common import NifCommon
+from io_scene_nif.geometrysys.geometry_pool import GeometryPool
 from io_scene_nif.utility import nif_utils
 from io_scene_nif.utility.nif_logging import NifLog
+from io_scene_nif.utility.nif_names import NameRegistry
 
 from io_scene_nif.animationsys.animation_export import AnimationHelper
 from io_scene_nif.collisionsys.collision_export import bhkshape_export, bound_export
@@ -129,7 +131,16 @@ class NifExport(NifCommon):
         self.dict_havok_objects = {}
         self.dict_names = {}
         self.dict_blocks = {}
+        self.dict_blocks_by_type = {}
+        self.dict_nodes_by_name = {}
+        self.unnamed_nodes = {}
+        # id of every indexed node -> (name it is indexed by, order)
+        self.dict_node_keys = {}
+        self.block_counter = 0
         self.dict_block_names = []
+        self.name_registry = NameRegistry()
+        # compute geometry on worker processes, if enabled
+        self.geometry_pool = GeometryPool(None if NifOp.props.parallel_geometry else 0)
         self.dict_materials = {}
         self.dict_textures = {}
         self.dict_mesh_uvlayers = []
@@ -209,7 +220,15 @@ class NifExport(NifCommon):
 
             # smoothen seams of objects
             if NifOp.props.smooth_object_seams:
-                self.objecthelper.mesh_helper.smooth_mesh_seams(bpy.context.scene.objects)
+                # only the meshes that are exported, that is, the root
+                # objects and all their descendants
+                b_export_objs = []
+                b_objs = sorted(root_objects, key=lambda b_obj: b_obj.name)
+                while b_objs:
+                    b_obj = b_objs.pop()
+                    b_export_objs.append(b_obj)
+                    b_objs.extend(b_obj.children)
+                self.objecthelper.mesh_helper.smooth_mesh_seams(b_export_objs)
                 
                 
             # TODO: use Blender actions for animation groups
@@ -267,6 +286,9 @@ class NifExport(NifCommon):
                 # no parents
                 self.objecthelper.export_node(root_object, 'localspace', root_block, root_object.name)
 
+            # attach the geometry computed while walking the scene
+            self.geometry_pool.finish()
+
             # post-processing:
             # ----------------
 
@@ -275,12 +297,11 @@ class NifExport(NifCommon):
             NifLog.info("Checking animation groups")
             if not animtxt:
                 has_controllers = False
-                for block in self.dict_blocks:
-                    # has it a controller field?
-                    if isinstance(block, NifFormat.NiObjectNET):
-                        if block.controller:
-                            has_controllers = True
-                            break
+                for block in self.objecthelper.get_blocks(NifFormat.NiObjectNET):
+                    # has it a controller?
+                    if block.controller:
+                        has_controllers = True
+                        break
                 if has_controllers:
                     NifLog.info("Defining default animation group.")
                     # write the animation group text buffer
@@ -292,11 +313,8 @@ class NifExport(NifCommon):
             # if we are in that situation, add a trivial keyframe animation
             NifLog.info("Checking controllers")
             if animtxt and NifOp.props.game == 'MORROWIND':
-                has_keyframecontrollers = False
-                for block in self.dict_blocks:
-                    if isinstance(block, NifFormat.NiKeyframeController):
-                        has_keyframecontrollers = True
-                        break
+                has_keyframecontrollers = bool(
+                    self.objecthelper.get_blocks(NifFormat.NiKeyframeController))
                 if ((not has_keyframecontrollers)
                     and (not NifOp.props.bs_animation_node)):
                     NifLog.info("Defining dummy keyframe controller")
@@ -304,22 +322,21 @@ class NifExport(NifCommon):
                     self.animationhelper.export_keyframes(None, 'localspace', root_block)
             if (NifOp.props.bs_animation_node
                 and NifOp.props.game == 'MORROWIND'):
-                for block in self.dict_blocks:
-                    if isinstance(block, NifFormat.NiNode):
-                        # if any of the shape children has a controller
-                        # or if the ninode has a controller
-                        # convert its type
-                        if block.controller or any(
-                            child.controller
-                            for child in block.children
-                            if isinstance(child, NifFormat.NiGeometry)):
-                            new_block = NifFormat.NiBSAnimationNode().deepcopy(
-                                block)
-                            # have to change flags to 42 to make it work
-                            new_block.flags = 42
-                            root_block.replace_global_node(block, new_block)
-                            if root_block is block:
-                                root_block = new_block
+                for block in self.objecthelper.get_blocks(NifFormat.NiNode):
+                    # if any of the shape children has a controller
+                    # or if the ninode has a controller
+                    # convert its type
+                    if block.controller or any(
+                        child.controller
+                        for child in block.children
+                        if isinstance(child, NifFormat.NiGeometry)):
+                        new_block = NifFormat.NiBSAnimationNode().deepcopy(
+                            block)
+                        # have to change flags to 42 to make it work
+                        new_block.flags = 42
+                        self.objecthelper.replace_block(root_block, block, new_block)
+                        if root_block is block:
+                            root_block = new_block
 
             # oblivion skeleton export: check that all bones have a
             # transform controller and transform interpolator
@@ -328,30 +345,28 @@ class NifExport(NifCommon):
                 # here comes everything that is Oblivion skeleton export
                 # specific
                 NifLog.info("Adding controllers and interpolators for skeleton")
-                for block in list(self.dict_blocks.keys()):
-                    if isinstance(block, NifFormat.NiNode) \
-                        and block.name.decode() == "Bip01":
-                        for bone in block.tree(block_type = NifFormat.NiNode):
-                            ctrl = self.objecthelper.create_block("NiTransformController")
-                            interp = self.objecthelper.create_block("NiTransformInterpolator")
-
-                            ctrl.interpolator = interp
-                            bone.add_controller(ctrl)
-
-                            ctrl.flags = 12
-                            ctrl.frequency = 1.0
-                            ctrl.phase = 0.0
-                            ctrl.start_time = self.FLOAT_MAX
-                            ctrl.stop_time = self.FLOAT_MIN
-                            interp.translation.x = bone.translation.x
-                            interp.translation.y = bone.translation.y
-                            interp.translation.z = bone.translation.z
-                            scale, quat = bone.rotation.get_scale_quat()
-                            interp.rotation.x = quat.x
-                            interp.rotation.y = quat.y
-                            interp.rotation.z = quat.z
-                            interp.rotation.w = quat.w
-                            interp.scale = bone.scale
+                for block in self.objecthelper.get_named_nodes("Bip01"):
+                    for bone in block.tree(block_type = NifFormat.NiNode):
+                        ctrl = self.objecthelper.create_block("NiTransformController")
+                        interp = self.objecthelper.create_block("NiTransformInterpolator")
+
+                        ctrl.interpolator = interp
+                        bone.add_controller(ctrl)
+
+                        ctrl.flags = 12
+                        ctrl.frequency = 1.0
+                        ctrl.phase = 0.0
+                        ctrl.start_time = self.FLOAT_MAX
+                        ctrl.stop_time = self.FLOAT_MIN
+                        interp.translation.x = bone.translation.x
+                        interp.translation.y = bone.translation.y
+                        interp.translation.z = bone.translation.z
+                        scale, quat = bone.rotation.get_scale_quat()
+                        interp.rotation.x = quat.x
+                        interp.rotation.y = quat.y
+                        interp.rotation.z = quat.z
+                        interp.rotation.w = quat.w
+                        interp.scale = bone.scale
             else:
                 # here comes everything that should be exported EXCEPT
                 # for Oblivion skeleton exports
@@ -427,11 +442,10 @@ class NifExport(NifCommon):
                     # so calculate mass automatically
                     # first calculate distribution of mass
                     total_mass = 0
-                    for block in self.dict_blocks:
-                        if isinstance(block, NifFormat.bhkRigidBody):
-                            block.update_mass_center_inertia(
-                                solid = self.EXPORT_OB_SOLID)
-                            total_mass += block.mass
+                    for block in self.objecthelper.get_blocks(NifFormat.bhkRigidBody):
+                        block.update_mass_center_inertia(
+                            solid = self.EXPORT_OB_SOLID)
+                        total_mass += block.mass
                     if total_mass == 0:
                         # to avoid zero division error later
                         # (if mass is zero then this does not matter
@@ -439,49 +453,46 @@ class NifExport(NifCommon):
                         total_mass = 1
                     # now update the mass ensuring that total mass is
                     # self.EXPORT_OB_MASS
-                    for block in self.dict_blocks:
-                        if isinstance(block, NifFormat.bhkRigidBody):
-                            mass = self.EXPORT_OB_MASS * block.mass / total_mass
-                            # lower bound on mass
-                            if mass < 0.0001:
-                                mass = 0.05
-                            block.update_mass_center_inertia(
-                                mass = mass,
-                                solid = self.EXPORT_OB_SOLID)
+                    for block in self.objecthelper.get_blocks(NifFormat.bhkRigidBody):
+                        mass = self.EXPORT_OB_MASS * block.mass / total_mass
+                        # lower bound on mass
+                        if mass < 0.0001:
+                            mass = 0.05
+                        block.update_mass_center_inertia(
+                            mass = mass,
+                            solid = self.EXPORT_OB_SOLID)
                 else:
                     # using blender properties, so block.mass *should* have
                     # been set properly
-                    for block in self.dict_blocks:
-                        if isinstance(block, NifFormat.bhkRigidBody):
-                            # lower bound on mass
-                            if block.mass < 0.0001:
-                                block.mass = 0.05
-                            block.update_mass_center_inertia(
-                                mass=block.mass,
-                                solid=self.EXPORT_OB_SOLID)
+                    for block in self.objecthelper.get_blocks(NifFormat.bhkRigidBody):
+                        # lower bound on mass
+                        if block.mass < 0.0001:
+                            block.mass = 0.05
+                        block.update_mass_center_inertia(
+                            mass=block.mass,
+                            solid=self.EXPORT_OB_SOLID)
 
             # bhkConvexVerticesShape of children of bhkListShapes
             # need an extra bhkConvexTransformShape
             # (see issue #3308638, reported by Koniption)
-            # note: self.dict_blocks changes during iteration, so need list copy
-            for block in list(self.dict_blocks):
-                if isinstance(block, NifFormat.bhkListShape):
-                    for i, sub_shape in enumerate(block.sub_shapes):
-                        if isinstance(sub_shape, NifFormat.bhkConvexVerticesShape):
-                            coltf = self.objecthelper.create_block("bhkConvexTransformShape")
-                            coltf.material = sub_shape.material
-                            coltf.unknown_float_1 = 0.1
-                            coltf.unknown_8_bytes[0] = 96
-                            coltf.unknown_8_bytes[1] = 120
-                            coltf.unknown_8_bytes[2] = 53
-                            coltf.unknown_8_bytes[3] = 19
-                            coltf.unknown_8_bytes[4] = 24
-                            coltf.unknown_8_bytes[5] = 9
-                            coltf.unknown_8_bytes[6] = 253
-                            coltf.unknown_8_bytes[7] = 4
-                            coltf.transform.set_identity()
-                            coltf.shape = sub_shape
-                            block.sub_shapes[i] = coltf
+            # note: blocks are created during iteration, get_blocks returns a copy
+            for block in self.objecthelper.get_blocks(NifFormat.bhkListShape):
+                for i, sub_shape in enumerate(block.sub_shapes):
+                    if isinstance(sub_shape, NifFormat.bhkConvexVerticesShape):
+                        coltf = self.objecthelper.create_block("bhkConvexTransformShape")
+                        coltf.material = sub_shape.material
+                        coltf.unknown_float_1 = 0.1
+                        coltf.unknown_8_bytes[0] = 96
+                        coltf.unknown_8_bytes[1] = 120
+                        coltf.unknown_8_bytes[2] = 53
+                        coltf.unknown_8_bytes[3] = 19
+                        coltf.unknown_8_bytes[4] = 24
+                        coltf.unknown_8_bytes[5] = 9
+                        coltf.unknown_8_bytes[6] = 253
+                        coltf.unknown_8_bytes[7] = 4
+                        coltf.transform.set_identity()
+                        coltf.shape = sub_shape
+                        block.sub_shapes[i] = coltf
 
             # export constraints
             for b_obj in self.objecthelper.get_exported_objects():
@@ -551,18 +562,17 @@ class NifExport(NifCommon):
 
             # generate mopps (must be done after applying scale!)
             if NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM'):
-                for block in self.dict_blocks:
-                    if isinstance(block, NifFormat.bhkMoppBvTreeShape):
-                        NifLog.info("Generating mopp...")
-                        block.update_mopp()
-                        #print "=== DEBUG: MOPP TREE ==="
-                        #block.parse_mopp(verbose = True)
-                        #print "=== END OF MOPP TREE ==="
-                        # warn about mopps on non-static objects
-                        if any(sub_shape.layer != 1
-                            for sub_shape in block.shape.sub_shapes):
-                                NifLog.warn("Mopps for non-static objects may not function correctly in-game."
-                                               "You may wish to use simple primitives for collision.")
+                for block in self.objecthelper.get_blocks(NifFormat.bhkMoppBvTreeShape):
+                    NifLog.info("Generating mopp...")
+                    block.update_mopp()
+                    #print "=== DEBUG: MOPP TREE ==="
+                    #block.parse_mopp(verbose = True)
+                    #print "=== END OF MOPP TREE ==="
+                    # warn about mopps on non-static objects
+                    if any(sub_shape.layer != 1
+                        for sub_shape in block.shape.sub_shapes):
+                            NifLog.warn("Mopps for non-static objects may not function correctly in-game."
+                                           "You may wish to use simple primitives for collision.")
 
             # delete original scene root if a scene root object was already defined
             if ((root_block.num_children == 1)
@@ -571,7 +581,7 @@ class NifExport(NifCommon):
                     root_block.children[0].name = filebase
                 NifLog.info("Making '{0}' the root block".format(root_block.children[0].name))
                 # remove root_block from self.dict_blocks
-                self.dict_blocks.pop(root_block)
+                self.objecthelper.unregister_block(root_block)
                 # set new root block
                 old_root_block = root_block
                 root_block = old_root_block.children[0]
@@ -851,6 +861,7 @@ class NifExport(NifCommon):
                 finally:
                     stream.close()
         finally:
+            self.geometry_pool.shutdown()
             # clear progress bar
             NifLog.info("Finished")
 
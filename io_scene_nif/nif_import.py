@@ -43,6 +43,7 @@ from io_scene_nif.utility.nif_logging import NifLog
 from io_scene_nif.io.nif import NifFile
 from io_scene_nif.io.kf import KFFile
 from io_scene_nif.io.egm import EGMFile 
+from io_scene_nif.io.loader import FileLoader
 
 from io_scene_nif.animationsys.animation_import import AnimationHelper
 from io_scene_nif.armaturesys.armature_import import Armature
@@ -52,11 +53,21 @@ from io_scene_nif.materialsys.material_import import Material
 from io_scene_nif.texturesys.texture_import import Texture
 from io_scene_nif.texturesys.texture_loader import TextureLoader
 from io_scene_nif.objectsys.object_import import NiObject
+from io_scene_nif.geometrysys import geometry_data
+from io_scene_nif.geometrysys.mesh_builder import MeshBuilder
+from io_scene_nif.geometrysys.topology import build_polygons
+from io_scene_nif.geometrysys.vertex_groups import group_weights
+from io_scene_nif.geometrysys.vertex_weld import inverse_map, weld_vertices
 from io_scene_nif.scenesys import scene_import
 from io_scene_nif.utility.nif_global import NifOp
 
+import collections
+import os
+import time
+
 import bpy
 import mathutils
+import numpy
 
 import pyffi.spells.nif.fix
 from pyffi.formats.nif import NifFormat
@@ -67,6 +78,8 @@ class NifImport(NifCommon):
     D2R = 3.14159265358979 / 180.0
     IMPORT_EXTRANODES = True
     IMPORT_EXPORTEMBEDDEDTEXTURES = False
+    # number of files parsed ahead in batch imports
+    BATCH_READ_AHEAD = 2
     
     
     def __init__(self, operator, context):
@@ -91,118 +104,34 @@ class NifImport(NifCommon):
     def execute(self):
         """Main import function."""
 
-        self.dict_armatures = {}
-        self.dict_bones_extra_matrix = {}
-        self.dict_bones_extra_matrix_inv = {}
-        self.dict_bone_priorities = {}
-        self.dict_havok_objects = {}
-        self.dict_names = {}
-        self.dict_blocks = {}
-        self.dict_block_names = []
-        self.dict_materials = {}
-        self.dict_textures = {}
-        self.dict_mesh_uvlayers = []
+        self.init_shared_dicts()
+        self.init_file_dicts()
+
+        # worker threads for parsing the files
+        loader = FileLoader()
+        failed = True
 
         # catch nif import errors
         try:
-            # check that one armature is selected in 'import geometry + parent
-            # to armature' mode
-            if NifOp.props.skeleton == "GEOMETRY_ONLY":
-                if (len(self.selected_objects) != 1
-                    or self.selected_objects[0].type != 'ARMATURE'):
-                    raise nif_utils.NifError(
-                        "You must select exactly one armature in"
-                        " 'Import Geometry Only + Parent To Selected Armature'"
-                        " mode.")
-
-
-            self.data = NifFile.load_nif(NifOp.props.filepath)
-            if NifOp.props.override_scene_info:
-                scene_import.import_version_info(self.data)
+            self.check_selection()
 
+            # parse the nif and its side files concurrently
             kf_path = NifOp.props.keyframe_file
-            if kf_path:
-                self.kfdata = KFFile.load_kf(kf_path)
-            else:
-                self.kfdata = None
-
             egm_path = NifOp.props.egm_file
+            nif_future = self.submit_nif(loader, NifOp.props.filepath)
+            kf_future = None
+            if kf_path:
+                kf_future = loader.submit(self.load_kf, kf_path, NifOp.props.animation)
+            egm_future = None
             if egm_path:
-                self.egmdata = EGMFile.load_egm(egm_path)
-                # scale the data
-                self.egmdata.apply_scale(NifOp.props.scale_correction_import)
-            else:
-                self.egmdata = None
-
-            NifLog.info("Importing data")
-            # calculate and set frames per second
-            if NifOp.props.animation:
-                self.fps = self.animationhelper.get_frames_per_second(
-                    self.data.roots
-                    + (self.kfdata.roots if self.kfdata else []))
-                bpy.context.scene.render.fps = self.fps
-
-            # merge skeleton roots and transform geometry into the rest pose
-            if NifOp.props.merge_skeleton_roots:
-                pyffi.spells.nif.fix.SpellMergeSkeletonRoots(data=self.data).recurse()
-            if NifOp.props.send_geoms_to_bind_pos:
-                pyffi.spells.nif.fix.SpellSendGeometriesToBindPosition(data=self.data).recurse()
-            if NifOp.props.send_detached_geoms_to_node_pos:
-                pyffi.spells.nif.fix.SpellSendDetachedGeometriesToNodePosition(data=self.data).recurse()
-            if NifOp.props.send_bones_to_bind_position:
-                pyffi.spells.nif.fix.SpellSendBonesToBindPosition(data=self.data).recurse()
-            if NifOp.props.apply_skin_deformation:
-                
-                # TODO Create function & move to object/mesh class
-                for n_geom in self.data.get_global_iterator():
-                    if not isinstance(n_geom, NifFormat.NiGeometry):
-                        continue
-                    if not n_geom.is_skin():
-                        continue
-                    NifLog.info('Applying skin deformation on geometry {0}'.format(n_geom.name))
-                    vertices = n_geom.get_skin_deformation()[0]
-                    for vold, vnew in zip(n_geom.data.vertices, vertices):
-                        vold.x = vnew.x
-                        vold.y = vnew.y
-                        vold.z = vnew.z
-
-            # scale tree
-            toaster = pyffi.spells.nif.NifToaster()
-            toaster.scale = NifOp.props.scale_correction_import
-            pyffi.spells.nif.fix.SpellScale(data=self.data, toaster=toaster).recurse()
-
-            # import all root blocks
-            for block in self.data.roots:
-                root = block
-                # root hack for corrupt better bodies meshes
-                # and remove geometry from better bodies on skeleton import
-                for b in (b for b in block.tree()
-                          if isinstance(b, NifFormat.NiGeometry)
-                          and b.is_skin()):
-                    # check if root belongs to the children list of the
-                    # skeleton root (can only happen for better bodies meshes)
-                    if root in [c for c in b.skin_instance.skeleton_root.children]:
-                        # fix parenting and update transform accordingly
-                        b.skin_instance.data.set_transform(
-                            root.get_transform()
-                            * b.skin_instance.data.get_transform())
-                        b.skin_instance.skeleton_root = root
-                        # delete non-skeleton nodes if we're importing
-                        # skeleton only
-                        if NifOp.props.skeleton == "SKELETON_ONLY":
-                            nonbip_children = (child for child in root.children
-                                               if child.name[:6] != 'Bip01 ')
-                            for child in nonbip_children:
-                                root.remove_child(child)
-                # import this root block
-                NifLog.debug("Root block: {0}".format(root.get_global_display()))
-                # merge animation from kf tree into nif tree
-                if NifOp.props.animation and self.kfdata:
-                    for kf_root in self.kfdata.roots:
-                        self.animationhelper.import_kf_root(kf_root, root)
-                # import the nif tree
-                self.import_root(root)
+                egm_future = loader.submit(self.load_egm, egm_path, NifOp.props.scale_correction_import)
+
+            self.data = loader.result(nif_future)
+            self.import_data(loader, kf_future, egm_future)
+            failed = False
         finally:
+            # a failed import does not wait for its side files
+            loader.shutdown(wait=not failed)
             # clear progress bar
             NifLog.info("Finished")
             # XXX no longer needed?
@@ -210,9 +139,233 @@ class NifImport(NifCommon):
             bpy.context.scene.update()
 
         return {'FINISHED'}
-     
-    
-    
+
+    def execute_batch(self, file_paths):
+        """Import several nif files in one go. Materials and textures are
+        shared by all files, and the next files are parsed while the current
+        one is imported. Keyframe and egm files are not used. A file that
+        fails to import is reported and skipped.
+
+        :param file_paths: The nif files to import.
+        :type file_paths: :class:`list` of :class:`str`
+        """
+
+        self.init_shared_dicts()
+
+        # worker threads for parsing the files
+        loader = FileLoader(max_workers=self.BATCH_READ_AHEAD)
+        failed = True
+        # (file path, file size, import time) for every imported file
+        file_stats = []
+        batch_start = time.time()
+
+        try:
+            self.check_selection()
+            if NifOp.props.keyframe_file or NifOp.props.egm_file:
+                NifLog.warn("Keyframe and egm files are ignored when importing several files")
+
+            # parse ahead of the file being imported
+            nif_futures = collections.deque(
+                self.submit_nif(loader, file_path)
+                for file_path in file_paths[:self.BATCH_READ_AHEAD])
+            for file_index, file_path in enumerate(file_paths):
+                file_start = time.time()
+                nif_future = nif_futures.popleft()
+                next_index = file_index + self.BATCH_READ_AHEAD
+                if next_index < len(file_paths):
+                    nif_futures.append(self.submit_nif(loader, file_paths[next_index]))
+                # texture search paths are relative to the file being imported
+                NifOp.props.filepath = file_path
+                self.init_file_dicts()
+                try:
+                    self.data = loader.result(nif_future)
+                    self.import_data(loader, None, None)
+                except Exception as e:
+                    NifLog.warn("Skipped {0}: {1}".format(file_path, e))
+                    continue
+                file_stats.append((file_path, os.path.getsize(file_path), time.time() - file_start))
+            failed = False
+        finally:
+            # a failed batch does not wait for the files read ahead
+            loader.shutdown(wait=not failed)
+            self.report_batch_stats(file_stats, len(file_paths), time.time() - batch_start)
+            bpy.context.scene.update()
+
+        return {'FINISHED'}
+
+    @staticmethod
+    def report_batch_stats(file_stats, num_files, total_time):
+        """Report per file and total throughput of a batch import."""
+        for file_path, file_size, file_time in file_stats:
+            NifLog.info("{0}: {1:.1f} kB in {2:.2f}s".format(
+                os.path.basename(file_path), file_size / 1024.0, file_time))
+        total_size = sum(file_size for file_path, file_size, file_time in file_stats)
+        NifLog.info("Imported {0} of {1} files, {2:.1f} MB in {3:.2f}s: {4:.1f} files/s, {5:.2f} MB/s".format(
+            len(file_stats), num_files, total_size / 1048576.0, total_time,
+            len(file_stats) / total_time if total_time else 0.0,
+            total_size / 1048576.0 / total_time if total_time else 0.0))
+
+    def init_shared_dicts(self):
+        """Reset the dictionaries that can be shared by several files."""
+        self.dict_materials = {}
+        self.dict_textures = {}
+        self.dict_texture_sources = {}
+
+    def init_file_dicts(self):
+        """Reset the dictionaries that refer to the blocks of one file."""
+        self.dict_armatures = {}
+        self.dict_bones_extra_matrix = {}
+        self.dict_bones_extra_matrix_inv = {}
+        self.dict_bone_priorities = {}
+        self.dict_havok_objects = {}
+        self.dict_names = {}
+        self.dict_blocks = {}
+        self.dict_block_names = []
+        self.dict_mesh_uvlayers = []
+
+    def check_selection(self):
+        """Check that one armature is selected in 'import geometry + parent
+        to armature' mode."""
+        if NifOp.props.skeleton == "GEOMETRY_ONLY":
+            if (len(self.selected_objects) != 1
+                or self.selected_objects[0].type != 'ARMATURE'):
+                raise nif_utils.NifError(
+                    "You must select exactly one armature in"
+                    " 'Import Geometry Only + Parent To Selected Armature'"
+                    " mode.")
+
+    def submit_nif(self, loader, file_path):
+        """Start parsing a nif file on a worker thread."""
+        root_names = self.get_root_names()
+        skip_types = self.get_skipped_block_types()
+        if root_names is not None or skip_types:
+            # only read what is imported
+            return loader.submit(NifFile.load_nif_selective, file_path, root_names, skip_types)
+        return loader.submit(NifFile.load_nif, file_path)
+
+    @staticmethod
+    def get_root_names():
+        """Return the names of the nodes to import, or ``None`` to import
+        the whole file."""
+        names = set(name.strip() for name in NifOp.props.root_names.split(","))
+        names.discard("")
+        return names or None
+
+    def import_data(self, loader, kf_future, egm_future):
+        """Import the parsed nif in self.data, waiting for the keyframe and
+        egm files from the loader when needed."""
+        if NifOp.props.override_scene_info:
+            scene_import.import_version_info(self.data)
+
+        self.kfdata, kf_key_times = loader.result(kf_future) or (None, [])
+
+        NifLog.info("Importing data")
+        # calculate and set frames per second
+        if NifOp.props.animation:
+            self.fps = self.animationhelper.get_frames_per_second_from_key_times(
+                self.animationhelper.get_key_times(self.data.roots)
+                + kf_key_times)
+            bpy.context.scene.render.fps = self.fps
+
+        # merge skeleton roots and transform geometry into the rest pose
+        if NifOp.props.merge_skeleton_roots:
+            pyffi.spells.nif.fix.SpellMergeSkeletonRoots(data=self.data).recurse()
+        if NifOp.props.send_geoms_to_bind_pos:
+            pyffi.spells.nif.fix.SpellSendGeometriesToBindPosition(data=self.data).recurse()
+        if NifOp.props.send_detached_geoms_to_node_pos:
+            pyffi.spells.nif.fix.SpellSendDetachedGeometriesToNodePosition(data=self.data).recurse()
+        if NifOp.props.send_bones_to_bind_position:
+            pyffi.spells.nif.fix.SpellSendBonesToBindPosition(data=self.data).recurse()
+        if NifOp.props.apply_skin_deformation:
+            
+            # TODO Create function & move to object/mesh class
+            for n_geom in self.data.get_global_iterator():
+                if not isinstance(n_geom, NifFormat.NiGeometry):
+                    continue
+                if not n_geom.is_skin():
+                    continue
+                NifLog.info('Applying skin deformation on geometry {0}'.format(n_geom.name))
+                vertices = n_geom.get_skin_deformation()[0]
+                for vold, vnew in zip(n_geom.data.vertices, vertices):
+                    vold.x = vnew.x
+                    vold.y = vnew.y
+                    vold.z = vnew.z
+
+        # scale tree
+        toaster = pyffi.spells.nif.NifToaster()
+        toaster.scale = NifOp.props.scale_correction_import
+        pyffi.spells.nif.fix.SpellScale(data=self.data, toaster=toaster).recurse()
+
+        # the egm is only needed once meshes are imported
+        self.egmdata = loader.result(egm_future)
+
+        # import all root blocks
+        for block in self.data.roots:
+            root = block
+            # root hack for corrupt better bodies meshes
+            # and remove geometry from better bodies on skeleton import
+            for b in (b for b in block.tree()
+                      if isinstance(b, NifFormat.NiGeometry)
+                      and b.is_skin()):
+                # check if root belongs to the children list of the
+                # skeleton root (can only happen for better bodies meshes)
+                if root in [c for c in b.skin_instance.skeleton_root.children]:
+                    # fix parenting and update transform accordingly
+                    b.skin_instance.data.set_transform(
+                        root.get_transform()
+                        * b.skin_instance.data.get_transform())
+                    b.skin_instance.skeleton_root = root
+                    # delete non-skeleton nodes if we're importing
+                    # skeleton only
+                    if NifOp.props.skeleton == "SKELETON_ONLY":
+                        nonbip_children = (child for child in root.children
+                                           if child.name[:6] != 'Bip01 ')
+                        for child in nonbip_children:
+                            root.remove_child(child)
+            # import this root block
+            NifLog.debug("Root block: {0}".format(root.get_global_display()))
+            # merge animation from kf tree into nif tree
+            if NifOp.props.animation and self.kfdata:
+                for kf_root in self.kfdata.roots:
+                    self.animationhelper.import_kf_root(kf_root, root)
+            # import the nif tree
+            self.import_root(root)
+
+    @staticmethod
+    def get_skipped_block_types():
+        """Return the types of the blocks whose payload is not needed by
+        the import, so they need not be read from the file."""
+        if NifOp.props.skeleton != "SKELETON_ONLY":
+            return ()
+        # these modify the geometry before the skeleton is imported
+        if (NifOp.props.send_geoms_to_bind_pos
+            or NifOp.props.send_detached_geoms_to_node_pos
+            or NifOp.props.apply_skin_deformation):
+            return ()
+        return (NifFormat.NiGeometryData,
+                NifFormat.AbstractAdditionalGeometryData,
+                NifFormat.NiSkinPartition,
+                NifFormat.NiPixelData,
+                NifFormat.hkPackedNiTriStripsData,
+                NifFormat.bhkCompressedMeshShapeData)
+
+    @staticmethod
+    def load_kf(kf_path, animation):
+        """Load a keyframe file, and if animation is imported, collect its key
+        times. Runs on a worker thread."""
+        kfdata = KFFile.load_kf(kf_path)
+        if animation:
+            return kfdata, AnimationHelper.get_key_times(kfdata.roots)
+        return kfdata, []
+
+    @staticmethod
+    def load_egm(egm_path, scale):
+        """Load and scale an egm file. Runs on a worker thread."""
+        egmdata = EGMFile.load_egm(egm_path)
+        # scale the data
+        egmdata.apply_scale(scale)
+        return egmdata
+
 
     def import_root(self, root_block):
         """Main import function."""
@@ -799,23 +952,18 @@ class NifImport(NifCommon):
             raise nif_utils.NifError("no shape data in %s" % b_name)
 
         # vertices
-        n_verts = niData.vertices
+        n_coords = geometry_data.get_vertices(niData)
 
         # polygons
         poly_gens = [list(tri) for tri in niData.get_triangles()]
 
         # "sticky" UV coordinates: these are transformed in Blender UV's
-        n_uv = list()
-        for i in range(len(niData.uv_sets)):
-            for lw in range(len(niData.uv_sets[i])):
-                n_uvt = list()
-                n_uvt.append(niData.uv_sets[i][lw].u)
-                n_uvt.append(1.0 - (niData.uv_sets[i][lw].v))
-                n_uv.append(tuple(n_uvt))
-        n_uvco = tuple(n_uv)
+        # one array of (u, 1 - v) rows per uv set
+        n_uvco = geometry_data.get_uv_sets(niData)
+        n_uvco[:, :, 1] = 1.0 - n_uvco[:, :, 1]
 
         # vertex normals
-        n_norms = niData.normals
+        n_normals = geometry_data.get_normals(niData)
 
         '''
         Properties
@@ -842,7 +990,7 @@ class NifImport(NifCommon):
         if n_mat_prop or n_shader_prop or n_effect_shader_prop:
             # Texture
             n_texture_prop = None
-            if n_uvco:
+            if len(n_uvco):
                 n_texture_prop = nif_utils.find_property(niBlock,
                                                   NifFormat.NiTexturingProperty)
                 
@@ -940,144 +1088,74 @@ class NifImport(NifCommon):
             material = None
             materialIndex = 0
 
-        # v_map will store the vertex index mapping
-        # nif vertex i maps to blender vertex v_map[i]
-        v_map = [(i) for i in range(len(n_verts))]  # pre-allocate memory, for faster performance
-
         # Following code avoids introducing unwanted cracks in UV seams:
         # Construct vertex map to get unique vertex / normal pair list.
-        # We use a Python dictionary to remove doubles and to keep track of indices.
-        # While we are at it, we also add vertices while constructing the map.
-        n_map = {}
-        b_v_index = len(b_mesh.vertices)
-        for i, v in enumerate(n_verts):
-            # The key k identifies unique vertex /normal pairs.
-            # We use a tuple of ints for key, this works MUCH faster than a
-            # tuple of floats.
-            if n_norms:
-                n = n_norms[i]
-                k = (int(v.x * self.VERTEX_RESOLUTION),
-                     int(v.y * self.VERTEX_RESOLUTION),
-                     int(v.z * self.VERTEX_RESOLUTION),
-                     int(n.x * self.NORMAL_RESOLUTION),
-                     int(n.y * self.NORMAL_RESOLUTION),
-                     int(n.z * self.NORMAL_RESOLUTION))
-            else:
-                k = (int(v.x * self.VERTEX_RESOLUTION),
-                     int(v.y * self.VERTEX_RESOLUTION),
-                     int(v.z * self.VERTEX_RESOLUTION))
-            # check if vertex was already added, and if so, what index
-            try:
-                # this is the bottle neck...
-                # can we speed this up?
-                if not NifOp.props.combine_vertices:
-                    n_map_k = None
-                else:
-                    n_map_k = n_map[k]
-            except KeyError:
-                n_map_k = None
-            if not n_map_k:
-                # not added: new vertex / normal pair
-                n_map[k] = i  # unique vertex / normal pair with key k was added, with NIF index i
-                v_map[i] = b_v_index  # NIF vertex i maps to blender vertex b_v_index
-                # add the vertex
-                if applytransform:
-                    v = mathutils.Vector([v.x, v.y, v.z])
-                    v = v * transform
-                    b_mesh.vertices.add(1)
-                    b_mesh.vertices[-1].co = [v.x, v.y, v.z]
-                else:
-                    b_mesh.vertices.add(1)
-                    b_mesh.vertices[-1].co = [v.x, v.y, v.z]
-                # adds normal info if present (Blender recalculates these when
-                # switching between edit mode and object mode, handled further)
-                # if n_norms:
-                #    mv = b_mesh.vertices[b_v_index]
-                #    n = n_norms[i]
-                #    mv.normal = mathutils.Vector(n.x, n.y, n.z)
-                b_v_index += 1
-            else:
-                # already added
-                # NIF vertex i maps to Blender vertex v_map[n_map_k]
-                v_map[i] = v_map[n_map_k]
+        # Vertices are keyed on their location and normal, quantized with
+        # VERTEX_RESOLUTION and NORMAL_RESOLUTION, and all keys are
+        # compared at once.
+        if NifOp.props.combine_vertices:
+            v_map, n_unique = weld_vertices(n_coords, n_normals,
+                                            self.VERTEX_RESOLUTION,
+                                            self.NORMAL_RESOLUTION)
+        else:
+            v_map = n_unique = numpy.arange(len(n_coords))
         # report
-        NifLog.debug("{0} unique vertex-normal pairs".format(str(len(n_map))))
-        # release memory
-        del n_map
+        NifLog.debug("{0} unique vertex-normal pairs".format(str(len(n_unique))))
+
+        # add the vertices
+        # (normals are recalculated by Blender when switching between edit
+        # mode and object mode)
+        b_mesh_builder = MeshBuilder(b_mesh)
+        b_v_coords = n_coords[n_unique]
+        if applytransform:
+            b_v_coords = MeshBuilder.transform_coords(b_v_coords, transform)
+        b_v_index = b_mesh_builder.add_vertices(b_v_coords)
+
+        # v_map will store the vertex index mapping
+        # nif vertex i maps to blender vertex v_map[i]
+        v_map = (v_map + b_v_index).tolist()
 
         # Adds the polygons to the mesh
-        f_map = [None] * len(poly_gens)
-        b_f_index = len(b_mesh.polygons)
-        bf2_index = len(b_mesh.polygons)
+        # degenerate and duplicate polygons are removed, these satisfy
+        # f_map[i] = -1
+        f_map, b_loop_vertices, b_loop_totals = build_polygons(poly_gens, v_map)
+        num_new_faces = len(b_loop_totals)
         bl_index = len(b_mesh.loops)
-        poly_count = len(poly_gens)
-        b_mesh.polygons.add(poly_count)
-        b_mesh.loops.add(poly_count * 3)
-        num_new_faces = 0  # counter for debugging
-        unique_faces = list()  # to avoid duplicate polygons
-        tri_point_list = list()
-        for i, f in enumerate(poly_gens):
-            # get face index
-            f_verts = [v_map[vert_index] for vert_index in f]
-            if tuple(f_verts) in unique_faces:
-                continue
-            unique_faces.append(tuple(f_verts))
-            f_map[i] = b_f_index
-            tri_point_list.append(len(poly_gens[i]))
-            ls_list = list()
-            b_f_index += 1
-            num_new_faces += 1
-        for ls1 in range(0, num_new_faces * (tri_point_list[len(ls_list)]), (tri_point_list[len(ls_list)])):
-            ls_list.append((ls1 + bl_index))
-        for i in range(len(unique_faces)):
-            if f_map[i] is None:
-                continue
-            b_mesh.polygons[f_map[i]].loop_start = ls_list[(f_map[i] - bf2_index)]
-            b_mesh.polygons[f_map[i]].loop_total = len(unique_faces[(f_map[i] - bf2_index)])
-            l = 0
-            lp_points = [v_map[loop_point] for loop_point in poly_gens[(f_map[i] - bf2_index)]]
-            while l < (len(poly_gens[(f_map[i] - bf2_index)])):
-                b_mesh.loops[(l + (bl_index))].vertex_index = lp_points[l]
-                l += 1
-            bl_index += (len(poly_gens[(f_map[i] - bf2_index)]))
-            
-        # at this point, deleted polygons (degenerate or duplicate)
-        # satisfy f_map[i] = None
+        bf2_index = b_mesh_builder.add_polygons(b_loop_vertices, b_loop_totals)
+        f_map[f_map >= 0] += bf2_index
 
         NifLog.debug("{0} unique polygons".format(num_new_faces))
 
         # set face smoothing and material
-        for b_polysmooth_index in f_map:
-            if b_polysmooth_index is None:
-                continue
-            polysmooth = b_mesh.polygons[b_polysmooth_index]
-            polysmooth.use_smooth = True if (n_norms or niBlock.skin_instance) else False
-            polysmooth.material_index = materialIndex
+        b_mesh_builder.set_polygon_attributes(
+            bf2_index,
+            use_smooth=bool(n_normals is not None or niBlock.skin_instance),
+            material_index=materialIndex)
         # vertex colors
         
 
-        if b_mesh.polygons and niData.vertex_colors:
-            n_vcol_map = list()
-            for n_vcol, n_vmap in zip(niData.vertex_colors, v_map):
-                n_vcol_map.append((n_vcol, n_vmap))
-            
+        n_vcols = geometry_data.get_vertex_colors(niData)
+        if b_mesh.polygons and n_vcols is not None:
+
             # create vertex_layers
             if not "VertexColor" in b_mesh.vertex_colors:
                 b_mesh.vertex_colors.new(name="VertexColor")  # color layer
                 b_mesh.vertex_colors.new(name="VertexAlpha")  # greyscale
-            
+
             # Mesh Vertex Color / Mesh Face
-            for b_polygon_loop in b_mesh.loops:
-                b_loop_index = b_polygon_loop.index
-                vcol = b_mesh.vertex_colors["VertexColor"].data[b_loop_index]
-                vcola = b_mesh.vertex_colors["VertexAlpha"].data[b_loop_index]
-                for n_col_index, n_map_index in n_vcol_map:
-                    if n_map_index == b_polygon_loop.vertex_index:
-                        col_list = n_col_index
-                        vcol.color.r = col_list.r
-                        vcol.color.g = col_list.g
-                        vcol.color.b = col_list.b
-                        vcola.color.v = col_list.a
+            # every Blender vertex takes the color of the last NIF vertex
+            # that was welded into it
+            n_v_map = v_map[:len(n_vcols)]
+            n_vcol_index = inverse_map(n_v_map, len(b_mesh.vertices))
+            b_loop_vcol_index = n_vcol_index[b_mesh_builder.get_loop_vertices()]
+            b_loops = numpy.flatnonzero(b_loop_vcol_index >= 0)
+            b_loop_vcols = n_vcols[b_loop_vcol_index[b_loops]]
+            MeshBuilder.foreach_assign(
+                b_mesh.vertex_colors["VertexColor"].data, "color", b_loops,
+                b_loop_vcols[:, :3], numpy.float32, 3)
+            MeshBuilder.foreach_assign(
+                b_mesh.vertex_colors["VertexAlpha"].data, "color", b_loops,
+                numpy.repeat(b_loop_vcols[:, 3:], 3, axis=1), numpy.float32, 3)
             # vertex colors influence lighting...
             # we have to set the use_vertex_color_light flag on the material
             # see below
@@ -1094,33 +1172,19 @@ class NifImport(NifCommon):
         # and b_mesh.faceUV = 1 on such mesh raises a runtime error)
         if b_mesh.polygons:
            
-            # b_mesh.faceUV = 1
-            # b_mesh.vertexUV = 0
-            for i in range(len(niData.uv_sets)):
+            # NIF vertex of every new loop: the loops of the kept polygons
+            n_loop_vertices = numpy.array(poly_gens, dtype=numpy.int64).reshape(-1, 3)
+            n_loop_vertices = n_loop_vertices[f_map >= 0].ravel()
+            for i, n_uv in enumerate(n_uvco):
                 # Set the face UV's for the mesh. The NIF format only supports
                 # vertex UV's, but Blender only allows explicit editing of face
                 # UV's, so load vertex UV's as face UV's
                 uvlayer = self.texturehelper.get_uv_layer_name(i)
                 if not uvlayer in b_mesh.uv_textures:
                     b_mesh.uv_textures.new(uvlayer)
-                    uv_faces = b_mesh.uv_textures.active.data[:]
-                elif uvlayer in b_mesh.uv_textures:
-                    uv_faces = b_mesh.uv_textures[uvlayer].data[:]
-                else:
-                    uv_faces = None
-                if uv_faces:
-                    uvl = b_mesh.uv_layers.active.data[:]
-                    for b_f_index, f in enumerate(poly_gens):
-                        if b_f_index is None:
-                            continue
-                        uvlist = f
-                        v1, v2, v3 = uvlist
-                        # if v3 == 0:
-                        #   v1,v2,v3 = v3,v1,v2
-                        b_poly_index = b_mesh.polygons[b_f_index + bf2_index]
-                        uvl[b_poly_index.loop_start].uv = n_uvco[v1]
-                        uvl[b_poly_index.loop_start + 1].uv = n_uvco[v2]
-                        uvl[b_poly_index.loop_start + 2].uv = n_uvco[v3]
+                MeshBuilder.foreach_update(
+                    b_mesh.uv_layers[uvlayer].data, "uv", bl_index,
+                    n_uv[n_loop_vertices], numpy.float32, 2)
             b_mesh.uv_textures.active_index = 0
 
         if material:
@@ -1139,12 +1203,10 @@ class NifImport(NifCommon):
             # if there's a base texture assigned to this material sets it
             # to be displayed in Blender's 3D view
             # but only if there are UV coordinates
-            if mbasetex and mbasetex.texture and n_uvco:
+            if mbasetex and mbasetex.texture and len(n_uvco):
                 imgobj = mbasetex.texture.image
                 if imgobj:
-                    for b_polyimage_index in f_map:
-                        if b_polyimage_index is None:
-                            continue
+                    for b_polyimage_index in f_map[f_map >= 0].tolist():
                         tface = b_mesh.uv_textures.active.data[b_polyimage_index]
                         # gone in blender 2.5x+?
                         # f.mode = Blender.Mesh.FaceModes['TEX']
@@ -1163,17 +1225,20 @@ class NifImport(NifCommon):
                     continue
                 vertex_weights = boneWeights[idx].vertex_weights
                 groupname = self.dict_names[bone]
-                if not groupname in b_obj.vertex_groups.items():
+                v_group = b_obj.vertex_groups.get(groupname)
+                if not v_group:
                     v_group = b_obj.vertex_groups.new(groupname)
-                for skinWeight in vertex_weights:
-                    vert = skinWeight.index
-                    weight = skinWeight.weight
-                    v_group.add([v_map[vert]], weight, 'REPLACE')
+                # one call for all vertices sharing the same weight
+                b_v_indices = [v_map[skinWeight.index] for skinWeight in vertex_weights]
+                weights = [skinWeight.weight for skinWeight in vertex_weights]
+                for weight, groupverts in group_weights(b_v_indices, weights):
+                    v_group.add(groupverts, weight, 'REPLACE')
 
         # import body parts as vertex groups
         if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
             skinpart_list = []
             bodypart_flag = []
+            bodypart_verts = {}
             skinpart = niBlock.get_skin_partition()
             for bodypart, skinpartblock in zip(
                 skininst.partitions, skinpart.skin_partition_blocks):
@@ -1181,16 +1246,18 @@ class NifImport(NifCommon):
                 bodypart_wrap.set_value(bodypart.body_part)
                 groupname = bodypart_wrap.get_detail_display()
                 # create vertex group if it did not exist yet
-                if not(groupname in b_obj.vertex_groups.items()):
-                    v_group = b_obj.vertex_groups.new(groupname)
+                if not groupname in b_obj.vertex_groups:
+                    b_obj.vertex_groups.new(groupname)
                     skinpart_index = len(skinpart_list)
                     skinpart_list.append((skinpart_index, groupname))
                     bodypart_flag.append(bodypart.part_flag)
                 # find vertex indices of this group
-                groupverts = [v_map[v_index]
-                              for v_index in skinpartblock.vertex_map]
-                # create the group
-                v_group.add(groupverts, 1, 'ADD')
+                bodypart_verts.setdefault(groupname, []).extend(
+                    v_map[v_index] for v_index in skinpartblock.vertex_map)
+            # create the groups, one call for each group
+            for groupname, groupverts in bodypart_verts.items():
+                groupverts = numpy.unique(groupverts).tolist()
+                b_obj.vertex_groups[groupname].add(groupverts, 1, 'ADD')
             b_obj.niftools_part_flags_panel.pf_partcount = len(skinpart_list)
             for i, pl_name in skinpart_list:
                 b_obj_partflag = b_obj.niftools_part_flags.add()
@@ -1205,16 +1272,15 @@ class NifImport(NifCommon):
             if morphCtrl:
                 morphData = morphCtrl.data
                 if morphData.num_morphs:
-                    # insert base key at frame 1, using relative keys
-                    b_mesh.insertKey(1, 'relative')
                     # get name for base key
                     keyname = morphData.morphs[0].frame_name
                     if not keyname:
                         keyname = 'Base'
-                    # set name for base key
-                    b_mesh.key.blocks[0].name = keyname
+                    # insert base key, using relative keys
+                    b_obj.shape_key_add(name=keyname, from_mix=False)
                     # get base vectors and import all morphs
-                    baseverts = morphData.morphs[0].vectors
+                    baseverts = numpy.array([(bv.x, bv.y, bv.z) for bv in morphData.morphs[0].vectors],
+                                            dtype=numpy.float64).reshape(-1, 3)
                     b_ipo = Blender.Ipo.New('Key' , 'KeyIpo')
                     b_mesh.key.ipo = b_ipo
                     for idxMorph in range(1, morphData.num_morphs):
@@ -1224,23 +1290,17 @@ class NifImport(NifCommon):
                             keyname = 'Key %i' % idxMorph
                         NifLog.info("Inserting key '{0}'".format(keyname))
                         # get vectors
-                        morphverts = morphData.morphs[idxMorph].vectors
-                        # for each vertex calculate the key position from base
-                        # pos + delta offset
+                        morphverts = numpy.array([(mv.x, mv.y, mv.z) for mv in morphData.morphs[idxMorph].vectors],
+                                                 dtype=numpy.float64).reshape(-1, 3)
+                        # for all vertices calculate the key position from
+                        # base pos + delta offset
                         assert(len(baseverts) == len(morphverts) == len(v_map))
-                        for bv, mv, b_v_index in zip(baseverts, morphverts, v_map):
-                            base = mathutils.Vector(bv.x, bv.y, bv.z)
-                            delta = mathutils.Vector(mv.x, mv.y, mv.z)
-                            v = base + delta
-                            if applytransform:
-                                v *= transform
-                            b_mesh.vertices[b_v_index].co[0] = v.x
-                            b_mesh.vertices[b_v_index].co[1] = v.y
-                            b_mesh.vertices[b_v_index].co[2] = v.z
-                        # update the mesh and insert key
-                        b_mesh.insertKey(idxMorph, 'relative')
-                        # set name for key
-                        b_mesh.key.blocks[idxMorph].name = keyname
+                        b_v_coords = baseverts + morphverts
+                        if applytransform:
+                            b_v_coords = MeshBuilder.transform_coords(b_v_coords, transform)
+                        # insert key
+                        b_key = b_obj.shape_key_add(name=keyname, from_mix=False)
+                        MeshBuilder.set_shape_key(b_key, b_v_coords, v_map)
                         # set up the ipo key curve
                         try:
                             b_curve = b_ipo.addCurve(keyname)
@@ -1265,26 +1325,21 @@ class NifImport(NifCommon):
                             x = key.value
                             frame = 1 + int(key.time * self.fps + 0.5)
                             b_curve.addBezier((frame, x))
-                        # finally: return to base position
-                        for bv, b_v_index in zip(baseverts, v_map):
-                            base = mathutils.Vector(bv.x, bv.y, bv.z)
-                            if applytransform:
-                                base *= transform
-                            b_mesh.vertices[b_v_index].co[0] = base.x
-                            b_mesh.vertices[b_v_index].co[1] = base.y
-                            b_mesh.vertices[b_v_index].co[2] = base.z
 
         # import facegen morphs
         if self.egmdata:
             # XXX if there is an egm, the assumption is that there is only one
             # XXX mesh in the nif
-            sym_morphs = [list(morph.get_relative_vertices())
+            sym_morphs = [numpy.array(list(morph.get_relative_vertices()),
+                                      dtype=numpy.float64).reshape(-1, 3)
                           for morph in self.egmdata.sym_morphs]
-            asym_morphs = [list(morph.get_relative_vertices())
+            asym_morphs = [numpy.array(list(morph.get_relative_vertices()),
+                                       dtype=numpy.float64).reshape(-1, 3)
                           for morph in self.egmdata.asym_morphs]
 
-            # insert base key at frame 1, using relative keys
-            b_mesh.insertKey(1, 'relative')
+            # insert base key, using relative keys
+            if not b_mesh.shape_keys:
+                b_obj.shape_key_add(name='Basis', from_mix=False)
 
             if self.IMPORT_EGMANIM:
                 # if morphs are animated: create key ipo for mesh
@@ -1303,21 +1358,15 @@ class NifImport(NifCommon):
                 # as sometimes, oddly, the morph has more vertices...
                 # assert(len(verts) == len(morphverts) == len(v_map))
 
-                # for each vertex calculate the key position from base
+                # for all vertices calculate the key position from base
                 # pos + delta offset
-                for bv, mv, b_v_index in zip(n_verts, morphverts, v_map):
-                    base = mathutils.Vector(bv.x, bv.y, bv.z)
-                    delta = mathutils.Vector(mv[0], mv[1], mv[2])
-                    v = base + delta
-                    if applytransform:
-                        v *= transform
-                    b_mesh.vertices[b_v_index].co[0] = v.x
-                    b_mesh.vertices[b_v_index].co[1] = v.y
-                    b_mesh.vertices[b_v_index].co[2] = v.z
-                # update the mesh and insert key
-                b_mesh.insertKey(1, 'relative')
-                # set name for key
-                b_mesh.key.blocks[-1].name = keyname
+                num_verts = min(len(n_coords), len(morphverts))
+                b_v_coords = n_coords[:num_verts] + morphverts[:num_verts]
+                if applytransform:
+                    b_v_coords = MeshBuilder.transform_coords(b_v_coords, transform)
+                # insert key
+                b_key = b_obj.shape_key_add(name=keyname, from_mix=False)
+                MeshBuilder.set_shape_key(b_key, b_v_coords, v_map)
 
                 if self.IMPORT_EGMANIM:
                     # set up the ipo key curve
@@ -1327,7 +1376,7 @@ class NifImport(NifCommon):
                     # constant extrapolation
                     b_curve.extend = Blender.IpoCurve.ExtendTypes.CONST
                     # set up the curve's control points
-                    framestart = 1 + len(b_mesh.key.blocks) * 10
+                    framestart = 1 + len(b_mesh.shape_keys.key_blocks) * 10
                     for frame, value in ((framestart, 0),
                                          (framestart + 5, self.IMPORT_EGMANIMSCALE),
                                          (framestart + 10, 0)):
@@ -1337,16 +1386,7 @@ class NifImport(NifCommon):
                 # set begin and end frame
                 bpy.context.scene.getRenderingContext().startFrame(1)
                 bpy.context.scene.getRenderingContext().endFrame(
-                    11 + len(b_mesh.key.blocks) * 10)
-
-            # finally: return to base position
-            for bv, b_v_index in zip(n_verts, v_map):
-                base = mathutils.Vector(bv.x, bv.y, bv.z)
-                if applytransform:
-                    base *= transform
-                b_mesh.vertices[b_v_index].co[0] = base.x
-                b_mesh.vertices[b_v_index].co[1] = base.y
-                b_mesh.vertices[b_v_index].co[2] = base.z
+                    11 + len(b_mesh.shape_keys.key_blocks) * 10)
 
 
         # import priority if existing
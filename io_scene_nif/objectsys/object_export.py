@@ -37,13 +37,28 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import collections
+import functools
+import itertools
+
 import bpy
 import mathutils
+import numpy
 
 from pyffi.formats.nif import NifFormat
 
+from io_scene_nif.geometrysys import geometry_data
+from io_scene_nif.geometrysys import morph_data
+from io_scene_nif.geometrysys import skin_partition
+from io_scene_nif.geometrysys import tangent_space
+from io_scene_nif.geometrysys import tri_strips
+from io_scene_nif.geometrysys.mesh_partition import MeshPartition
+from io_scene_nif.geometrysys.seam_normals import get_seam_normals
+from io_scene_nif.geometrysys.tri_geometry import build_tri_geometry
+from io_scene_nif.geometrysys.vertex_groups import VertexGroupWeights
 from io_scene_nif.utility import nif_utils
 from io_scene_nif.utility.nif_logging import NifLog
+from io_scene_nif.utility.nif_names import NameRegistry
 from io_scene_nif.utility.nif_global import NifOp
 
 class ObjectHelper():
@@ -70,20 +85,13 @@ class ObjectHelper():
     
     def get_exported_objects(self):
         """Return a list of exported objects."""
-        exported_objects = []
         # iterating over self.nif_export.dict_blocks.itervalues() will count some objects
-        # twice
-        for b_obj in self.nif_export.dict_blocks.values():
-            # skip empty objects
-            if b_obj is None:
-                continue
-            # detect doubles
-            if b_obj in exported_objects:
-                continue
-            # append new object
-            exported_objects.append(b_obj)
+        # twice, so detect doubles with an ordered dict, skipping empty objects
+        exported_objects = collections.OrderedDict(
+            (b_obj, None) for b_obj in self.nif_export.dict_blocks.values()
+            if b_obj is not None)
         # return the list of unique exported objects
-        return exported_objects
+        return list(exported_objects)
     
     
     def register_block(self, block, b_obj = None):
@@ -97,9 +105,115 @@ class ObjectHelper():
             NifLog.info("Exporting {0} block".format(block.__class__.__name__))
         else:
             NifLog.info("Exporting {0} as {1} block".format(b_obj, block.__class__.__name__))
-        self.nif_export.dict_blocks[block] = b_obj
+        self.index_block(block, b_obj)
         return block
 
+    def index_block(self, block, b_obj = None, order = None):
+        """Add a block to the exported blocks, and to the type and name
+        indices.
+
+        @param block: The nif block.
+        @param b_obj: The Blender object.
+        @param order: The position of the block among nodes with the same
+            name, or C{None} to put it after all blocks indexed so far."""
+        if order is None:
+            order = self.nif_export.block_counter
+            self.nif_export.block_counter += 1
+        self.nif_export.dict_blocks[block] = b_obj
+        self.nif_export.dict_blocks_by_type.setdefault(block.__class__, []).append(block)
+        if isinstance(block, NifFormat.NiNode):
+            # nodes are named after creation, so index their name on lookup
+            self.nif_export.unnamed_nodes[id(block)] = (order, block)
+            self.nif_export.dict_node_keys[id(block)] = (None, order)
+
+    def get_node_order(self, block):
+        """Return the position of an indexed node among nodes with the same
+        name, or C{None} if the block is not an indexed node.
+
+        @param block: The nif block."""
+        name, order = self.nif_export.dict_node_keys.get(id(block), (None, None))
+        return order
+
+    def unregister_block(self, block):
+        """Remove a block from the exported blocks, and from the type and name
+        indices.
+
+        @param block: The nif block.
+        @return: The Blender object that was associated with the block."""
+        b_obj = self.nif_export.dict_blocks.pop(block)
+        self.nif_export.dict_blocks_by_type[block.__class__].remove(block)
+        if isinstance(block, NifFormat.NiNode):
+            name, order = self.nif_export.dict_node_keys.pop(id(block))
+            if name is None:
+                del self.nif_export.unnamed_nodes[id(block)]
+            else:
+                del self.nif_export.dict_nodes_by_name[name][id(block)]
+        return b_obj
+
+    def replace_block(self, root_block, old_block, new_block):
+        """Replace a block by another one in the tree of root_block, and
+        in the exported blocks.
+
+        @param root_block: The root of the tree.
+        @param old_block: The block to replace.
+        @param new_block: The replacing block."""
+        root_block.replace_global_node(old_block, new_block)
+        # the new block takes the place of the old one
+        order = self.get_node_order(old_block)
+        self.index_block(new_block, self.unregister_block(old_block), order)
+
+    def get_blocks(self, block_type):
+        """Return all exported blocks of the given type, including blocks
+        of derived types. The list is a copy, so blocks can be created while
+        iterating over it.
+
+        @param block_type: The nif block type (for instance NifFormat.NiNode).
+        @return: The list of blocks."""
+        return [block
+                for cls, blocks in list(self.nif_export.dict_blocks_by_type.items())
+                if issubclass(cls, block_type)
+                for block in blocks]
+
+    def get_named_nodes(self, name):
+        """Return all exported nodes with the given nif name, in the order in
+        which they were registered. Nodes are indexed by the name they have
+        on the first lookup after they were named.
+
+        @param name: The nif name.
+        @type name: C{str}
+        @return: The list of nodes."""
+        unnamed_nodes = {}
+        for node_id, (index, node) in self.nif_export.unnamed_nodes.items():
+            if node.name:
+                node_name = node.name.decode()
+                self.nif_export.dict_nodes_by_name.setdefault(node_name, {})[node_id] = (index, node)
+                self.nif_export.dict_node_keys[node_id] = (node_name, index)
+            else:
+                unnamed_nodes[node_id] = (index, node)
+        self.nif_export.unnamed_nodes = unnamed_nodes
+        return [node for index, node
+                in sorted(self.nif_export.dict_nodes_by_name.get(name, {}).values(),
+                          key=lambda item: item[0])]
+
+    def get_named_node(self, name):
+        """Return the exported node with the given nif name.
+
+        @param name: The nif name.
+        @type name: C{str}
+        @return: The node, or C{None} if there is no such node.
+        @raise NifError: If several nodes have that name."""
+        nodes = self.get_named_nodes(name)
+        if len(nodes) > 1:
+            raise nif_utils.NifError(
+                "multiple bones"
+                " with name '%s': probably"
+                " you have multiple armatures,"
+                " please parent all meshes"
+                " to a single armature"
+                " and try again"
+                % name)
+        return nodes[0] if nodes else None
+
     def export_node(self, b_obj, space, parent_block, node_name):
         """Export a mesh/armature/empty object b_obj as child of parent_block.
         Export also all children of b_obj.
@@ -342,6 +456,9 @@ class ObjectHelper():
             if len(line)>0:
                 name, fullname = line.split(';')
                 self.nif_export.dict_names[name] = fullname
+        # recovered names are taken
+        self.nif_export.name_registry = NameRegistry(
+            itertools.chain(self.nif_export.dict_block_names, self.nif_export.dict_names.values()))
 
     
     #TODO: get objects to store their own names.
@@ -361,12 +478,7 @@ class ObjectHelper():
         # blender bone naming -> nif bone naming
         unique_name = self.nif_export.get_bone_name_for_nif(unique_name)
         # ensure uniqueness
-        if unique_name in self.nif_export.dict_block_names or unique_name in list(self.nif_export.dict_names.values()):
-            unique_int = 0
-            old_name = unique_name
-            while unique_name in self.nif_export.dict_block_names or unique_name in list(self.nif_export.dict_names.values()):
-                unique_name = "%s.%02d" % (old_name, unique_int)
-                unique_int += 1
+        unique_name = self.nif_export.name_registry.get_unique_name(unique_name)
         self.nif_export.dict_block_names.append(unique_name)
         self.nif_export.dict_names[b_name] = unique_name
         return unique_name
@@ -572,6 +684,9 @@ class MeshHelper():
         # is mesh double sided?
         mesh_doublesided = b_mesh.show_double_sided
 
+        # read polygons, loops and vertices once for all materials
+        mesh_partition = MeshPartition(b_mesh)
+
         #vertex color check
         mesh_hasvcol = False
         mesh_hasvcola = False
@@ -584,11 +699,55 @@ class MeshHelper():
                 NifLog.warn("Mesh only has one Vertex Color layer. Default alpha values will be written."
                                "For Custom alpha values add a second vertex layer, greyscale only" )
             else:
-                for b_loop in b_mesh.vertex_colors[1].data:
-                    if(b_loop.color.v > NifOp.props.epsilon):
-                        mesh_hasvcola = True    
-                        break
-                       
+                mesh_hasvcola = bool((mesh_partition.get_alpha() > NifOp.props.epsilon).any())
+
+        # vertex -> vertex group weights, read once for body parts and skin
+        mesh_vertex_weights = VertexGroupWeights.from_mesh(b_mesh)
+
+        # list of body part (name, index, vertices) in this mesh
+        bodypartgroups = []
+        for bodypartgroupname in NifFormat.BSDismemberBodyPartType().get_editor_keys():
+            vertex_group = b_obj.vertex_groups.get(bodypartgroupname)
+            if vertex_group:
+                NifLog.debug("Found body part {0}".format(bodypartgroupname))
+                bodypartgroups.append([bodypartgroupname,
+                                       getattr(NifFormat.BSDismemberBodyPartType, bodypartgroupname),
+                                       mesh_vertex_weights.get_vertices(vertex_group.index)])
+
+        # the vertgroups that correspond to the armature bones are bones
+        # that influence the mesh
+        boneinfluences = []
+        if b_obj.parent and b_obj.parent.type == 'ARMATURE':
+            vertgroups = {vertex_group.name
+                          for vertex_group in b_obj.vertex_groups}
+            boneinfluences = [bone for bone in b_obj.parent.data.bones.keys()
+                              if bone in vertgroups]
+
+        # the weights of every bone, normalized over all bones, and the
+        # skin partition settings; the skin is computed with the geometry
+        bone_weights = None
+        partition_args = None
+        if boneinfluences:
+            bone_groups = [b_obj.vertex_groups[bone].index for bone in boneinfluences]
+            vert_norm = mesh_vertex_weights.get_norms(bone_groups)
+            bone_weights = []
+            for bone_group in bone_groups:
+                b_v_indices, b_v_weights = mesh_vertex_weights.get_weights(bone_group)
+                # vertices without any bone weight are not skinned
+                is_weighted = (vert_norm[b_v_indices] != 0)
+                b_v_indices = b_v_indices[is_weighted]
+                bone_weights.append((b_v_indices, b_v_weights[is_weighted] / vert_norm[b_v_indices]))
+            if (self.nif_export.version >= 0x04020100
+                and NifOp.props.skin_partition):
+                partition_args = dict(
+                    maxbonesperpartition=NifOp.props.max_bones_per_partition,
+                    maxbonespervertex=NifOp.props.max_bones_per_vertex,
+                    stripify=NifOp.props.stripify,
+                    stitchstrips=NifOp.props.stitch_strips,
+                    padbones=NifOp.props.pad_bones,
+                    maximize_bone_sharing=(
+                                NifOp.props.game in (
+                                        'FALLOUT_3','SKYRIM')))
 
         # Non-textured materials, vertex colors are used to color the mesh
         # Textured materials, they represent lighting details
@@ -668,21 +827,6 @@ class MeshHelper():
                 mesh_haswire = (b_mat.type == 'WIRE')
             
                     
-            # list of body part (name, index, vertices) in this mesh
-            bodypartgroups = []
-            for bodypartgroupname in NifFormat.BSDismemberBodyPartType().get_editor_keys():
-                vertex_group = b_obj.vertex_groups.get(bodypartgroupname)
-                vertices_list = set()
-                if vertex_group:
-                    for b_vert in b_mesh.vertices:
-                        for b_groupname in b_vert.groups:
-                            if b_groupname.group == vertex_group.index:
-                                vertices_list.add(b_vert.index)
-                    NifLog.debug("Found body part {0}".format(bodypartgroupname))
-                    bodypartgroups.append([bodypartgroupname,
-                                           getattr(NifFormat.BSDismemberBodyPartType, bodypartgroupname),
-                                           vertices_list])
-
 
             # note: we can be in any of the following five situations
             # material + base texture        -> normal object
@@ -899,623 +1043,451 @@ class MeshHelper():
             # produce lists of vertices, uv-vertices, normals, vertex colors, and face indices.
             
             mesh_uvlayers = self.nif_export.texturehelper.get_uv_layers(b_mat)
-            vertquad_list = [] # (vertex, uv coordinate, normal, vertex color) list
-            vertmap = [None for i in range(len(b_mesh.vertices))] # blender vertex -> nif vertices
-            vertlist = []
-            normlist = []
-            vcollist = []
-            uvlist = []
-            trilist = []
-            # for each face in trilist, a body part index
-            bodypartfacemap = []
-            polygons_without_bodypart = []
-            for poly in b_mesh.polygons:
-                
-                # does the face belong to this trishape?
-                if (b_mat != None): # we have a material
-                    if (poly.material_index != materialIndex): # but this face has another material
-                        continue # so skip this face
-                    
-                f_numverts = len(poly.vertices)
-                if (f_numverts < 3): continue # ignore degenerate polygons
-                assert((f_numverts == 3) or (f_numverts == 4)) # debug
-                if mesh_uvlayers:
-                    # if we have uv coordinates
-                    # double check that we have uv data
-                    if not b_mesh.uv_layer_stencil:
-                        NifLog.warn("No UV map for texture associated with poly {0} of selected "
-                                    "mesh '{1}'.".format(str(poly.index), b_mesh.name))
-                # find (vert, uv-vert, normal, vcol) quad, and if not found, create it
-                f_index = [ -1 ] * f_numverts
-                for i, loop_index in enumerate(
-                                    range(poly.loop_start, poly.loop_start + poly.loop_total)):
-                    
-                    fv_index = b_mesh.loops[loop_index].vertex_index
-                    vertex = b_mesh.vertices[fv_index]
-                    vertex_index = vertex.index
-                    fv = vertex.co
-                    #smooth = vertex normal, non-smooth = face normal)
-                    if mesh_hasnormals:
-                        if poly.use_smooth:
-                            fn = vertex.normal
-                        else:
-                            fn = poly.normal
-                    else:
-                        fn = None
-                        
-                    fuv = []
-                    for uvlayer in mesh_uvlayers:
-                        if uvlayer != "":
-                            #TODO: map uv layer to index
-                            #currently we have uv_layer names, but we need their index value
-                            #b_mesh.uv_layers[0].data[poly.index].uv
-                            fuv.append(b_mesh.uv_layers[uvlayer].data[loop_index].uv)
-                        else:
-                            NifLog.warn("Texture is set to use UV but no UV Map is Selected "
-                                        "for Mapping > Map")
-                    fcol = None
-
-                    '''TODO: Need to map b_verts -> n_verts'''
-                    if mesh_hasvcol:
-                        #check for an alpha layer
-                        b_color = b_mesh.vertex_colors[0].data[loop_index].color
-                        if(mesh_hasvcola):
-                            b_alpha = b_mesh.vertex_colors[1].data[loop_index].color
-                            fcol = [b_color.r, b_color.g, b_color.b, b_alpha.v]
-                        else:
-                            fcol = [b_color.r, b_color.g, b_color.b, 1.0]
-                    else:
-                        fcol = None
-
-                    vertquad = ( fv, fuv, fn, fcol )
-
-                    # check for duplicate vertquad?
-                    f_index[i] = len(vertquad_list)
-                    if vertmap[vertex_index]:
-                        # iterate only over vertices with the same vertex index
-                        # and check if they have the same uvs, normals and colors
-                        for j in vertmap[vertex_index]:
-                            if mesh_uvlayers:
-                                if max(abs(vertquad[1][uvlayer][0] - vertquad_list[j][1][uvlayer][0])
-                                       for uvlayer in range(len(mesh_uvlayers))) \
-                                       > NifOp.props.epsilon:
-                                    continue
-                                if max(abs(vertquad[1][uvlayer][1] - vertquad_list[j][1][uvlayer][1])
-                                       for uvlayer in range(len(mesh_uvlayers))) \
-                                       > NifOp.props.epsilon:
-                                    continue
-                            if mesh_hasnormals:
-                                if abs(vertquad[2][0] - vertquad_list[j][2][0]) > NifOp.props.epsilon: continue
-                                if abs(vertquad[2][1] - vertquad_list[j][2][1]) > NifOp.props.epsilon: continue
-                                if abs(vertquad[2][2] - vertquad_list[j][2][2]) > NifOp.props.epsilon: continue
-                            if mesh_hasvcol:
-                                if abs(vertquad[3][0] - vertquad_list[j][3][0]) > NifOp.props.epsilon: continue
-                                if abs(vertquad[3][1] - vertquad_list[j][3][1]) > NifOp.props.epsilon: continue
-                                if abs(vertquad[3][2] - vertquad_list[j][3][2]) > NifOp.props.epsilon: continue
-                                if abs(vertquad[3][3] - vertquad_list[j][3][3]) > NifOp.props.epsilon: continue
-                            # all tests passed: so yes, we already have it!
-                            f_index[i] = j
-                            break
-
-                    if f_index[i] > 65535:
-                        raise nif_utils.NifError(
-                            "ERROR%t|Too many vertices. Decimate your mesh"
-                            " and try again.")
-                    if (f_index[i] == len(vertquad_list)):
-                        # first: add it to the vertex map
-                        if not vertmap[vertex_index]:
-                            vertmap[vertex_index] = []
-                        vertmap[vertex_index].append(len(vertquad_list))
-                        # new (vert, uv-vert, normal, vcol) quad: add it
-                        vertquad_list.append(vertquad)
-                        # add the vertex
-                        vertlist.append(vertquad[0])
-                        if mesh_hasnormals: normlist.append(vertquad[2])
-                        if mesh_hasvcol:    vcollist.append(vertquad[3])
-                        if mesh_uvlayers:   uvlist.append(vertquad[1])
-
-                # now add the (hopefully, convex) face, in triangles
-                for i in range(f_numverts - 2):
-                    if ((b_obj.scale.x + b_obj.scale.y + b_obj.scale.z) > 0):
-                        f_indexed = (f_index[0], f_index[1+i], f_index[2+i])
-                    else:
-                        f_indexed = (f_index[0], f_index[2+i], f_index[1+i])
-                    trilist.append(f_indexed)
-                    # add body part number
-                    if (NifOp.props.game not in ('FALLOUT_3','SKYRIM')
-                        or not bodypartgroups):
-                        # TODO: or not self.EXPORT_FO3_BODYPARTS):
-                        bodypartfacemap.append(0)
-                    else:
-                        for bodypartname, bodypartindex, bodypartverts in bodypartgroups:
-                            if (set(b_vert_index for b_vert_index in poly.vertices)
-                                <= bodypartverts):
-                                bodypartfacemap.append(bodypartindex)
-                                break
-                        else:
-                            # this signals an error
-                            polygons_without_bodypart.append(poly)
-
-            # check that there are no missing body part polygons
-            if polygons_without_bodypart:
-                # select mesh object
-                for b_deselect_obj in bpy.context.scene.objects:
-                    b_deselect_obj.select = False
-                bpy.context.scene.objects.active = b_obj
-                b_obj.select = True
-                # select bad polygons
-                # switch to edit mode to select polygons
-                bpy.ops.object.mode_set(mode='EDIT',toggle=False)
-                for face in b_mesh.polygons:
-                    face.select = False
-                for face in polygons_without_bodypart:
-                    face.select = True
-                # raise exception
-                raise ValueError(
-                    "Some polygons of %s not assigned to any body part."
-                    " The unassigned polygons"
-                    " have been selected in the mesh so they can easily"
-                    " be identified."
-                    % b_obj)
-
-            if len(trilist) > 65535:
-                raise nif_utils.NifError(
-                    "ERROR%t|Too many polygons. Decimate your mesh and try again.")
-            if len(vertlist) == 0:
-                continue # m_4444x: skip 'empty' material indices
-
-            
-            # add NiTriShape's data
-            # NIF flips the texture V-coordinate (OpenGL standard)
-            if isinstance(trishape, NifFormat.NiTriShape):
-                tridata = self.nif_export.objecthelper.create_block("NiTriShapeData", b_obj)
+            if mesh_uvlayers:
+                # if we have uv coordinates
+                # double check that we have uv data
+                if not b_mesh.uv_layer_stencil:
+                    NifLog.warn("No UV map for texture associated with selected mesh '{0}'.".format(b_mesh.name))
+                if "" in mesh_uvlayers:
+                    NifLog.warn("Texture is set to use UV but no UV Map is Selected "
+                                "for Mapping > Map")
+
+            # does the face belong to this trishape?
+            if (b_mat != None): # we have a material
+                mesh_polygons = mesh_partition.get_polygons(materialIndex)
             else:
-                tridata = self.nif_export.objecthelper.create_block("NiTriStripsData", b_obj)
-            trishape.data = tridata
+                mesh_polygons = mesh_partition.get_polygons()
 
-            # flags
-            if b_obj.niftools.consistency_flags in NifFormat.ConsistencyType._enumkeys:
-                cf_index = NifFormat.ConsistencyType._enumkeys.index(b_obj.niftools.consistency_flags)
-                tridata.consistency_flags = NifFormat.ConsistencyType._enumvalues[cf_index]
+            # add body part number
+            if (NifOp.props.game not in ('FALLOUT_3','SKYRIM')
+                or not bodypartgroups):
+                # TODO: or not self.EXPORT_FO3_BODYPARTS):
+                mesh_bodypartgroups = None
             else:
-                tridata.consistency_flags = NifFormat.ConsistencyType.CT_STATIC
-                NifLog.warn("{0} has no consistency type set using default CT_STATIC.".format(b_obj))
-
-            # data
-            tridata.num_vertices = len(vertlist)
-            tridata.has_vertices = True
-            tridata.vertices.update_size()
-            for i, v in enumerate(tridata.vertices):
-                v.x = vertlist[i][0]
-                v.y = vertlist[i][1]
-                v.z = vertlist[i][2]
-            tridata.update_center_radius()
-
-            if mesh_hasnormals:
-                tridata.has_normals = True
-                tridata.normals.update_size()
-                for i, v in enumerate(tridata.normals):
-                    v.x = normlist[i][0]
-                    v.y = normlist[i][1]
-                    v.z = normlist[i][2]
-
-            if mesh_hasvcol:
-                tridata.has_vertex_colors = True
-                tridata.vertex_colors.update_size()
-                for i, v in enumerate(tridata.vertex_colors):
-
-
-                    v.r = vcollist[i][0]
-                    v.g = vcollist[i][1]
-                    v.b = vcollist[i][2]
-                    v.a = vcollist[i][3]
-
-            if mesh_uvlayers:
-                tridata.num_uv_sets = len(mesh_uvlayers)
-                tridata.bs_num_uv_sets = len(mesh_uvlayers)
-                if NifOp.props.game == 'FALLOUT_3':
-                    if len(mesh_uvlayers) > 1:
-                        raise nif_utils.NifError(
-                            "Fallout 3 does not support multiple UV layers")
-                tridata.has_uv = True
-                tridata.uv_sets.update_size()
-                for j, uvlayer in enumerate(mesh_uvlayers):
-                    for i, uv in enumerate(tridata.uv_sets[j]):
-                        if len(uvlist[i]) == 0: continue  # skip non-uv textures
-                        uv.u = uvlist[i][j][0]
-                        uv.v = 1.0 - uvlist[i][j][1] # opengl standard
-
-            # set triangles
-            # stitch strips for civ4
-            tridata.set_triangles(trilist,
-                                 stitchstrips=NifOp.props.stitch_strips)
+                mesh_bodypartgroups = bodypartgroups
 
             # update tangent space (as binary extra data only for Oblivion)
             # for extra shader texture games, only export it if those
             # textures are actually exported (civ4 seems to be consistent with
             # not using tangent space on non shadered nifs)
-            if mesh_uvlayers and mesh_hasnormals:
-                if (NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM')
-                    or (NifOp.props.game in self.nif_export.texturehelper.USED_EXTRA_SHADER_TEXTURES)):
-                    trishape.update_tangent_space(
-                        as_extra=(NifOp.props.game == 'OBLIVION'))
+            has_tangent_space = bool(
+                mesh_uvlayers and mesh_hasnormals
+                and (NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM')
+                     or (NifOp.props.game in self.nif_export.texturehelper.USED_EXTRA_SHADER_TEXTURES)))
+
+            # the geometry, tangent space, strips and skin partition are
+            # computed from plain arrays, possibly on another process, and
+            # copied into the shape by export_tri_geometry; only this
+            # material's loops are sent along
+            self.nif_export.geometry_pool.submit(
+                build_tri_geometry,
+                (mesh_partition.get_slice(
+                    mesh_polygons, [uvlayer for uvlayer in mesh_uvlayers if uvlayer != ""],
+                    mesh_hasvcol, mesh_hasvcola),
+                 bool(mesh_uvlayers), mesh_hasnormals, NifOp.props.epsilon,
+                 (b_obj.scale.x + b_obj.scale.y + b_obj.scale.z) <= 0,
+                 mesh_bodypartgroups, NifOp.props.optimize_vertex_cache,
+                 has_tangent_space,
+                 (not isinstance(trishape, NifFormat.NiTriShape)
+                  and NifOp.props.stripifier == 'FAST'),
+                 NifOp.props.stitch_strips, bone_weights, partition_args),
+                functools.partial(self.export_tri_geometry, b_obj, b_mesh, trishape,
+                                  mesh_uvlayers, mesh_hasnormals, mesh_hasvcol,
+                                  bodypartgroups, mesh_vertex_weights, boneinfluences))
+
+    def export_tri_geometry(self, b_obj, b_mesh, trishape, mesh_uvlayers, mesh_hasnormals,
+                            mesh_hasvcol, bodypartgroups, mesh_vertex_weights, boneinfluences,
+                            geometry):
+        """Complete a trishape created by export_tri_shapes: add its data,
+        skin and morphs, once its geometry is computed."""
+        vertlist = geometry.vertlist
+        normlist = geometry.normlist
+        vcollist = geometry.vcollist
+        trilist = geometry.trilist
+        polygons_without_bodypart = geometry.polygons_without_bodypart
+        vertmap = geometry.vertmap
+
+        # check that there are no missing body part polygons
+        if polygons_without_bodypart:
+            # select mesh object
+            for b_deselect_obj in bpy.context.scene.objects:
+                b_deselect_obj.select = False
+            bpy.context.scene.objects.active = b_obj
+            b_obj.select = True
+            # select bad polygons
+            # switch to edit mode to select polygons
+            bpy.ops.object.mode_set(mode='EDIT',toggle=False)
+            for face in b_mesh.polygons:
+                face.select = False
+            for poly_index in polygons_without_bodypart:
+                b_mesh.polygons[poly_index].select = True
+            # raise exception
+            raise ValueError(
+                "Some polygons of %s not assigned to any body part."
+                " The unassigned polygons"
+                " have been selected in the mesh so they can easily"
+                " be identified."
+                % b_obj)
+
+        if len(vertlist) > 65536:
+            raise nif_utils.NifError(
+                "ERROR%t|Too many vertices. Decimate your mesh"
+                " and try again.")
+        if len(trilist) > 65535:
+            raise nif_utils.NifError(
+                "ERROR%t|Too many polygons. Decimate your mesh and try again.")
+        if len(vertlist) == 0:
+            return # m_4444x: skip 'empty' material indices
+
+        if geometry.acmr:
+            NifLog.info("Vertex cache ACMR of {0}: {1:.3f} before, {2:.3f} after optimization"
+                        .format(b_obj.name, *geometry.acmr))
+
+        # add NiTriShape's data
+        # NIF flips the texture V-coordinate (OpenGL standard)
+        if isinstance(trishape, NifFormat.NiTriShape):
+            tridata = self.nif_export.objecthelper.create_block("NiTriShapeData", b_obj)
+        else:
+            tridata = self.nif_export.objecthelper.create_block("NiTriStripsData", b_obj)
+        trishape.data = tridata
 
-            # now export the vertex weights, if there are any
-            vertgroups = {vertex_group.name
-                          for vertex_group in b_obj.vertex_groups}
-            bone_names = []
-            if b_obj.parent:
-                if b_obj.parent.type == 'ARMATURE':
-                    b_obj_armature = b_obj.parent
-                    armaturename = b_obj_armature.name
-                    bone_names = list(b_obj_armature.data.bones.keys())
-                    # the vertgroups that correspond to bone_names are bones
-                    # that influence the mesh
-                    boneinfluences = []
-                    for bone in bone_names:
-                        if bone in vertgroups:
-                            boneinfluences.append(bone)
-                    if boneinfluences: # yes we have skinning!
-                        # create new skinning instance block and link it
-                        if (NifOp.props.game in ('FALLOUT_3', 'SKYRIM')
-                            and bodypartgroups):
-                            skininst = self.nif_export.objecthelper.create_block("BSDismemberSkinInstance", b_obj)
-                        else:
-                            skininst = self.nif_export.objecthelper.create_block("NiSkinInstance", b_obj)
-                        trishape.skin_instance = skininst
-                        for block in self.nif_export.dict_blocks:
-                            if isinstance(block, NifFormat.NiNode):
-                                if block.name.decode() == self.nif_export.objecthelper.get_full_name(armaturename):
-                                    skininst.skeleton_root = block
-                                    break
-                        else:
-                            raise nif_utils.NifError(
-                                "Skeleton root '%s' not found."
-                                % armaturename)
-
-                        # create skinning data and link it
-                        skindata = self.nif_export.objecthelper.create_block("NiSkinData", b_obj)
-                        skininst.data = skindata
-
-                        skindata.has_vertex_weights = True
-                        # fix geometry rest pose: transform relative to
-                        # skeleton root
-                        skindata.set_transform(
-                            self.nif_export.objecthelper.get_object_matrix(b_obj, 'localspace').get_inverse())
-                       
-                        # Vertex weights,  find weights and normalization factors
-                        vert_list = {}
-                        vert_norm = {}
-                        unassigned_verts = []
-                                                
-                        for bone_group in boneinfluences:
-                            b_list_weight = []
-                            b_vert_group = b_obj.vertex_groups[bone_group]
-                            
-                            for b_vert in b_obj.data.vertices:
-                                if len(b_vert.groups) == 0: #check vert has weight_groups
-                                    unassigned_verts.append(b_vert)
-                                    continue
-                                
-                                for g in b_vert.groups:
-                                    if b_vert_group.name in boneinfluences:
-                                        if g.group == b_vert_group.index:
-                                            b_list_weight.append((b_vert.index, g.weight))
-                                            break
-                                                
-                            vert_list[bone_group] = b_list_weight             
-                            
-                            #create normalisation groupings
-                            for v in vert_list[bone_group]:
-                                if v[0] in vert_norm:
-                                    vert_norm[v[0]] += v[1]
-                                else:
-                                    vert_norm[v[0]] = v[1]
-                        
-                        # vertices must be assigned at least one vertex group
-                        # lets be nice and display them for the user 
-                        if len(unassigned_verts) > 0:
-                            for b_scene_obj in bpy.context.scene.objects:
-                                b_scene_obj.select = False
-                                
-                            b_obj = bpy.context.scene.objects.active
-                            b_obj.select = True
-                            
-                            # switch to edit mode and raise exception
-                            bpy.ops.object.mode_set(mode='EDIT',toggle=False)
-                            # clear all currently selected vertices
-                            bpy.ops.mesh.select_all(action='DESELECT')
-                            # select unweighted vertices
-                            bpy.ops.mesh.select_ungrouped(extend=False)
-                                
-                            raise nif_utils.NifError(
-                                "Cannot export mesh with unweighted vertices."
-                                " The unweighted vertices have been selected"
-                                " in the mesh so they can easily be"
-                                " identified.")
-                        
-                        
-                        # for each bone, first we get the bone block
-                        # then we get the vertex weights
-                        # and then we add it to the NiSkinData
-                        # note: allocate memory for faster performance
-                        vert_added = [False for i in range(len(vertlist))]
-                        for bone_index, bone in enumerate(boneinfluences):
-                            # find bone in exported blocks
-                            bone_block = None
-                            for block in self.nif_export.dict_blocks:
-                                if isinstance(block, NifFormat.NiNode):
-                                    if block.name.decode() == self.nif_export.objecthelper.get_full_name(bone):
-                                        if not bone_block:
-                                            bone_block = block
-                                        else:
-                                            raise nif_utils.NifError(
-                                                "multiple bones"
-                                                " with name '%s': probably"
-                                                " you have multiple armatures,"
-                                                " please parent all meshes"
-                                                " to a single armature"
-                                                " and try again"
-                                                % bone)
-                            
-                            if not bone_block:
-                                raise nif_utils.NifError(
-                                    "Bone '%s' not found." % bone)
-                            
-                            # find vertex weights
-                            vert_weights = {}
-                            for v in vert_list[bone]:
-                                # v[0] is the original vertex index
-                                # v[1] is the weight
-
-                                # vertmap[v[0]] is the set of vertices (indices)
-                                # to which v[0] was mapped
-                                # so we simply export the same weight as the
-                                # original vertex for each new vertex
-
-                                # write the weights
-                                # extra check for multi material meshes
-                                if vertmap[v[0]] and vert_norm[v[0]]:
-                                    for vert_index in vertmap[v[0]]:
-                                        vert_weights[vert_index] = v[1] / vert_norm[v[0]]
-                                        vert_added[vert_index] = True
-                            # add bone as influence, but only if there were
-                            # actually any vertices influenced by the bone
-                            if vert_weights:
-                                trishape.add_bone(bone_block, vert_weights)
-
-                        # update bind position skinning data
-                        trishape.update_bind_position()
-
-                        # calculate center and radius for each skin bone data
-                        # block
-                        trishape.update_skin_center_radius()
-
-                        if (self.nif_export.version >= 0x04020100
-                            and NifOp.props.skin_partition):
-                            NifLog.info("Creating skin partition")
-                            lostweight = trishape.update_skin_partition(
-                                maxbonesperpartition=NifOp.props.max_bones_per_partition,
-                                maxbonespervertex=NifOp.props.max_bones_per_vertex,
-                                stripify=NifOp.props.stripify,
-                                stitchstrips=NifOp.props.stitch_strips,
-                                padbones=NifOp.props.pad_bones,
-                                triangles=trilist,
-                                trianglepartmap=bodypartfacemap,
-                                maximize_bone_sharing=(
-                                            NifOp.props.game in (
-                                                    'FALLOUT_3','SKYRIM')))
-                            # warn on bad config settings
-                            if NifOp.props.game == 'OBLIVION':
-                                if NifOp.props.pad_bones:
-                                    NifLog.warn("Using padbones on Oblivion export. Disable the pad bones option to get higher quality skin partitions.")
-                            if NifOp.props.game in ('OBLIVION', 'FALLOUT_3'):
-                                if NifOp.props.max_bones_per_partition < 18:
-                                    NifLog.warn("Using less than 18 bones per partition on Oblivion/Fallout 3 export."
-                                                   "Set it to 18 to get higher quality skin partitions.")
-                            if NifOp.props.game in ('SKYRIM'):
-                                if NifOp.props.max_bones_per_partition < 24:
-                                    NifLog.warn("Using less than 24 bones per partition on Skyrim export."
-                                       "Set it to 24 to get higher quality skin partitions.")
-                            if lostweight > NifOp.props.epsilon:
-                                NifLog.warn("Lost {0} in vertex weights while creating a skin partition for Blender object '{1}' (nif block '{2}')"
-                                               .format(str(lostweight), b_obj.name, trishape.name))
-
-                        if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
-                            partitions = skininst.partitions
-                            b_obj_part_flags = b_obj.niftools_part_flags
-                            for s_part in partitions:
-                                s_part_index = NifFormat.BSDismemberBodyPartType._enumvalues.index(s_part.body_part)
-                                s_part_name = NifFormat.BSDismemberBodyPartType._enumkeys[s_part_index]
-                                for b_part in b_obj_part_flags:
-                                    if s_part_name == b_part.name:
-                                        s_part.part_flag.pf_start_net_boneset = b_part.pf_startflag
-                                        s_part.part_flag.pf_editor_visible = b_part.pf_editorflag
-
-                        # clean up
-                        del vert_weights
-                        del vert_added
-
-
-            # shape key morphing
-            key = b_mesh.shape_keys
-            if key:
-                if len(key.key_blocks) > 1:
-                    # yes, there is a key object attached
-                    # export as egm, or as morphdata?
-                    if key.key_blocks[1].name.startswith("EGM"):
-                        # egm export!
-                        self.exportEgm(key.key_blocks)
-                    elif key.ipo:
-                        # regular morphdata export
-                        # (there must be a shape ipo)
-                        keyipo = key.ipo
-                        # check that they are relative shape keys
-                        if not key.relative:
-                            # XXX if we do "key.relative = True"
-                            # XXX would this automatically fix the keys?
-                            raise ValueError(
-                                "Can only export relative shape keys.")
-
-                        # create geometry morph controller
-                        morphctrl = self.nif_export.objecthelper.create_block(
-                                                    "NiGeomMorpherController", keyipo)
-                        trishape.add_controller(morphctrl)
-                        morphctrl.target = trishape
-                        morphctrl.frequency = 1.0
-                        morphctrl.phase = 0.0
-                        ctrlStart = 1000000.0
-                        ctrlStop = -1000000.0
-                        ctrlFlags = 0x000c
-
-                        # create geometry morph data
-                        morphdata = self.nif_export.objecthelper.create_block(
-                                                                "NiMorphData", keyipo)
-                        morphctrl.data = morphdata
-                        morphdata.num_morphs = len(key.key_blocks)
-                        morphdata.num_vertices = len(vertlist)
-                        morphdata.morphs.update_size()
-
-
-                        # create interpolators (for newer nif versions)
-                        morphctrl.num_interpolators = len(key.key_blocks)
-                        morphctrl.interpolators.update_size()
-
-                        # interpolator weights (for Fallout 3)
-                        morphctrl.interpolator_weights.update_size()
-
-                        # XXX some unknowns, bethesda only
-                        # XXX just guessing here, data seems to be zero always
-                        morphctrl.num_unknown_ints = len(key.key_blocks)
-                        morphctrl.unknown_ints.update_size()
-
-                        for keyblocknum, keyblock in enumerate(key.key_blocks):
-                            # export morphed vertices
-                            morph = morphdata.morphs[keyblocknum]
-                            morph.frame_name = keyblock.name
-                            NifLog.info("Exporting morph {0}: vertices".format(keyblock.name))
-                            morph.arg = morphdata.num_vertices
-                            morph.vectors.update_size()
-                            for b_v_index, (vert_indices, vert) \
-                                in enumerate(list(zip(vertmap, keyblock.data))):
-                                # vertmap check
-                                if not vert_indices:
-                                    continue
-                                # copy vertex and assign morph vertex
-                                mv = vert.copy()
-                                if keyblocknum > 0:
-                                    mv.x -= b_mesh.vertices[b_v_index].co.x
-                                    mv.y -= b_mesh.vertices[b_v_index].co.y
-                                    mv.z -= b_mesh.vertices[b_v_index].co.z
-                                for vert_index in vert_indices:
-                                    morph.vectors[vert_index].x = mv.x
-                                    morph.vectors[vert_index].y = mv.y
-                                    morph.vectors[vert_index].z = mv.z
-
-                            # export ipo shape key curve
-                            curve = keyipo[keyblock.name]
-
-                            # create interpolator for shape key
-                            # (needs to be there even if there is no curve)
-                            interpol = self.nif_export.objecthelper.create_block("NiFloatInterpolator")
-                            interpol.value = 0
-                            morphctrl.interpolators[keyblocknum] = interpol
-                            # fallout 3 stores interpolators inside the
-                            # interpolator_weights block
-                            morphctrl.interpolator_weights[keyblocknum].interpolator = interpol
-
-                            # geometry only export has no float data
-                            # also skip keys that have no curve (such as base key)
-                            if NifOp.props.animation == 'GEOM_NIF' or not curve:
-                                continue
-
-                            # note: we set data on morph for older nifs
-                            # and on floatdata for newer nifs
-                            # of course only one of these will be actually
-                            # written to the file
-                            NifLog.info("Exporting morph {0}: curve".format(keyblock.name))
-                            interpol.data = self.nif_export.objecthelper.create_block("NiFloatData", curve)
-                            floatdata = interpol.data.data
-                            if curve.getExtrapolation() == "Constant":
-                                ctrlFlags = 0x000c
-                            elif curve.getExtrapolation() == "Cyclic":
-                                ctrlFlags = 0x0008
-                            morph.interpolation = NifFormat.KeyType.LINEAR_KEY
-                            morph.num_keys = len(curve.getPoints())
-                            morph.keys.update_size()
-                            floatdata.interpolation = NifFormat.KeyType.LINEAR_KEY
-                            floatdata.num_keys = len(curve.getPoints())
-                            floatdata.keys.update_size()
-                            for i, btriple in enumerate(curve.getPoints()):
-                                knot = btriple.getPoints()
-                                morph.keys[i].arg = morph.interpolation
-                                morph.keys[i].time = (knot[0] - bpy.context.scene.frame_start) * self.context.scene.render.fps
-                                morph.keys[i].value = curve.evaluate( knot[0] )
-                                #morph.keys[i].forwardTangent = 0.0 # ?
-                                #morph.keys[i].backwardTangent = 0.0 # ?
-                                floatdata.keys[i].arg = floatdata.interpolation
-                                floatdata.keys[i].time = (knot[0] - bpy.context.scene.frame_start) * self.context.scene.render.fps
-                                floatdata.keys[i].value = curve.evaluate( knot[0] )
-                                #floatdata.keys[i].forwardTangent = 0.0 # ?
-                                #floatdata.keys[i].backwardTangent = 0.0 # ?
-                                ctrlStart = min(ctrlStart, morph.keys[i].time)
-                                ctrlStop  = max(ctrlStop,  morph.keys[i].time)
-                        morphctrl.flags = ctrlFlags
-                        morphctrl.start_time = ctrlStart
-                        morphctrl.stop_time = ctrlStop
-                        # fix data consistency type
-                        tridata.consistency_flags = b_obj.niftools.consistency_flags
+        # flags
+        if b_obj.niftools.consistency_flags in NifFormat.ConsistencyType._enumkeys:
+            cf_index = NifFormat.ConsistencyType._enumkeys.index(b_obj.niftools.consistency_flags)
+            tridata.consistency_flags = NifFormat.ConsistencyType._enumvalues[cf_index]
+        else:
+            tridata.consistency_flags = NifFormat.ConsistencyType.CT_STATIC
+            NifLog.warn("{0} has no consistency type set using default CT_STATIC.".format(b_obj))
+
+        # data
+        geometry_data.set_vertices(tridata, vertlist)
+        geometry_data.set_bounding_sphere(tridata, geometry.center, geometry.radius)
+
+        if mesh_hasnormals:
+            geometry_data.set_normals(tridata, normlist)
+
+        if mesh_hasvcol:
+            geometry_data.set_vertex_colors(tridata, vcollist)
+
+        if mesh_uvlayers:
+            if NifOp.props.game == 'FALLOUT_3':
+                if len(mesh_uvlayers) > 1:
+                    raise nif_utils.NifError(
+                        "Fallout 3 does not support multiple UV layers")
+            geometry_data.set_uv_sets(tridata, geometry.uv_sets)
+
+        # set triangles
+        # stitch strips for civ4
+        if geometry.strips is not None:
+            tridata.set_strips(geometry.strips)
+            NifLog.info("Stripified {0}: {1} strips, stitched length {2}, {3} degenerate triangles"
+                        .format(b_obj.name, geometry.num_strips,
+                                sum(len(strip) for strip in geometry.strips),
+                                tri_strips.get_num_degenerates(geometry.strips)))
+        else:
+            tridata.set_triangles(trilist,
+                                 stitchstrips=NifOp.props.stitch_strips)
+
+        if geometry.tangents is not None:
+            if NifOp.props.game == 'OBLIVION':
+                extra = self.nif_export.objecthelper.create_block("NiBinaryExtraData")
+                extra.name = tangent_space.TANGENT_SPACE_EXTRA_DATA_NAME
+                extra.binary_data = tangent_space.get_binary_data(
+                    geometry.tangents, geometry.bitangents)
+                trishape.add_extra_data(extra)
+            else:
+                geometry_data.set_tangent_space(
+                    tridata, geometry.tangents, geometry.bitangents)
+
+        # now export the vertex weights, if there are any
+        if boneinfluences: # yes we have skinning!
+            armaturename = b_obj.parent.name
+            # create new skinning instance block and link it
+            if (NifOp.props.game in ('FALLOUT_3', 'SKYRIM')
+                and bodypartgroups):
+                skininst = self.nif_export.objecthelper.create_block("BSDismemberSkinInstance", b_obj)
+            else:
+                skininst = self.nif_export.objecthelper.create_block("NiSkinInstance", b_obj)
+            trishape.skin_instance = skininst
+            skeleton_roots = self.nif_export.objecthelper.get_named_nodes(
+                self.nif_export.objecthelper.get_full_name(armaturename))
+            if skeleton_roots:
+                skininst.skeleton_root = skeleton_roots[0]
+            else:
+                raise nif_utils.NifError(
+                    "Skeleton root '%s' not found."
+                    % armaturename)
+
+            # create skinning data and link it
+            skindata = self.nif_export.objecthelper.create_block("NiSkinData", b_obj)
+            skininst.data = skindata
+
+            skindata.has_vertex_weights = True
+            # fix geometry rest pose: transform relative to
+            # skeleton root
+            skindata.set_transform(
+                self.nif_export.objecthelper.get_object_matrix(b_obj, 'localspace').get_inverse())
+
+            # vertices must be assigned at least one vertex group
+            # lets be nice and display them for the user
+            unassigned_verts = mesh_vertex_weights.get_unweighted()
+            if len(unassigned_verts) > 0:
+                for b_scene_obj in bpy.context.scene.objects:
+                    b_scene_obj.select = False
+
+                b_obj = bpy.context.scene.objects.active
+                b_obj.select = True
+
+                # switch to edit mode and raise exception
+                bpy.ops.object.mode_set(mode='EDIT',toggle=False)
+                # clear all currently selected vertices
+                bpy.ops.mesh.select_all(action='DESELECT')
+                # select unweighted vertices
+                bpy.ops.mesh.select_ungrouped(extend=False)
+
+                raise nif_utils.NifError(
+                    "Cannot export mesh with unweighted vertices."
+                    " The unweighted vertices have been selected"
+                    " in the mesh so they can easily be"
+                    " identified.")
+
+            # find the bone blocks
+            bone_blocks = []
+            for bone in boneinfluences:
+                bone_block = self.nif_export.objecthelper.get_named_node(
+                    self.nif_export.objecthelper.get_full_name(bone))
+                if not bone_block:
+                    raise nif_utils.NifError(
+                        "Bone '%s' not found." % bone)
+                bone_blocks.append(bone_block)
+
+            # add every bone which influences any vertex, with the
+            # weights mapped from the blender vertices
+            for skin_bone, (bone_index, vert_indices) in enumerate(
+                    zip(geometry.skin_bones, geometry.skin_vertices)):
+                trishape.add_bone(bone_blocks[bone_index], dict(zip(
+                    vert_indices, geometry.skin_weights[vert_indices, skin_bone].tolist())))
+
+            # update bind position skinning data
+            trishape.update_bind_position()
+
+            # center and radius for each skin bone data block
+            for n_bonedata, (center, radius) in zip(skindata.bone_list, geometry.skin_spheres):
+                # transform center in proper coordinates (radius remains unaffected)
+                n_center = NifFormat.Vector3()
+                n_center.x, n_center.y, n_center.z = center.tolist()
+                n_center = n_center * n_bonedata.get_transform()
+                n_bonedata.bounding_sphere_offset.x = n_center.x
+                n_bonedata.bounding_sphere_offset.y = n_center.y
+                n_bonedata.bounding_sphere_offset.z = n_center.z
+                n_bonedata.bounding_sphere_radius = radius
+
+            if geometry.partitions is not None:
+                NifLog.info("Creating skin partition")
+                partitions = geometry.partitions
+                lostweight = geometry.lostweight
+                # partitions computed on a worker are only cached there
+                geometry.cache_skin_partition()
+                NifLog.debug("Skin has {0} partitions".format(len(partitions)))
+                skinpart = self.nif_export.objecthelper.create_block("NiSkinPartition", b_obj)
+                skin_partition.set_skin_partition(skinpart, partitions)
+                skindata.skin_partition = skinpart
+                skininst.skin_partition = skinpart
+                if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
+                    skin_partition.set_dismember_partitions(skininst, partitions)
+                # warn on bad config settings
+                if NifOp.props.game == 'OBLIVION':
+                    if NifOp.props.pad_bones:
+                        NifLog.warn("Using padbones on Oblivion export. Disable the pad bones option to get higher quality skin partitions.")
+                if NifOp.props.game in ('OBLIVION', 'FALLOUT_3'):
+                    if NifOp.props.max_bones_per_partition < 18:
+                        NifLog.warn("Using less than 18 bones per partition on Oblivion/Fallout 3 export."
+                                       "Set it to 18 to get higher quality skin partitions.")
+                if NifOp.props.game in ('SKYRIM'):
+                    if NifOp.props.max_bones_per_partition < 24:
+                        NifLog.warn("Using less than 24 bones per partition on Skyrim export."
+                           "Set it to 24 to get higher quality skin partitions.")
+                if lostweight > NifOp.props.epsilon:
+                    NifLog.warn("Lost {0} in vertex weights while creating a skin partition for Blender object '{1}' (nif block '{2}')"
+                                   .format(str(lostweight), b_obj.name, trishape.name))
+
+            if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
+                partitions = skininst.partitions
+                b_obj_part_flags = b_obj.niftools_part_flags
+                for s_part in partitions:
+                    s_part_index = NifFormat.BSDismemberBodyPartType._enumvalues.index(s_part.body_part)
+                    s_part_name = NifFormat.BSDismemberBodyPartType._enumkeys[s_part_index]
+                    for b_part in b_obj_part_flags:
+                        if s_part_name == b_part.name:
+                            s_part.part_flag.pf_start_net_boneset = b_part.pf_startflag
+                            s_part.part_flag.pf_editor_visible = b_part.pf_editorflag
+
+
+        # shape key morphing
+        key = b_mesh.shape_keys
+        if key:
+            if len(key.key_blocks) > 1:
+                # yes, there is a key object attached
+                # export as egm, or as morphdata?
+                if key.key_blocks[1].name.startswith("EGM"):
+                    # egm export!
+                    self.exportEgm(key.key_blocks)
+                elif key.ipo:
+                    # regular morphdata export
+                    # (there must be a shape ipo)
+                    keyipo = key.ipo
+                    # check that they are relative shape keys
+                    if not key.relative:
+                        # XXX if we do "key.relative = True"
+                        # XXX would this automatically fix the keys?
+                        raise ValueError(
+                            "Can only export relative shape keys.")
+
+                    # create geometry morph controller
+                    morphctrl = self.nif_export.objecthelper.create_block(
+                                                "NiGeomMorpherController", keyipo)
+                    trishape.add_controller(morphctrl)
+                    morphctrl.target = trishape
+                    morphctrl.frequency = 1.0
+                    morphctrl.phase = 0.0
+                    ctrlStart = 1000000.0
+                    ctrlStop = -1000000.0
+                    ctrlFlags = 0x000c
+
+                    # create geometry morph data
+                    morphdata = self.nif_export.objecthelper.create_block(
+                                                            "NiMorphData", keyipo)
+                    morphctrl.data = morphdata
+                    morphdata.num_morphs = len(key.key_blocks)
+                    morphdata.num_vertices = len(vertlist)
+                    morphdata.morphs.update_size()
+
+
+                    # create interpolators (for newer nif versions)
+                    morphctrl.num_interpolators = len(key.key_blocks)
+                    morphctrl.interpolators.update_size()
+
+                    # interpolator weights (for Fallout 3)
+                    morphctrl.interpolator_weights.update_size()
+
+                    # XXX some unknowns, bethesda only
+                    # XXX just guessing here, data seems to be zero always
+                    morphctrl.num_unknown_ints = len(key.key_blocks)
+                    morphctrl.unknown_ints.update_size()
+
+                    # the vertex map and the base coordinates are shared
+                    # by all keys
+                    vertmap_indices = morph_data.get_vertmap_indices(vertmap)
+                    base_coords = MeshPartition.foreach_get(
+                        b_mesh.vertices, "co", numpy.float32, 3)
+
+                    for keyblocknum, keyblock in enumerate(key.key_blocks):
+                        # export morphed vertices
+                        morph = morphdata.morphs[keyblocknum]
+                        morph.frame_name = keyblock.name
+                        NifLog.info("Exporting morph {0}: vertices".format(keyblock.name))
+                        # all keys but the base key are relative to the mesh
+                        morph_data.set_morph_vectors(
+                            morph, morph_data.get_morph_vectors(
+                                MeshPartition.foreach_get(
+                                    keyblock.data, "co", numpy.float32, 3),
+                                base_coords if keyblocknum > 0 else None,
+                                vertmap_indices, morphdata.num_vertices))
+
+                        # export ipo shape key curve
+                        curve = keyipo[keyblock.name]
+
+                        # create interpolator for shape key
+                        # (needs to be there even if there is no curve)
+                        interpol = self.nif_export.objecthelper.create_block("NiFloatInterpolator")
+                        interpol.value = 0
+                        morphctrl.interpolators[keyblocknum] = interpol
+                        # fallout 3 stores interpolators inside the
+                        # interpolator_weights block
+                        morphctrl.interpolator_weights[keyblocknum].interpolator = interpol
+
+                        # geometry only export has no float data
+                        # also skip keys that have no curve (such as base key)
+                        if NifOp.props.animation == 'GEOM_NIF' or not curve:
+                            continue
+
+                        # note: we set data on morph for older nifs
+                        # and on floatdata for newer nifs
+                        # of course only one of these will be actually
+                        # written to the file
+                        NifLog.info("Exporting morph {0}: curve".format(keyblock.name))
+                        interpol.data = self.nif_export.objecthelper.create_block("NiFloatData", curve)
+                        floatdata = interpol.data.data
+                        if curve.getExtrapolation() == "Constant":
+                            ctrlFlags = 0x000c
+                        elif curve.getExtrapolation() == "Cyclic":
+                            ctrlFlags = 0x0008
+                        # sample the curve once, at every knot
+                        frames = [btriple.getPoints()[0] for btriple in curve.getPoints()]
+                        values = [curve.evaluate(frame) for frame in frames]
+                        times = ((numpy.array(frames, dtype=numpy.float64)
+                                  - bpy.context.scene.frame_start)
+                                 * self.context.scene.render.fps)
+                        morph_data.set_float_keys(morph, times, values)
+                        morph_data.set_float_keys(floatdata, times, values)
+                        if len(times):
+                            ctrlStart = min(ctrlStart, float(times.min()))
+                            ctrlStop = max(ctrlStop, float(times.max()))
+                    morphctrl.flags = ctrlFlags
+                    morphctrl.start_time = ctrlStart
+                    morphctrl.stop_time = ctrlStop
+                    # fix data consistency type
+                    tridata.consistency_flags = b_obj.niftools.consistency_flags
 
 
     def smooth_mesh_seams(self, b_objs):
-        # get shared vertices
+        """Average the normals of vertices that share their location with a
+        vertex of another mesh, so no seam shows between the meshes.
+
+        @param b_objs: The objects to smooth; only meshes are considered.
+        """
         NifLog.info("Smoothing seams between objects...")
-        vdict = {}
-        for b_obj in [b_obj for b_obj in b_objs if b_obj.type == 'MESH']:
-            b_mesh = b_obj.data
-            # for vertex in b_mesh.vertices:
-            #    vertex.sel = False
-            for poly in b_mesh.polygons:
-                for loop_index in range(poly.loop_start, poly.loop_start + poly.loop_total):
-                    pv_index = b_mesh.loops[loop_index].vertex_index
-                    vertex = b_mesh.vertices[pv_index]
-                    vertex_vec = vertex.co
-                    vkey = (int(vertex_vec[0]*self.nif_export.VERTEX_RESOLUTION),
-                            int(vertex_vec[1]*self.nif_export.VERTEX_RESOLUTION),
-                            int(vertex_vec[2]*self.nif_export.VERTEX_RESOLUTION))
-                    try:
-                        vdict[vkey].append((vertex, poly, b_mesh))
-                    except KeyError:
-                        vdict[vkey] = [(vertex, poly, b_mesh)]
+        # objects sharing their mesh count as a single mesh
+        b_meshes = list(collections.OrderedDict(
+            (b_obj.data, None) for b_obj in b_objs if b_obj.type == 'MESH'))
+        if not b_meshes:
+            return
+        # the vertex of every loop, polygon by polygon, and its location
+        # and polygon normal, for all meshes
+        mesh_loop_vertices = []
+        coords = []
+        normals = []
+        mesh_indices = []
+        for mesh_index, b_mesh in enumerate(b_meshes):
+            loop_starts = MeshPartition.foreach_get(b_mesh.polygons, "loop_start", numpy.int64)
+            loop_totals = MeshPartition.foreach_get(b_mesh.polygons, "loop_total", numpy.int64)
+            loop_offsets = numpy.cumsum(loop_totals) - loop_totals
+            loop_indices = (numpy.arange(loop_totals.sum())
+                            + numpy.repeat(loop_starts - loop_offsets, loop_totals))
+            loop_vertices = MeshPartition.foreach_get(
+                b_mesh.loops, "vertex_index", numpy.int64)[loop_indices]
+            loop_polygons = numpy.repeat(numpy.arange(len(loop_totals)), loop_totals)
+            mesh_loop_vertices.append(loop_vertices)
+            coords.append(MeshPartition.foreach_get(
+                b_mesh.vertices, "co", numpy.float32, 3)[loop_vertices])
+            normals.append(MeshPartition.foreach_get(
+                b_mesh.polygons, "normal", numpy.float32, 3)[loop_polygons])
+            mesh_indices.append(numpy.full(len(loop_vertices), mesh_index, dtype=numpy.int64))
+        is_seam, seam_normals, nv = get_seam_normals(
+            numpy.concatenate(coords), numpy.concatenate(mesh_indices),
+            numpy.concatenate(normals), self.nif_export.VERTEX_RESOLUTION)
         # set normals on shared vertices
-        nv = 0
-        for vlist in vdict.values():
-            if len(vlist) <= 1: continue # not shared
-            meshes = set([b_mesh for vertex, poly, b_mesh in vlist])
-            if len(meshes) <= 1: continue # not shared
-            # take average of all face normals of polygons that have this
-            # vertex
-            norm = mathutils.Vector()
-            for vertex, poly, b_mesh in vlist:
-                norm += poly.normal
-            norm.normalize()
-            # remove outliers (fixes better bodies issue)
-            # first calculate fitness of each face
-            fitlist = [poly.normal.dot(norm)
-                       for vertex, poly, b_mesh in vlist]
-            bestfit = max(fitlist)
-            # recalculate normals only taking into account
-            # well-fitting polygons
-            norm = mathutils.Vector()
-            for (vertex, poly, b_mesh), fit in zip(vlist, fitlist):
-                if fit >= bestfit - 0.2:
-                    norm += poly.normal
-            norm.normalize()
-            # save normal of this vertex
-            for vertex, poly, b_mesh in vlist:
-                vertex.normal = norm
-                # vertex.sel = True
-            nv += 1
+        loop_end = 0
+        for b_mesh, loop_vertices in zip(b_meshes, mesh_loop_vertices):
+            loop_start, loop_end = loop_end, loop_end + len(loop_vertices)
+            mesh_is_seam = is_seam[loop_start:loop_end]
+            if not mesh_is_seam.any():
+                continue
+            vertex_normals = MeshPartition.foreach_get(
+                b_mesh.vertices, "normal", numpy.float32, 3)
+            vertex_normals[loop_vertices[mesh_is_seam]] = \
+                seam_normals[loop_start:loop_end][mesh_is_seam]
+            b_mesh.vertices.foreach_set("normal", vertex_normals.ravel())
         NifLog.info("Fixed normals on {0} vertices.".format(str(nv)))
     
     
\ No newline at end of file
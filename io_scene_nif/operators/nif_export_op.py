@@ -99,6 +99,18 @@ class NifExportOperator(bpy.types.Operator, ExportHelper, NifOperatorCommon):
         description="Smooth normal data along inter-object seams.",
         default=True)
 
+    #: Compute geometry on several processes.
+    parallel_geometry = bpy.props.BoolProperty(
+        name="Parallel Geometry",
+        description="Compute the geometry of meshes on several processes.",
+        default=False)
+
+    #: Reorder triangles and vertices for the vertex cache.
+    optimize_vertex_cache = bpy.props.BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder triangles and vertices for the vertex cache.",
+        default=False)
+
     #: Use BSAnimationNode (for Morrowind).
     bs_animation_node = bpy.props.BoolProperty(
         name="Use NiBSAnimationNode",
@@ -119,6 +131,17 @@ class NifExportOperator(bpy.types.Operator, ExportHelper, NifOperatorCommon):
         default=True,
         options={'HIDDEN'})
 
+    #: Which stripifier to use for stripified geometries.
+    stripifier = bpy.props.EnumProperty(
+        items=[
+            ('PYFFI', "PyFFI", "Cache optimized stripifier of PyFFI."),
+            ('FAST', "Fast", "Linear time stripifier."),
+            ],
+        name="Stripifier",
+        description="Which stripifier to use for stripified geometries.",
+        default='PYFFI',
+        options={'HIDDEN'})
+
     #: Flatten skin.
     flatten_skin = bpy.props.BoolProperty(
         name="Flatten Skin",
@@ -37,6 +37,9 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import fnmatch
+import os
+
 import bpy
 from bpy_extras.io_utils import ImportHelper
 
@@ -53,6 +56,22 @@ class NifImportOperator(bpy.types.Operator, ImportHelper, NifOperatorCommon):
     #: How the nif import operators is labelled in the user interface.
     bl_label = "Import NIF"
 
+    #: Files selected in the file browser, for importing several files.
+    files = bpy.props.CollectionProperty(
+        type=bpy.types.OperatorFileListElement,
+        options={'HIDDEN', 'SKIP_SAVE'})
+
+    #: Folder of the selected files.
+    directory = bpy.props.StringProperty(
+        subtype='DIR_PATH',
+        options={'HIDDEN', 'SKIP_SAVE'})
+
+    #: Import all nif files in the folder of the selected file.
+    import_directory = bpy.props.BoolProperty(
+        name="Import Whole Folder",
+        description="Import all nif files in the folder of the selected file.",
+        default=False)
+
     #: Number of nif units per blender unit.
     scale_correction_import = bpy.props.FloatProperty(
         name="Scale Correction Import",
@@ -144,6 +163,12 @@ class NifImportOperator(bpy.types.Operator, ImportHelper, NifOperatorCommon):
         description="Parts of nif to be imported.",
         default="EVERYTHING")
 
+    #: Names of the nodes to import, instead of the whole file.
+    root_names = bpy.props.StringProperty(
+        name="Import Nodes",
+        description="Comma separated names of the nodes to import, with everything below them; leave empty to import the whole file.",
+        default="")
+
     #: Import multi-material shapes as a single mesh.
     combine_shapes = bpy.props.BoolProperty(
         name="Combine Shapes",
@@ -171,5 +196,21 @@ class NifImportOperator(bpy.types.Operator, ImportHelper, NifOperatorCommon):
                 area.spaces[0].viewport_shade = 'MATERIAL'
                 area.spaces[0].show_backface_culling = True
         
+        file_paths = self.get_file_paths()
+        if len(file_paths) > 1:
+            return nif_import.NifImport(self, context).execute_batch(file_paths)
         return nif_import.NifImport(self, context).execute()
+
+    def get_file_paths(self):
+        """Return the paths of all files to import, in alphabetical order."""
+        directory = self.directory or os.path.dirname(self.filepath)
+        if self.import_directory:
+            patterns = self.filter_glob.split(";")
+            file_names = [file_name for file_name in os.listdir(directory)
+                          if any(fnmatch.fnmatch(file_name.lower(), pattern) for pattern in patterns)]
+        else:
+            file_names = [b_file.name for b_file in self.files if b_file.name]
+        if not file_names:
+            return [self.filepath]
+        return [os.path.join(directory, file_name) for file_name in sorted(file_names)]
     
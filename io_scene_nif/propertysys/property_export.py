@@ -103,9 +103,8 @@ class ObjectProperty():
         """Return existing alpha property with given flags, or create new one
         if an alpha property with required flags is not found."""
         # search for duplicate
-        for block in self.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiAlphaProperty) \
-               and block.flags == flags and block.threshold == threshold:
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiAlphaProperty):
+            if block.flags == flags and block.threshold == threshold:
                 return block
         # no alpha property with given flag found, so create new one
         alphaprop = self.nif_export.objecthelper.create_block("NiAlphaProperty")
@@ -117,9 +116,8 @@ class ObjectProperty():
         """Return existing specular property with given flags, or create new one
         if a specular property with required flags is not found."""
         # search for duplicate
-        for block in self.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiSpecularProperty) \
-               and block.flags == flags:
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiSpecularProperty):
+            if block.flags == flags:
                 return block
         # no specular property with given flag found, so create new one
         specprop = self.nif_export.objecthelper.create_block("NiSpecularProperty")
@@ -130,9 +128,8 @@ class ObjectProperty():
         """Return existing wire property with given flags, or create new one
         if an wire property with required flags is not found."""
         # search for duplicate
-        for block in self.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiWireframeProperty) \
-               and block.flags == flags:
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiWireframeProperty):
+            if block.flags == flags:
                 return block
 
         # no wire property with given flag found, so create new one
@@ -144,11 +141,10 @@ class ObjectProperty():
         """Return existing stencil property with given flags, or create new one
         if an identical stencil property."""
         # search for duplicate
-        for block in self.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiStencilProperty):
-                # all these blocks have the same setting, no further check
-                # is needed
-                return block
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiStencilProperty):
+            # all these blocks have the same setting, no further check
+            # is needed
+            return block
         # no stencil property found, so create new one
         stencilprop = self.nif_export.objecthelper.create_block("NiStencilProperty")
         if NifOp.props.game == 'FALLOUT_3':
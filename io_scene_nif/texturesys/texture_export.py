@@ -235,9 +235,8 @@ class TextureHelper():
         self.export_nitextureprop_tex_descs(texprop)
         
         # search for duplicate
-        for block in self.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiTexturingProperty) \
-               and block.get_hash() == texprop.get_hash():
+        for block in self.nif_export.objecthelper.get_blocks(NifFormat.NiTexturingProperty):
+            if block.get_hash() == texprop.get_hash():
                 return block
 
         # no texturing property with given settings found, so use and register
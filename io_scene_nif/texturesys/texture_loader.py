@@ -163,8 +163,18 @@ class TextureLoader():
             raise TypeError("source must be NiSourceTexture or str")
         fn = fn.replace( '\\', os.sep )
         fn = fn.replace( '/', os.sep )
-        # go searching for it
+        # go searching for it, unless it was found before
         importpath = os.path.dirname(NifOp.props.filepath)
+        source_key = (importpath.lower(), fn.lower())
+        if source_key in self.nif_import.dict_texture_sources:
+            return self.nif_import.dict_texture_sources[source_key]
+        tex, b_image = self.find_source(fn, importpath)
+        self.nif_import.dict_texture_sources[source_key] = [tex, b_image]
+        return [tex, b_image]
+
+    def find_source(self, fn, importpath):
+        """Search the texture search paths for file fn, and load it."""
+        b_image = None
         searchPathList = [importpath]
         if bpy.context.user_preferences.filepaths.texture_directory:
             searchPathList.append(bpy.context.user_preferences.filepaths.texture_directory)
@@ -86,8 +86,8 @@ class TextureWriter():
         srctex.unknown_byte = 1
 
         # search for duplicate
-        for block in self.nif_export.nif_export.dict_blocks:
-            if isinstance(block, NifFormat.NiSourceTexture) and block.get_hash() == srctex.get_hash():
+        for block in self.nif_export.nif_export.objecthelper.get_blocks(NifFormat.NiSourceTexture):
+            if block.get_hash() == srctex.get_hash():
                 return block
 
         # no identical source texture found, so use and register
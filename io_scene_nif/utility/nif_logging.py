@@ -37,7 +37,9 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import collections
 import logging
+import threading
 
 class _MockOperator():
     def report(self, level, message):
@@ -49,20 +51,41 @@ class NifLog():
     # Injectable operator reference used to perform reporting, default to simple logging
     op = _MockOperator()
 
+    # Messages reported from worker threads, waiting to be passed to the operator
+    pending = collections.deque()
+
+    @staticmethod
+    def report(level, message):
+        """Report a message to the operator. Blender operators may only be
+        used from the main thread, so messages from other threads are queued
+        until the main thread calls :meth:`flush`."""
+        if threading.current_thread() is threading.main_thread():
+            NifLog.flush()
+            NifLog.op.report(level, message)
+        else:
+            NifLog.pending.append((level, message))
+
+    @staticmethod
+    def flush():
+        """Pass the messages queued by worker threads to the operator."""
+        while NifLog.pending:
+            level, message = NifLog.pending.popleft()
+            NifLog.op.report(level, message)
+
     @staticmethod
     def debug(message):
         """Report a debug message."""
-        NifLog.op.report({'DEBUG'}, message)
+        NifLog.report({'DEBUG'}, message)
 
     @staticmethod
     def info(message):
         """Report an informative message."""
-        NifLog.op.report({'INFO'}, message)
+        NifLog.report({'INFO'}, message)
 
     @staticmethod
     def warn(message):
         """Report a warning message."""
-        NifLog.op.report({'WARNING'}, message)
+        NifLog.report({'WARNING'}, message)
 
     @staticmethod
     def error(message):
@@ -77,7 +100,7 @@ class NifLog():
 
             The :ref:`error reporting <dev-design-error-reporting>` design.
         """
-        NifLog.op.report({'ERROR'}, message)
+        NifLog.report({'ERROR'}, message)
         return {'FINISHED'}
     
     @staticmethod
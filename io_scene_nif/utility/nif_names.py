@@ -0,0 +1,71 @@
+''' Nif Utilities, allocates unique names for exported blocks'''
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2005-2015, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+
+class NameRegistry():
+    """Keeps track of the names taken in the nif, and hands out unique
+    names by appending a ``.%02d`` suffix to names already taken.
+
+    Taken names are kept in a set, and the next suffix to try is kept per
+    name: names are never released, so all lower suffixes are still taken
+    the next time the same name is asked for.
+    """
+
+    def __init__(self, names=()):
+        self.taken = set(names)
+        self.suffixes = {}
+
+    def get_unique_name(self, name):
+        """Return name, or name with the lowest free suffix if it is taken,
+        and mark the result as taken.
+
+        :param name: The wanted name.
+        :type name: :class:`str`
+        :rtype: :class:`str`
+        """
+        unique_name = name
+        if unique_name in self.taken:
+            unique_int = self.suffixes.get(name, 0)
+            unique_name = "%s.%02d" % (name, unique_int)
+            while unique_name in self.taken:
+                unique_int += 1
+                unique_name = "%s.%02d" % (name, unique_int)
+            self.suffixes[name] = unique_int + 1
+        self.taken.add(unique_name)
+        return unique_name
@@ -0,0 +1,83 @@
+"""Benchmark for bulk mesh construction during import.
+
+Compares the old element-by-element way of growing a mesh with
+:class:`~io_scene_nif.geometrysys.mesh_builder.MeshBuilder` on square grid
+meshes of increasing size. Run as::
+
+    blender --background --factory-startup --python perf_mesh_builder.py -- 1000 10000 200000
+"""
+
+import sys
+import time
+
+import bpy
+
+from io_scene_nif.geometrysys.mesh_builder import MeshBuilder
+
+DEFAULT_SIZES = (1000, 10000, 50000, 200000)
+
+
+def grid(num_verts):
+    """Return vertex coordinates and triangles of a square grid with about
+    num_verts vertices."""
+    side = max(2, int(num_verts ** 0.5))
+    coords = [(x, y, 0.0) for y in range(side) for x in range(side)]
+    triangles = []
+    for y in range(side - 1):
+        for x in range(side - 1):
+            v0 = y * side + x
+            triangles.append((v0, v0 + 1, v0 + side + 1))
+            triangles.append((v0, v0 + side + 1, v0 + side))
+    return coords, triangles
+
+
+def build_per_element(b_mesh, coords, triangles):
+    """Grow the mesh one element at a time, as import_mesh used to."""
+    for co in coords:
+        b_mesh.vertices.add(1)
+        b_mesh.vertices[-1].co = co
+    b_mesh.polygons.add(len(triangles))
+    b_mesh.loops.add(len(triangles) * 3)
+    for f_index, tri in enumerate(triangles):
+        b_mesh.polygons[f_index].loop_start = 3 * f_index
+        b_mesh.polygons[f_index].loop_total = 3
+        for i, vert_index in enumerate(tri):
+            b_mesh.loops[3 * f_index + i].vertex_index = vert_index
+        b_mesh.polygons[f_index].use_smooth = True
+        b_mesh.polygons[f_index].material_index = 0
+
+
+def build_bulk(b_mesh, coords, triangles):
+    """Grow the mesh with the bulk builder."""
+    builder = MeshBuilder(b_mesh)
+    builder.add_vertices(coords)
+    f_start = builder.add_polygons([v for tri in triangles for v in tri],
+                                   [3] * len(triangles))
+    builder.set_polygon_attributes(f_start, use_smooth=True, material_index=0)
+
+
+def time_build(build, coords, triangles):
+    b_mesh = bpy.data.meshes.new("perf")
+    start = time.perf_counter()
+    build(b_mesh, coords, triangles)
+    b_mesh.validate()
+    b_mesh.update()
+    elapsed = time.perf_counter() - start
+    bpy.data.meshes.remove(b_mesh)
+    return elapsed
+
+
+def run(sizes=DEFAULT_SIZES):
+    print("{0:>10} {1:>10} {2:>14} {3:>10} {4:>8}".format(
+        "vertices", "polygons", "per element", "bulk", "speedup"))
+    for size in sizes:
+        coords, triangles = grid(size)
+        t_old = time_build(build_per_element, coords, triangles)
+        t_new = time_build(build_bulk, coords, triangles)
+        print("{0:>10} {1:>10} {2:>13.3f}s {3:>9.3f}s {4:>7.1f}x".format(
+            len(coords), len(triangles), t_old, t_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    run([int(arg) for arg in args] or DEFAULT_SIZES)
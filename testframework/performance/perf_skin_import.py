@@ -0,0 +1,88 @@
+"""Benchmark for skin weight import.
+
+Compares adding skin weights to vertex groups one weight at a time with
+adding them in batches of equal weight, as returned by
+:func:`~io_scene_nif.geometrysys.vertex_groups.group_weights`, on a grid
+mesh standing in for a skinned full-body mesh. Every vertex is weighted to
+four of the bones, with weights rounded to 1/256 as stored by most
+exporters. Run as::
+
+    blender --background --factory-startup --python perf_skin_import.py -- 10000 50000
+"""
+
+import os
+import random
+import sys
+import time
+
+import bpy
+
+from io_scene_nif.geometrysys.vertex_groups import group_weights
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from perf_mesh_builder import grid, build_bulk
+
+DEFAULT_SIZES = (10000, 50000)
+NUM_BONES = 60
+BONES_PER_VERTEX = 4
+
+
+def skin_weights(num_verts):
+    """Return a list of (vertex index, weight) lists, one for each bone."""
+    random.seed(0)
+    bone_weights = [[] for _ in range(NUM_BONES)]
+    for vert in range(num_verts):
+        bones = random.sample(range(NUM_BONES), BONES_PER_VERTEX)
+        raw = [random.random() for _ in bones]
+        total = sum(raw)
+        for bone, weight in zip(bones, raw):
+            bone_weights[bone].append((vert, round(256 * weight / total) / 256))
+    return bone_weights
+
+
+def add_per_weight(b_obj, bone_weights):
+    """Add the weights one at a time, as import_mesh used to."""
+    for bone, vertex_weights in enumerate(bone_weights):
+        v_group = b_obj.vertex_groups.new("Bone%i" % bone)
+        for vert, weight in vertex_weights:
+            v_group.add([vert], weight, 'REPLACE')
+
+
+def add_grouped(b_obj, bone_weights):
+    """Add the weights with one call for every distinct weight."""
+    for bone, vertex_weights in enumerate(bone_weights):
+        v_group = b_obj.vertex_groups.new("Bone%i" % bone)
+        vertices = [vert for vert, weight in vertex_weights]
+        weights = [weight for vert, weight in vertex_weights]
+        for weight, groupverts in group_weights(vertices, weights):
+            v_group.add(groupverts, weight, 'REPLACE')
+
+
+def time_skin(add, coords, triangles, bone_weights):
+    b_mesh = bpy.data.meshes.new("perf")
+    build_bulk(b_mesh, coords, triangles)
+    b_obj = bpy.data.objects.new("perf", b_mesh)
+    start = time.perf_counter()
+    add(b_obj, bone_weights)
+    elapsed = time.perf_counter() - start
+    bpy.data.objects.remove(b_obj)
+    bpy.data.meshes.remove(b_mesh)
+    return elapsed
+
+
+def run(sizes=DEFAULT_SIZES):
+    print("{0:>10} {1:>10} {2:>14} {3:>10} {4:>8}".format(
+        "vertices", "weights", "per weight", "grouped", "speedup"))
+    for size in sizes:
+        coords, triangles = grid(size)
+        bone_weights = skin_weights(len(coords))
+        num_weights = sum(len(vertex_weights) for vertex_weights in bone_weights)
+        t_old = time_skin(add_per_weight, coords, triangles, bone_weights)
+        t_new = time_skin(add_grouped, coords, triangles, bone_weights)
+        print("{0:>10} {1:>10} {2:>13.3f}s {3:>9.3f}s {4:>7.1f}x".format(
+            len(coords), num_weights, t_old, t_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    run([int(arg) for arg in args] or DEFAULT_SIZES)
@@ -0,0 +1,101 @@
+"""Benchmark for skin partitioning during export.
+
+Compares ``NiTriBasedGeom.update_skin_partition`` of PyFFI with
+:func:`~io_scene_nif.geometrysys.skin_partition.get_skin_partition` on square
+grid meshes of increasing size, skinned to a row of bones with some random
+extra influences. The second run of the new partitioner is served from its
+cache. Run as::
+
+    blender --background --factory-startup --python perf_skin_partition.py -- 1000 10000 50000
+"""
+
+import os
+import random
+import sys
+import time
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import skin_partition
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from perf_mesh_builder import grid
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+NUM_BONES = 40
+MAX_BONES_PER_PARTITION = 18
+MAX_BONES_PER_VERTEX = 4
+
+
+def skin_weights(coords):
+    """Blend two neighbouring bones along x, and add a random third bone."""
+    weights = numpy.zeros((len(coords), NUM_BONES))
+    width = max(x for x, y, z in coords) or 1.0
+    for v, (x, y, z) in enumerate(coords):
+        t = x / width * (NUM_BONES - 2)
+        bone = int(t)
+        weights[v, bone] = 1.0 - (t - bone)
+        weights[v, bone + 1] += t - bone
+        weights[v, random.randrange(NUM_BONES)] += 0.2
+    return weights / weights.sum(axis=1)[:, None]
+
+
+def skinned_shape(coords, weights):
+    """A shape with the given weights, as the exporter builds it."""
+    shape = NifFormat.NiTriShape()
+    shape.data = NifFormat.NiTriShapeData()
+    shape.data.num_vertices = len(coords)
+    shape.data.vertices.update_size()
+    shape.skin_instance = NifFormat.NiSkinInstance()
+    shape.skin_instance.data = NifFormat.NiSkinData()
+    shape.skin_instance.skeleton_root = NifFormat.NiNode()
+    for bone in range(NUM_BONES):
+        vertices = numpy.nonzero(weights[:, bone])[0].tolist()
+        shape.add_bone(NifFormat.NiNode(),
+                       dict(zip(vertices, weights[vertices, bone].tolist())))
+    return shape
+
+
+def time_pyffi(coords, triangles, weights):
+    shape = skinned_shape(coords, weights)
+    start = time.perf_counter()
+    shape.update_skin_partition(
+        maxbonesperpartition=MAX_BONES_PER_PARTITION,
+        maxbonespervertex=MAX_BONES_PER_VERTEX,
+        stripify=False, triangles=triangles, maximize_bone_sharing=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, shape.skin_instance.skin_partition.num_skin_partition_blocks
+
+
+def time_fast(triangles, weights):
+    start = time.perf_counter()
+    partitions, lostweight = skin_partition.get_skin_partition(
+        triangles, weights,
+        maxbonesperpartition=MAX_BONES_PER_PARTITION,
+        maxbonespervertex=MAX_BONES_PER_VERTEX,
+        stripify=False, maximize_bone_sharing=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(partitions)
+
+
+def run(sizes=DEFAULT_SIZES):
+    print("{0:>10} {1:>10} {2:>6} {3:>10} {4:>6} {5:>10} {6:>8}".format(
+        "triangles", "pyffi s", "parts", "fast s", "parts", "cached s", "speedup"))
+    random.seed(0)
+    for size in sizes:
+        coords, triangles = grid(size)
+        weights = skin_weights(coords)
+        skin_partition._cache.clear()
+        t_old, parts_old = time_pyffi(coords, triangles, weights)
+        t_new, parts_new = time_fast(triangles, weights)
+        t_cached, parts_cached = time_fast(triangles, weights)
+        print("{0:>10} {1:>10.3f} {2:>6} {3:>10.3f} {4:>6} {5:>10.4f} {6:>7.1f}x".format(
+            len(triangles), t_old, parts_old, t_new, parts_new, t_cached,
+            t_old / t_new))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    run([int(arg) for arg in args] or DEFAULT_SIZES)
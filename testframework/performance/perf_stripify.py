@@ -0,0 +1,59 @@
+"""Benchmark for triangle strip generation during export.
+
+Compares the cache optimizing stripifier of PyFFI, as used by
+``NiTriStripsData.set_triangles``, with
+:func:`~io_scene_nif.geometrysys.tri_strips.stripify` on square grid meshes
+of increasing size, both with triangles in grid order and shuffled. Reports
+triangle throughput and the length of the stitched strip. Run as::
+
+    blender --background --factory-startup --python perf_stripify.py -- 1000 10000 50000
+"""
+
+import os
+import random
+import sys
+import time
+
+import pyffi.utils.vertex_cache
+
+from io_scene_nif.geometrysys import tri_strips
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from perf_mesh_builder import grid
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+
+def stripify_pyffi(triangles):
+    return pyffi.utils.vertex_cache.stripify(triangles, stitchstrips=True)
+
+
+def stripify_fast(triangles):
+    return tri_strips.stripify(triangles, stitchstrips=True)
+
+
+def time_stripify(stripify, triangles):
+    start = time.perf_counter()
+    strips = stripify(triangles)
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(len(strip) for strip in strips)
+
+
+def run(sizes=DEFAULT_SIZES):
+    print("{0:>10} {1:>9} {2:>12} {3:>10} {4:>12} {5:>10} {6:>8}".format(
+        "triangles", "order", "pyffi tri/s", "length", "fast tri/s", "length", "speedup"))
+    random.seed(0)
+    for size in sizes:
+        coords, triangles = grid(size)
+        shuffled = random.sample(triangles, len(triangles))
+        for order, tris in (("grid", triangles), ("shuffled", shuffled)):
+            t_old, len_old = time_stripify(stripify_pyffi, tris)
+            t_new, len_new = time_stripify(stripify_fast, tris)
+            print("{0:>10} {1:>9} {2:>12.0f} {3:>10} {4:>12.0f} {5:>10} {6:>7.1f}x".format(
+                len(tris), order, len(tris) / t_old, len_old,
+                len(tris) / t_new, len_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    run([int(arg) for arg in args] or DEFAULT_SIZES)
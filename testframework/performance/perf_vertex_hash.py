@@ -0,0 +1,115 @@
+"""Benchmark for finding duplicate vertices during export.
+
+Compares the linear scan over the vertices already emitted for the same
+blender vertex, as export_tri_shapes used to do, with lookups one loop at a
+time in :class:`~io_scene_nif.geometrysys.vertex_hash.VertexHash`, and with
+all loops at once through
+:func:`~io_scene_nif.geometrysys.vertex_hash.find_vertices`, as
+``build_tri_geometry`` does, on the loops of square grid meshes of
+increasing size. Every vertex has six loops, and a uv seam along every
+eighth column splits its vertices in two. Normals are
+either axis aligned or smooth, colors either white or varying per vertex.
+Run as::
+
+    blender --background --factory-startup --python perf_vertex_hash.py -- 1000 10000 50000
+"""
+
+import math
+import random
+import sys
+import time
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_hash import VertexHash, find_vertices
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+EPSILON = 0.0005
+LOOPS_PER_VERTEX = 6
+
+
+def get_loops(num_verts, smooth, white):
+    """Return the (blender vertex, attributes) of every loop of a grid with
+    about num_verts vertices, with uv, normal and color attributes."""
+    side = max(2, int(num_verts ** 0.5))
+    loops = []
+    for y in range(side):
+        for x in range(side):
+            vertex_index = y * side + x
+            u, v = x / side, y / side
+            if smooth:
+                angle = 0.3 + 0.5 * math.sin(x * 0.1) + 0.5 * math.cos(y * 0.1)
+                normal = [math.sin(angle) * 0.6, math.cos(angle) * 0.6, 0.8]
+            else:
+                normal = [0.0, 0.0, 1.0]
+            color = [1.0, 1.0, 1.0, 1.0] if white else [u, v, 0.5, 1.0]
+            for loop in range(LOOPS_PER_VERTEX):
+                # half of the loops of a seam vertex are on the other island
+                if x % 8 == 0 and loop % 2:
+                    uv = [u + 0.5, v]
+                else:
+                    uv = [u, v]
+                loops.append((vertex_index, uv + normal + color))
+    random.shuffle(loops)
+    return loops
+
+
+def scan(loops):
+    """Compare against all vertices of the same blender vertex."""
+    vertmap = {}
+    num_added = 0
+    for vertex_index, attributes in loops:
+        for j, other in vertmap.get(vertex_index, ()):
+            if all(abs(value - other_value) <= EPSILON
+                   for value, other_value in zip(attributes, other)):
+                break
+        else:
+            vertmap.setdefault(vertex_index, []).append((num_added, attributes))
+            num_added += 1
+    return num_added
+
+
+def hash_lookup(loops):
+    vertex_hash = VertexHash(EPSILON)
+    num_added = 0
+    for vertex_index, attributes in loops:
+        if vertex_hash.find(vertex_index, attributes) is None:
+            vertex_hash.add(vertex_index, attributes, num_added)
+            num_added += 1
+    return num_added
+
+
+def batch_lookup(vertex_indices, attributes):
+    indices, added = find_vertices(vertex_indices, attributes, EPSILON)
+    return len(added)
+
+
+def time_lookup(lookup, *args):
+    start = time.perf_counter()
+    num_added = lookup(*args)
+    return time.perf_counter() - start, num_added
+
+
+def run(sizes=DEFAULT_SIZES):
+    print("{0:>10} {1:>7} {2:>6} {3:>10} {4:>10} {5:>10} {6:>10} {7:>8}".format(
+        "vertices", "normals", "colors", "exported", "scan s", "hash s", "batch s", "speedup"))
+    random.seed(0)
+    for size in sizes:
+        for smooth in (False, True):
+            for white in (True, False):
+                loops = get_loops(size, smooth, white)
+                # the exporter has the loop attributes as arrays already
+                vertex_indices = numpy.array([vertex_index for vertex_index, attributes in loops])
+                attributes = numpy.array([attributes for vertex_index, attributes in loops])
+                t_old, num_old = time_lookup(scan, loops)
+                t_hash, num_hash = time_lookup(hash_lookup, loops)
+                t_new, num_new = time_lookup(batch_lookup, vertex_indices, attributes)
+                assert num_old == num_hash == num_new
+                print("{0:>10} {1:>7} {2:>6} {3:>10} {4:>10.3f} {5:>10.3f} {6:>10.3f} {7:>7.1f}x".format(
+                    size, "smooth" if smooth else "axis", "white" if white else "vary",
+                    num_new, t_old, t_hash, t_new, t_old / t_new))
+
+
+if __name__ == "__main__":
+    args = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    run([int(arg) for arg in args] or DEFAULT_SIZES)
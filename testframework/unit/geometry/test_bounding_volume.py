@@ -0,0 +1,74 @@
+import nose
+from nose.tools import assert_equal, assert_true
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import bounding_volume
+from io_scene_nif.geometrysys import geometry_data
+
+
+class Test_Bounding_Volume:
+
+    def setup(self):
+        random = numpy.random.RandomState(0)
+        # points on a unit sphere around (1, 2, 3), denser on one side
+        directions = random.normal(size=(500, 3))
+        directions[:, 0] = numpy.abs(directions[:, 0]) * 3
+        directions /= numpy.sqrt((directions ** 2).sum(axis=1))[:, None]
+        self.coords = directions + (1, 2, 3)
+
+    def check_sphere(self, center, radius):
+        dists = numpy.sqrt(((self.coords - center) ** 2).sum(axis=1))
+        assert_true(dists.max() <= radius + 1e-9)
+
+    def test_bounding_box(self):
+        minimum, maximum = bounding_volume.get_bounding_box([(0, 5, 1), (2, -1, 3), (1, 0, -4)])
+        assert_equal(minimum.tolist(), [0, -1, -4])
+        assert_equal(maximum.tolist(), [2, 5, 3])
+
+    def test_box_sphere(self):
+        # same center and radius as pyffi
+        n_data = NifFormat.NiTriShapeData()
+        geometry_data.set_vertices(n_data, self.coords)
+        n_data.update_center_radius()
+        center, radius = bounding_volume.get_box_sphere(self.coords)
+        assert_true(numpy.allclose(center, (n_data.center.x, n_data.center.y, n_data.center.z)))
+        assert_true(abs(radius - n_data.radius) < 1e-6)
+        self.check_sphere(center, radius)
+
+    def test_ritter_sphere(self):
+        center, radius = bounding_volume.get_ritter_sphere(self.coords)
+        self.check_sphere(center, radius)
+        # close to the unit sphere the points are on
+        assert_true(radius < 1.1)
+
+    def test_bounding_sphere(self):
+        center, radius = bounding_volume.get_bounding_sphere(self.coords)
+        self.check_sphere(center, radius)
+        assert_true(radius <= bounding_volume.get_box_sphere(self.coords)[1])
+        assert_true(radius <= bounding_volume.get_ritter_sphere(self.coords)[1])
+
+    def test_single_vertex(self):
+        center, radius = bounding_volume.get_bounding_sphere([(1, 2, 3)])
+        assert_equal(center.tolist(), [1, 2, 3])
+        assert_equal(radius, 0.0)
+
+    def test_empty(self):
+        center, radius = bounding_volume.get_bounding_sphere(numpy.zeros((0, 3)))
+        assert_equal(center.tolist(), [0, 0, 0])
+        assert_equal(radius, 0.0)
+
+    def test_capsule(self):
+        first_point, second_point, radius = bounding_volume.get_capsule(
+            [(-1, -1, -5), (1, 1, 5)])
+        assert_equal(radius, 1.0)
+        assert_equal(first_point.tolist(), [0, 0, 4])
+        assert_equal(second_point.tolist(), [0, 0, -4])
+
+    def test_set_bounding_sphere(self):
+        n_data = NifFormat.NiTriShapeData()
+        geometry_data.set_bounding_sphere(n_data, numpy.array([1.0, 2.0, 3.0]), 4.0)
+        assert_equal((n_data.center.x, n_data.center.y, n_data.center.z), (1.0, 2.0, 3.0))
+        assert_equal(n_data.radius, 4.0)
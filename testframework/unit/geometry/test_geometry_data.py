@@ -0,0 +1,107 @@
+import nose
+from nose.tools import assert_equal, assert_true, raises
+
+import io
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import geometry_data
+
+
+class Test_Geometry_Data:
+
+    def setup(self):
+        numpy.random.seed(0)
+        # float32 values survive the round trip through pyffi exactly
+        self.coords = numpy.random.uniform(-10, 10, (20, 3)).astype(numpy.float32)
+        self.normals = numpy.random.uniform(-1, 1, (20, 3)).astype(numpy.float32)
+        self.colors = numpy.random.uniform(0, 1, (20, 4)).astype(numpy.float32)
+        self.uv_sets = numpy.random.uniform(0, 1, (2, 20, 2)).astype(numpy.float32)
+        self.n_data = NifFormat.NiTriShapeData()
+
+    def test_vertices(self):
+        geometry_data.set_vertices(self.n_data, self.coords)
+        assert_equal(self.n_data.num_vertices, 20)
+        assert_true(self.n_data.has_vertices)
+        assert_equal(self.n_data.vertices[3].y, float(self.coords[3, 1]))
+        assert_true(numpy.array_equal(geometry_data.get_vertices(self.n_data), self.coords))
+
+    def test_normals(self):
+        geometry_data.set_vertices(self.n_data, self.coords)
+        assert_equal(geometry_data.get_normals(self.n_data), None)
+        geometry_data.set_normals(self.n_data, self.normals)
+        assert_true(self.n_data.has_normals)
+        assert_true(numpy.array_equal(geometry_data.get_normals(self.n_data), self.normals))
+
+    def test_vertex_colors(self):
+        geometry_data.set_vertices(self.n_data, self.coords)
+        assert_equal(geometry_data.get_vertex_colors(self.n_data), None)
+        geometry_data.set_vertex_colors(self.n_data, self.colors)
+        assert_true(self.n_data.has_vertex_colors)
+        assert_equal(self.n_data.vertex_colors[5].a, float(self.colors[5, 3]))
+        assert_true(numpy.array_equal(geometry_data.get_vertex_colors(self.n_data), self.colors))
+
+    def test_uv_sets(self):
+        geometry_data.set_vertices(self.n_data, self.coords)
+        assert_equal(geometry_data.get_uv_sets(self.n_data).shape, (0, 20, 2))
+        geometry_data.set_uv_sets(self.n_data, self.uv_sets)
+        assert_true(self.n_data.has_uv)
+        assert_equal(self.n_data.num_uv_sets, 2)
+        assert_equal(self.n_data.bs_num_uv_sets, 2)
+        assert_equal(self.n_data.uv_sets[1][7].v, float(self.uv_sets[1, 7, 1]))
+        assert_true(numpy.array_equal(geometry_data.get_uv_sets(self.n_data), self.uv_sets))
+
+    def test_from_lists(self):
+        # the exporter passes plain lists of tuples
+        geometry_data.set_vertices(self.n_data, [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+        geometry_data.set_normals(self.n_data, [(0.0, 0.0, 1.0), (0.0, 1.0, 0.0)])
+        assert_equal(geometry_data.get_vertices(self.n_data).tolist(),
+                     [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        assert_equal(geometry_data.get_normals(self.n_data).tolist(),
+                     [[0.0, 0.0, 1.0], [0.0, 1.0, 0.0]])
+
+    def test_round_trip(self):
+        # values stored on pyffi's basic instances are seen by the public
+        # attributes, and are written to and read from a file
+        geometry_data.set_vertices(self.n_data, self.coords)
+        geometry_data.set_normals(self.n_data, self.normals)
+        geometry_data.set_vertex_colors(self.n_data, self.colors)
+        geometry_data.set_uv_sets(self.n_data, self.uv_sets)
+        for i in (0, 19):
+            n_vec = self.n_data.vertices[i]
+            assert_equal([n_vec.x, n_vec.y, n_vec.z], self.coords[i].tolist())
+            n_vec = self.n_data.normals[i]
+            assert_equal([n_vec.x, n_vec.y, n_vec.z], self.normals[i].tolist())
+            n_vcol = self.n_data.vertex_colors[i]
+            assert_equal([n_vcol.r, n_vcol.g, n_vcol.b, n_vcol.a], self.colors[i].tolist())
+            n_uv = self.n_data.uv_sets[1][i]
+            assert_equal([n_uv.u, n_uv.v], self.uv_sets[1, i].tolist())
+        data = NifFormat.Data(version=0x0A020000)
+        data.roots = [self.n_data]
+        stream = io.BytesIO()
+        data.write(stream)
+        stream.seek(0)
+        data = NifFormat.Data()
+        data.inspect_version_only(stream)
+        data.read(stream)
+        n_data = data.roots[0]
+        assert_true(numpy.array_equal(geometry_data.get_vertices(n_data), self.coords))
+        assert_true(numpy.array_equal(geometry_data.get_normals(n_data), self.normals))
+        assert_true(numpy.array_equal(geometry_data.get_vertex_colors(n_data), self.colors))
+        assert_true(numpy.array_equal(geometry_data.get_uv_sets(n_data), self.uv_sets))
+
+    def test_public_attributes(self):
+        # structs without basic instances are set through their attributes
+        class Vector():
+            x = y = z = 0.0
+        n_vectors = [Vector(), Vector()]
+        geometry_data._set_vectors(n_vectors, numpy.array([(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)]))
+        assert_equal([(n_vec.x, n_vec.y, n_vec.z) for n_vec in n_vectors],
+                     [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)])
+
+    @raises(ValueError)
+    def test_normals_count_mismatch(self):
+        geometry_data.set_vertices(self.n_data, self.coords)
+        geometry_data.set_normals(self.n_data, self.normals[:10])
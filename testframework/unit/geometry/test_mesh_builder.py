@@ -0,0 +1,33 @@
+import nose
+from nose.tools import assert_equal
+
+import bpy
+import numpy
+
+from io_scene_nif.geometrysys.mesh_builder import MeshBuilder
+
+
+class Test_Shape_Key:
+
+    @classmethod
+    def setup_class(cls):
+        cls.b_mesh = bpy.data.meshes.new("test_shape_key")
+        MeshBuilder(cls.b_mesh).add_vertices([(0, 0, 0), (1, 0, 0), (0, 1, 0)])
+        cls.b_obj = bpy.data.objects.new("test_shape_key", cls.b_mesh)
+        cls.b_obj.shape_key_add(name="Basis", from_mix=False)
+
+    @classmethod
+    def teardown_class(cls):
+        bpy.data.objects.remove(cls.b_obj)
+        bpy.data.meshes.remove(cls.b_mesh)
+
+    def test_set_shape_key(self):
+        # NIF vertices 1 and 3 were welded into Blender vertex 1
+        coords = numpy.array([(0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 0, 2)])
+        v_map = [0, 1, 2, 1]
+        b_key = self.b_obj.shape_key_add(name="Key 1", from_mix=False)
+        MeshBuilder.set_shape_key(b_key, coords, v_map)
+        assert_equal([tuple(point.co) for point in b_key.data],
+                     [(0, 0, 1), (1, 0, 2), (0, 1, 1)])
+        # the mesh itself is not affected
+        assert_equal(tuple(self.b_mesh.vertices[1].co), (1, 0, 0))
@@ -0,0 +1,47 @@
+import nose
+from nose.tools import assert_equal
+
+import bpy
+
+from io_scene_nif.geometrysys.mesh_builder import MeshBuilder
+from io_scene_nif.geometrysys.mesh_partition import MeshPartition
+
+
+class Test_Mesh_Partition:
+
+    @classmethod
+    def setup_class(cls):
+        cls.b_mesh = bpy.data.meshes.new("test_mesh_partition")
+        b_builder = MeshBuilder(cls.b_mesh)
+        b_builder.add_vertices([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)])
+        b_builder.add_polygons([0, 1, 2, 0, 2, 3, 0, 1, 3], [3, 3, 3])
+        for poly, material_index in zip(cls.b_mesh.polygons, [1, 0, 1]):
+            poly.material_index = material_index
+
+    @classmethod
+    def teardown_class(cls):
+        bpy.data.meshes.remove(cls.b_mesh)
+
+    def test_polygons(self):
+        b_partition = MeshPartition(self.b_mesh)
+        assert_equal(b_partition.get_polygons(), [0, 1, 2])
+        assert_equal(b_partition.get_polygons(0), [1])
+        assert_equal(b_partition.get_polygons(1), [0, 2])
+        assert_equal(b_partition.get_polygons(2), [])
+
+    def test_loops(self):
+        b_partition = MeshPartition(self.b_mesh)
+        assert_equal(b_partition.loop_starts.tolist(), [0, 3, 6])
+        assert_equal(b_partition.loop_vertices.tolist(), [0, 1, 2, 0, 2, 3, 0, 1, 3])
+        assert_equal(b_partition.vertex_coords[2].tolist(), [1, 1, 0])
+
+    def test_slice(self):
+        b_partition = MeshPartition(self.b_mesh)
+        b_slice = b_partition.get_slice(b_partition.get_polygons(1))
+        assert_equal(b_slice.polygons.tolist(), [0, 2])
+        assert_equal(b_slice.loop_starts.tolist(), [0, 3])
+        assert_equal(b_slice.loop_vertices.tolist(), [0, 1, 2, 0, 1, 3])
+        # vertices are not cut
+        assert_equal(len(b_slice.vertex_coords), 4)
+        assert_equal(b_slice.uvs, [])
+        assert_equal(b_slice.colors, None)
@@ -0,0 +1,76 @@
+import nose
+from nose.tools import assert_equal
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import morph_data
+
+
+def reference_morph_vectors(key_coords, base_coords, vertmap, num_vertices):
+    """Per vertex morph export, as done by the original exporter."""
+    vectors = [[0.0, 0.0, 0.0] for i in range(num_vertices)]
+    for b_v_index, vert_indices in enumerate(vertmap):
+        if not vert_indices:
+            continue
+        mv = list(key_coords[b_v_index])
+        if base_coords is not None:
+            mv = [mv[j] - base_coords[b_v_index][j] for j in range(3)]
+        for vert_index in vert_indices:
+            vectors[vert_index] = mv
+    return vectors
+
+
+class Test_Morph_Data:
+
+    def setup(self):
+        numpy.random.seed(0)
+        self.base_coords = numpy.random.uniform(-1, 1, (6, 3)).astype(numpy.float32)
+        self.key_coords = numpy.random.uniform(-1, 1, (6, 3)).astype(numpy.float32)
+        # vertex 2 is not exported, vertex 4 is split in three
+        self.vertmap = [[0], [1, 5], None, [2], [3, 6, 7], [4]]
+        self.num_vertices = 8
+
+    def test_vertmap_indices(self):
+        b_indices, n_indices = morph_data.get_vertmap_indices(self.vertmap)
+        assert_equal(b_indices.tolist(), [0, 1, 1, 3, 4, 4, 4, 5])
+        assert_equal(n_indices.tolist(), [0, 1, 5, 2, 3, 6, 7, 4])
+
+    def check_morph_vectors(self, base_coords):
+        vectors = morph_data.get_morph_vectors(
+            self.key_coords, base_coords,
+            morph_data.get_vertmap_indices(self.vertmap), self.num_vertices)
+        ref_vectors = reference_morph_vectors(
+            self.key_coords, base_coords, self.vertmap, self.num_vertices)
+        assert_equal(vectors.tolist(), numpy.array(ref_vectors, dtype=numpy.float32).tolist())
+
+    def test_morph_vectors_relative(self):
+        self.check_morph_vectors(self.base_coords)
+
+    def test_morph_vectors_base(self):
+        self.check_morph_vectors(None)
+
+    def test_set_morph_vectors(self):
+        n_morph_data = NifFormat.NiMorphData()
+        n_morph_data.num_morphs = 1
+        n_morph_data.num_vertices = self.num_vertices
+        n_morph_data.morphs.update_size()
+        n_morph = n_morph_data.morphs[0]
+        vectors = morph_data.get_morph_vectors(
+            self.key_coords, self.base_coords,
+            morph_data.get_vertmap_indices(self.vertmap), self.num_vertices)
+        morph_data.set_morph_vectors(n_morph, vectors)
+        assert_equal(n_morph.arg, self.num_vertices)
+        assert_equal([(v.x, v.y, v.z) for v in n_morph.vectors],
+                     [tuple(v) for v in vectors.tolist()])
+
+    def test_set_float_keys(self):
+        n_data = NifFormat.NiFloatData().data
+        morph_data.set_float_keys(n_data, numpy.array([0.0, 0.5, 1.25]), [1.0, 0.0, 0.5])
+        assert_equal(n_data.num_keys, 3)
+        assert_equal(n_data.interpolation, NifFormat.KeyType.LINEAR_KEY)
+        assert_equal([(k.arg, k.time, k.value) for k in n_data.keys],
+                     [(NifFormat.KeyType.LINEAR_KEY, 0.0, 1.0),
+                      (NifFormat.KeyType.LINEAR_KEY, 0.5, 0.0),
+                      (NifFormat.KeyType.LINEAR_KEY, 1.25, 0.5)])
@@ -0,0 +1,75 @@
+import nose
+from nose.tools import assert_equal
+
+import numpy
+
+from io_scene_nif.geometrysys import seam_normals
+
+
+def reference_seam_normals(coords, mesh_indices, normals, resolution):
+    """Per loop dictionary based smoothing, as done by the original exporter."""
+    vdict = {}
+    for i, co in enumerate(coords):
+        vdict.setdefault(tuple(int(x * resolution) for x in co), []).append(i)
+    result = {}
+    for loops in vdict.values():
+        if len(set(mesh_indices[i] for i in loops)) <= 1:
+            continue
+        norm = numpy.sum([normals[i] for i in loops], axis=0)
+        norm /= numpy.linalg.norm(norm) or 1.0
+        fitlist = [numpy.dot(normals[i], norm) for i in loops]
+        bestfit = max(fitlist)
+        norm = numpy.sum([normals[i] for i, fit in zip(loops, fitlist)
+                          if fit >= bestfit - 0.2], axis=0)
+        norm /= numpy.linalg.norm(norm) or 1.0
+        for i in loops:
+            result[i] = norm
+    return result
+
+
+class Test_Seam_Normals:
+
+    def check_seam_normals(self, coords, mesh_indices, normals):
+        is_seam, normals_out, num_seams = seam_normals.get_seam_normals(
+            coords, mesh_indices, normals, 1000)
+        ref = reference_seam_normals(coords, mesh_indices, normals, 1000)
+        assert_equal(sorted(numpy.flatnonzero(is_seam).tolist()), sorted(ref))
+        for i, norm in ref.items():
+            assert_equal(numpy.allclose(normals_out[i], norm), True)
+        return num_seams
+
+    def test_two_planes(self):
+        # two quads meeting at a right angle, sharing the edge x = 1
+        coords = numpy.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+                              (1, 0, 0), (1, 0, 1), (1, 1, 1), (1, 1, 0)],
+                             dtype=numpy.float64)
+        mesh_indices = numpy.array([0, 0, 0, 0, 1, 1, 1, 1])
+        normals = numpy.array([(0, 0, 1)] * 4 + [(-1, 0, 0)] * 4, dtype=numpy.float64)
+        assert_equal(self.check_seam_normals(coords, mesh_indices, normals), 2)
+
+    def test_same_mesh(self):
+        # shared positions within a single mesh are not seams
+        coords = numpy.array([(0, 0, 0), (0, 0, 0), (1, 0, 0)], dtype=numpy.float64)
+        normals = numpy.array([(0, 0, 1), (1, 0, 0), (0, 1, 0)], dtype=numpy.float64)
+        assert_equal(self.check_seam_normals(coords, numpy.zeros(3), normals), 0)
+
+    def test_outliers(self):
+        # the polygon facing the other way is left out of the average
+        coords = numpy.zeros((4, 3))
+        mesh_indices = numpy.array([0, 1, 1, 2])
+        normals = numpy.array([(0, 0, 1), (0, 0.6, 0.8), (0, 0, 1), (0, 0, -1)],
+                              dtype=numpy.float64)
+        self.check_seam_normals(coords, mesh_indices, normals)
+
+    def test_random(self):
+        numpy.random.seed(0)
+        coords = numpy.round(numpy.random.uniform(-1, 1, (300, 3)), 1)
+        mesh_indices = numpy.random.randint(0, 3, 300)
+        normals = numpy.random.uniform(-1, 1, (300, 3))
+        self.check_seam_normals(coords, mesh_indices, normals)
+
+    def test_empty(self):
+        is_seam, normals_out, num_seams = seam_normals.get_seam_normals(
+            numpy.zeros((0, 3)), numpy.zeros(0), numpy.zeros((0, 3)), 1000)
+        assert_equal(len(is_seam), 0)
+        assert_equal(num_seams, 0)
@@ -0,0 +1,157 @@
+import nose
+from nose.tools import assert_equal, assert_true, raises
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import skin_partition
+
+
+def grid_triangles(size):
+    """The triangles of a size x size grid of quads, row by row."""
+    triangles = []
+    for row in range(size):
+        for col in range(size):
+            v = row * (size + 1) + col
+            triangles.append((v, v + 1, v + size + 2))
+            triangles.append((v, v + size + 2, v + size + 1))
+    return triangles
+
+
+def grid_weights(size, num_bones):
+    """Weights of a grid, blending two bones along every column, so every
+    bone covers a band of columns."""
+    weights = numpy.zeros(((size + 1) ** 2, num_bones))
+    for v in range(len(weights)):
+        x = (v % (size + 1)) * (num_bones - 1) / size
+        bone = min(int(x), num_bones - 2)
+        weights[v, bone] = 1 - (x - bone)
+        weights[v, bone + 1] = x - bone
+    return weights
+
+
+class Test_Skin_Partition:
+
+    def setup(self):
+        skin_partition._cache.clear()
+        self.triangles = grid_triangles(10)
+        self.weights = grid_weights(10, 12)
+
+    def check_partitions(self, partitions, maxbonesperpartition):
+        """Check that the partitions hold every triangle once, with its
+        original weights."""
+        triangles = []
+        for partition in partitions:
+            assert_true(len(set(partition.bones)) <= maxbonesperpartition)
+            vertex_map = partition.vertex_map
+            for tri in partition.triangles:
+                triangles.append(tuple(vertex_map[list(tri)].tolist()))
+            bones = numpy.array(partition.bones)[partition.bone_indices]
+            weights = numpy.zeros((len(vertex_map), self.weights.shape[1]))
+            for i in range(partition.weights.shape[1]):
+                numpy.add.at(weights, (numpy.arange(len(vertex_map)), bones[:, i]),
+                             partition.weights[:, i])
+            assert_true(numpy.allclose(weights, self.weights[vertex_map]))
+        assert_equal(sorted(triangles), sorted(self.triangles))
+
+    def test_limit_bones_per_vertex(self):
+        weights = numpy.array([[0.5, 0.3, 0.2], [0.0, 0.4, 0.6]])
+        lostweight = skin_partition.limit_bones_per_vertex(weights, 2)
+        assert_equal(lostweight, 0.2)
+        assert_true(numpy.allclose(weights, [[0.625, 0.375, 0], [0, 0.4, 0.6]]))
+
+    def test_partitions(self):
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, maxbonesperpartition=4,
+            maxbonespervertex=4, stripify=False)
+        assert_equal(lostweight, 0.0)
+        # as many partitions as pyffi makes
+        assert_equal(len(partitions), 5)
+        self.check_partitions(partitions, 4)
+
+    def test_body_parts(self):
+        trianglepartmap = [0, 1] * (len(self.triangles) // 2)
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, trianglepartmap=trianglepartmap,
+            maxbonesperpartition=18, maxbonespervertex=4, stripify=False)
+        assert_equal([partition.body_part for partition in partitions], [0, 1])
+        self.check_partitions(partitions, 18)
+
+    def test_strips(self):
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, maxbonesperpartition=4,
+            maxbonespervertex=4, stripify=True, stitchstrips=True)
+        for partition in partitions:
+            assert_equal(partition.triangles, None)
+            assert_equal(len(partition.strips), 1)
+
+    def test_pad_bones(self):
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, maxbonesperpartition=4,
+            maxbonespervertex=4, stripify=False, padbones=True)
+        for partition in partitions:
+            assert_equal(len(partition.bones), 4)
+            assert_equal(partition.bone_indices.tolist(),
+                         [[0, 1, 2, 3]] * len(partition.vertex_map))
+        self.check_partitions(partitions, 4)
+
+    def test_bone_sharing(self):
+        trianglepartmap = [0, 1] * (len(self.triangles) // 2)
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, trianglepartmap=trianglepartmap,
+            maxbonesperpartition=18, maxbonespervertex=4, stripify=False,
+            maximize_bone_sharing=True)
+        assert_equal(partitions[0].bones, partitions[1].bones)
+        self.check_partitions(partitions, 18)
+
+    def test_limit_bones_per_triangle(self):
+        # three vertices of three bones each, six bones in all
+        weights = numpy.array([[0.5, 0.3, 0.2, 0, 0, 0],
+                               [0, 0, 0.1, 0.5, 0.4, 0],
+                               [0.7, 0, 0, 0, 0.15, 0.15]])
+        partitions, lostweight = skin_partition.get_skin_partition(
+            [(0, 1, 2)], weights, maxbonesperpartition=4, maxbonespervertex=4,
+            stripify=False)
+        assert_equal(len(partitions), 1)
+        assert_equal(len(partitions[0].bones), 4)
+        assert_true(abs(lostweight - 0.3) < 1e-6)
+        # the weights of every vertex still add up to one
+        assert_true(numpy.allclose(partitions[0].weights.sum(axis=1), 1))
+
+    @raises(ValueError)
+    def test_too_few_bones(self):
+        # every vertex has a single, different bone
+        skin_partition.get_skin_partition(
+            [(0, 1, 2)], numpy.eye(3), maxbonesperpartition=2,
+            maxbonespervertex=2)
+
+    @raises(ValueError)
+    def test_body_parts_count_mismatch(self):
+        # triangles without body part are not dropped silently
+        skin_partition.get_skin_partition(
+            self.triangles, self.weights, trianglepartmap=[0])
+
+    def test_cache(self):
+        args = (self.triangles, self.weights)
+        result = skin_partition.get_skin_partition(*args, stripify=False)
+        assert_true(skin_partition.get_skin_partition(*args, stripify=False) is result)
+        assert_true(skin_partition.get_skin_partition(*args, stripify=True) is not result)
+
+    def test_set_skin_partition(self):
+        partitions, lostweight = skin_partition.get_skin_partition(
+            self.triangles, self.weights, maxbonesperpartition=4,
+            maxbonespervertex=4, stripify=False)
+        n_skinpart = NifFormat.NiSkinPartition()
+        skin_partition.set_skin_partition(n_skinpart, partitions)
+        assert_equal(n_skinpart.num_skin_partition_blocks, len(partitions))
+        for n_block, partition in zip(n_skinpart.skin_partition_blocks, partitions):
+            assert_equal(list(n_block.bones), partition.bones)
+            assert_equal(list(n_block.vertex_map), partition.vertex_map.tolist())
+            assert_equal(n_block.num_triangles, len(partition.triangles))
+            assert_equal([(tri.v_1, tri.v_2, tri.v_3) for tri in n_block.triangles],
+                         partition.triangles)
+            assert_equal([list(indices) for indices in n_block.bone_indices],
+                         partition.bone_indices.tolist())
+            assert_true(numpy.allclose([list(weights) for weights in n_block.vertex_weights],
+                                       partition.weights))
@@ -0,0 +1,116 @@
+import nose
+from nose.tools import assert_equal
+
+import struct
+
+import numpy
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.geometrysys import geometry_data
+from io_scene_nif.geometrysys import tangent_space
+
+
+def bumpy_grid(size):
+    """A grid with random heights and uvs, and a uv seam down the middle,
+    where vertices are duplicated with other uvs."""
+    numpy.random.seed(0)
+    coords = []
+    uvs = []
+    index = {}
+    triangles = []
+    for row in range(size + 1):
+        for col in range(size + 1):
+            for side in ((0, 1) if col == size // 2 else (0,)):
+                index[row, col, side] = len(coords)
+                coords.append((col, row, numpy.random.uniform(-0.3, 0.3)))
+                uvs.append(numpy.random.uniform(0, 1, 2) + side)
+    coords = numpy.array(coords)
+    for (row, col, side), i in index.items():
+        if side:
+            coords[i] = coords[index[row, col, 0]]
+    for row in range(size):
+        for col in range(size):
+            side = 1 if col == size // 2 else 0
+            v0 = index[row, col, side]
+            v1 = index[row, col + 1, 0]
+            v2 = index[row + 1, col + 1, 0]
+            v3 = index[row + 1, col, side]
+            triangles.extend([(v0, v1, v2), (v0, v2, v3)])
+    # smooth normals
+    normals = numpy.zeros_like(coords)
+    for tri in triangles:
+        a, b, c = coords[list(tri)]
+        normals[list(tri)] += numpy.cross(b - a, c - a)
+    for (row, col, side), i in index.items():
+        if side:
+            normals[i] = normals[index[row, col, 0]] = normals[i] + normals[index[row, col, 0]]
+    normals /= numpy.sqrt((normals ** 2).sum(axis=1))[:, None]
+    return coords, normals, numpy.array(uvs), triangles
+
+
+class Test_Tangent_Space:
+
+    def setup(self):
+        self.coords, self.normals, self.uvs, self.triangles = bumpy_grid(6)
+
+    def get_tangent_space(self):
+        groups = tangent_space.get_vertex_groups(self.coords, self.normals, self.uvs[None])
+        return tangent_space.get_tangent_space(
+            self.coords, self.normals, self.uvs, self.triangles, groups)
+
+    def test_groups(self):
+        groups = tangent_space.get_vertex_groups(self.coords, self.normals, self.uvs[None])
+        # the vertices duplicated along the seam are in the same group
+        assert_equal(len(set(groups.tolist())), 7 * 7)
+
+    def test_float_to_int(self):
+        assert_equal(tangent_space.float_to_int([0.4, -0.4, 0.5, -0.5, 0.6, -0.6, float('nan')]).tolist(),
+                     [0, 0, 1, -1, 1, -1, 0])
+
+    def test_base(self):
+        tangents, bitangents = self.get_tangent_space()
+        # tangent, bitangent and normal are orthonormal
+        for vectors in (tangents, bitangents):
+            assert_equal(numpy.allclose((vectors ** 2).sum(axis=1), 1.0), True)
+        assert_equal(numpy.allclose((tangents * bitangents).sum(axis=1), 0.0), True)
+        assert_equal(numpy.allclose((tangents * self.normals).sum(axis=1), 0.0), True)
+        assert_equal(numpy.allclose((bitangents * self.normals).sum(axis=1), 0.0), True)
+
+    def test_pyffi(self):
+        # same result as the tangent space update of pyffi
+        n_block = NifFormat.NiTriShape()
+        n_block.data = NifFormat.NiTriShapeData()
+        geometry_data.set_vertices(n_block.data, self.coords)
+        geometry_data.set_normals(n_block.data, self.normals)
+        geometry_data.set_uv_sets(n_block.data, self.uvs[None])
+        n_block.data.set_triangles(self.triangles)
+        n_block.update_tangent_space(as_extra=False)
+        tangents, bitangents = self.get_tangent_space()
+        assert_equal(numpy.allclose(
+            [(v.x, v.y, v.z) for v in n_block.data.tangents], tangents), True)
+        assert_equal(numpy.allclose(
+            [(v.x, v.y, v.z) for v in n_block.data.bitangents], bitangents), True)
+
+    def test_no_uvs(self):
+        # without uvs any base is picked
+        self.uvs[:] = 0.0
+        tangents, bitangents = self.get_tangent_space()
+        assert_equal(numpy.allclose((tangents * bitangents).sum(axis=1), 0.0), True)
+        assert_equal(numpy.allclose((bitangents ** 2).sum(axis=1), 1.0), True)
+
+    def test_binary_data(self):
+        tangents = numpy.array([(1.0, 0.0, 0.0), (0.0, 1.0, 0.0)])
+        bitangents = numpy.array([(0.0, 0.0, 1.0), (0.5, 0.25, 0.0)])
+        assert_equal(tangent_space.get_binary_data(tangents, bitangents),
+                     struct.pack("<12f", 1, 0, 0, 0, 1, 0, 0, 0, 1, 0.5, 0.25, 0))
+
+    def test_set_tangent_space(self):
+        n_data = NifFormat.NiTriShapeData()
+        geometry_data.set_vertices(n_data, self.coords)
+        geometry_data.set_normals(n_data, self.normals)
+        tangents, bitangents = self.get_tangent_space()
+        geometry_data.set_tangent_space(n_data, tangents, bitangents)
+        assert_equal(n_data.extra_vectors_flags, 16)
+        assert_equal(numpy.array([(v.x, v.y, v.z) for v in n_data.bitangents]).tolist(),
+                     bitangents.tolist())
@@ -0,0 +1,51 @@
+import nose
+from nose.tools import assert_equal
+
+import numpy
+
+from io_scene_nif.geometrysys import topology
+
+
+class Test_Build_Polygons:
+
+    def test_duplicate_triangles(self):
+        # second face is a rotation of the first, fourth has opposite winding
+        polygons = [[0, 1, 2], [1, 2, 0], [2, 3, 0], [0, 2, 1]]
+        f_map, loop_vertices, loop_totals = topology.build_polygons(polygons)
+        assert_equal(list(f_map), [0, -1, 1, 2])
+        assert_equal(list(loop_vertices), [0, 1, 2, 2, 3, 0, 0, 2, 1])
+        assert_equal(list(loop_totals), [3, 3, 3])
+
+    def test_degenerate_triangles(self):
+        polygons = [[0, 0, 1], [0, 1, 2], [3, 4, 3]]
+        f_map, loop_vertices, loop_totals = topology.build_polygons(polygons)
+        assert_equal(list(f_map), [-1, 0, -1])
+        assert_equal(list(loop_vertices), [0, 1, 2])
+
+    def test_vertex_map(self):
+        # vertices 0 and 3 are welded, which makes the faces duplicates
+        polygons = [[0, 1, 2], [3, 1, 2], [1, 2, 4]]
+        v_map = [0, 1, 2, 0, 3]
+        f_map, loop_vertices, loop_totals = topology.build_polygons(polygons, v_map)
+        assert_equal(list(f_map), [0, -1, 1])
+        assert_equal(list(loop_vertices), [0, 1, 2, 1, 2, 3])
+
+    def test_mixed_polygons(self):
+        polygons = [[0, 1, 3, 2], [6, 7, 5, 4], [3, 2, 0, 1], [4, 5, 6], [5, 5, 6]]
+        f_map, loop_vertices, loop_totals = topology.build_polygons(polygons)
+        assert_equal(list(f_map), [0, 1, -1, 2, -1])
+        assert_equal(list(loop_vertices), [0, 1, 3, 2, 6, 7, 5, 4, 4, 5, 6])
+        assert_equal(list(loop_totals), [4, 4, 3])
+
+    def test_matches_mixed_implementation(self):
+        numpy.random.seed(0)
+        polygons = numpy.random.randint(0, 8, (500, 3)).tolist()
+        expected = topology._build_mixed_polygons(polygons, None)
+        result = topology.build_polygons(polygons)
+        for expected_array, result_array in zip(expected, result):
+            assert_equal(list(expected_array), list(result_array))
+
+    def test_no_polygons(self):
+        f_map, loop_vertices, loop_totals = topology.build_polygons([])
+        assert_equal(len(f_map), 0)
+        assert_equal(len(loop_totals), 0)
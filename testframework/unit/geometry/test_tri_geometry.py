@@ -0,0 +1,172 @@
+import nose
+from nose.tools import assert_equal, assert_true
+
+import numpy
+
+from io_scene_nif.geometrysys import skin_partition
+from io_scene_nif.geometrysys.geometry_pool import GeometryPool
+from io_scene_nif.geometrysys.mesh_partition import MeshSlice
+from io_scene_nif.geometrysys.tri_geometry import build_tri_geometry
+
+
+class MockMesh:
+    """The mesh arrays of a quad split into two smooth triangles, with a
+    uv seam along vertices 0 and 2, and an unused vertex 4."""
+
+    loop_vertices = [[0, 1, 2], [0, 2, 3]]
+    vertex_coords = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0], [2.0, 2.0, 0.0]]
+    vertex_normals = [[0.0, 0.0, 1.0]] * 5
+    uvs = [[[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]], [[0.5, 0.0], [1.0, 1.0], [0.0, 1.0]]]
+
+    @classmethod
+    def get_slice(cls, polygons):
+        return MeshSlice(polygons, [3] * len(polygons), [True] * len(polygons),
+                         [[0.0, 0.0, 1.0]] * len(polygons),
+                         [v for poly in polygons for v in cls.loop_vertices[poly]],
+                         cls.vertex_coords, cls.vertex_normals,
+                         [[uv for poly in polygons for uv in cls.uvs[poly]]])
+
+
+def get_cached_keys():
+    return list(skin_partition._cache)
+
+
+def build(polygons=(0, 1), flip=False, bodypartgroups=None, optimize_cache=False, **kwargs):
+    return build_tri_geometry(MockMesh.get_slice(polygons), True, True, 0.0005,
+                              flip, bodypartgroups, optimize_cache, **kwargs)
+
+
+class Test_Tri_Geometry:
+
+    def test_build(self):
+        geometry = build()
+        # vertex 0 is split along the seam, vertex 2 is shared
+        assert_equal(geometry.trilist, [(0, 1, 2), (3, 2, 4)])
+        assert_equal(geometry.vertlist,
+                     [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+        assert_equal(geometry.uvlist, [[[0.0, 0.0]], [[1.0, 0.0]], [[1.0, 1.0]], [[0.5, 0.0]], [[0.0, 1.0]]])
+        assert_equal(geometry.vertmap, [[0, 3], [1], [2], [4], None])
+        assert_equal(geometry.bodypartfacemap, [0, 0])
+
+    def test_flip(self):
+        assert_equal(build(polygons=[0], flip=True).trilist, [(0, 2, 1)])
+
+    def test_bodyparts(self):
+        geometry = build(bodypartgroups=[["SBP_32_BODY", 32, {0, 1, 2}]])
+        assert_equal(geometry.bodypartfacemap, [32])
+        assert_equal(geometry.polygons_without_bodypart, [1])
+        # polygons are reported by their index in the mesh, not the slice
+        geometry = build(polygons=[1], bodypartgroups=[["SBP_32_BODY", 32, {0, 1, 2}]])
+        assert_equal(geometry.polygons_without_bodypart, [1])
+
+    def test_bodyparts_missing(self):
+        # the export fails, so nothing is computed after the triangles
+        geometry = build(bodypartgroups=[["SBP_32_BODY", 32, {0, 1, 2}]],
+                         stripify=True, bone_weights=[(numpy.array([0]), numpy.array([1.0]))],
+                         partition_args=dict(stripify=False))
+        assert_equal(len(geometry.trilist), 2)
+        assert_equal(geometry.radius, None)
+        assert_equal(geometry.strips, None)
+        assert_equal(geometry.partitions, None)
+
+    def test_optimize_vertex_cache(self):
+        bodypartgroups = [["SBP_32_BODY", 32, {0, 1, 2}], ["SBP_34_FOREARMS", 34, {0, 2, 3}]]
+        geometry = build(bodypartgroups=bodypartgroups)
+        optimized = build(bodypartgroups=bodypartgroups, optimize_cache=True)
+        assert_equal(len(optimized.acmr), 2)
+        # the same triangles, with the same body parts and vertices
+        def get_triangles(geometry):
+            return sorted(
+                (bodypart, [(tuple(geometry.vertlist[i]), tuple(geometry.uvlist[i][0])) for i in tri])
+                for tri, bodypart in zip(geometry.trilist, geometry.bodypartfacemap))
+        assert_equal(get_triangles(optimized), get_triangles(geometry))
+        # vertices are numbered in order of first use, and the vertex map
+        # follows
+        assert_equal(sorted(i for tri in optimized.trilist for i in tri)[-1], 4)
+        assert_equal([i for i in optimized.trilist[0]], [0, 1, 2])
+        for b_v_index, vert_indices in enumerate(optimized.vertmap):
+            for i in vert_indices or ():
+                assert_equal(optimized.vertlist[i], MockMesh.vertex_coords[b_v_index])
+
+    def test_uv_sets(self):
+        geometry = build()
+        # one uv set, with v flipped
+        assert_equal(geometry.uv_sets.tolist(),
+                     [[[0.0, 1.0], [1.0, 1.0], [1.0, 0.0], [0.5, 1.0], [0.0, 0.0]]])
+        assert_equal(geometry.tangents, None)
+        assert_equal(geometry.strips, None)
+        assert_equal(geometry.skin_bones, None)
+
+    def test_tangent_space(self):
+        geometry = build(has_tangent_space=True)
+        assert_equal(numpy.shape(geometry.tangents), (5, 3))
+        assert_equal(numpy.shape(geometry.bitangents), (5, 3))
+
+    def test_strips(self):
+        geometry = build(stripify=True, stitchstrips=True)
+        assert_equal(len(geometry.strips), 1)
+        assert_true(geometry.num_strips >= 1)
+
+    def test_skin(self):
+        bone_weights = [
+            (numpy.array([0, 1]), numpy.array([1.0, 0.5])),
+            (numpy.array([1, 2, 3]), numpy.array([0.5, 1.0, 1.0])),
+            # only on the unused vertex
+            (numpy.array([4]), numpy.array([1.0]))]
+        geometry = build(bone_weights=bone_weights, partition_args=dict(stripify=False))
+        assert_equal(geometry.skin_bones, [0, 1])
+        assert_equal(geometry.skin_vertices, [[0, 1, 3], [1, 2, 4]])
+        assert_equal(geometry.skin_weights.tolist(),
+                     [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0], [1.0, 0.0], [0.0, 1.0]])
+        assert_equal(len(geometry.skin_spheres), 2)
+        assert_equal(len(geometry.partitions), 1)
+        assert_equal(geometry.lostweight, 0.0)
+
+    def test_pool(self):
+        # results are finished in submission order, with or without workers
+        for processes in (0, 2):
+            pool = GeometryPool(processes)
+            try:
+                results = []
+                for polygons in ([0], [1], [0, 1]):
+                    pool.submit(build_tri_geometry,
+                                (MockMesh.get_slice(polygons), True, True, 0.0005, False, None),
+                                lambda geometry: results.append(geometry.trilist))
+                pool.finish()
+                assert_equal(results, [[(0, 1, 2)], [(0, 1, 2)], [(0, 1, 2), (3, 2, 4)]])
+            finally:
+                pool.shutdown()
+
+    def test_pool_skin_cache(self):
+        # partitions computed on a worker are cached on the main thread,
+        # and workers forked later find them
+        bone_weights = [(numpy.array([0, 1, 2, 3]), numpy.array([1.0, 1.0, 1.0, 1.0]))]
+        args = (MockMesh.get_slice([0, 1]), True, True, 0.0005, False, None, False, False,
+                False, False, bone_weights, dict(stripify=False))
+        skin_partition._cache.clear()
+        for export in range(2):
+            pool = GeometryPool(2)
+            try:
+                results = []
+                pool.submit(get_cached_keys, (), results.append)
+                pool.submit(build_tri_geometry, args, results.append)
+                pool.finish()
+            finally:
+                pool.shutdown()
+            cached_keys, geometry = results
+            geometry.cache_skin_partition()
+            assert_equal(list(skin_partition._cache), [geometry.partition_key])
+        assert_equal(cached_keys, [geometry.partition_key])
+
+    def test_pool_lazy(self):
+        # worker processes are only started by the first job
+        pool = GeometryPool(2)
+        try:
+            assert_equal(pool.pool, None)
+            pool.submit(build_tri_geometry,
+                        (MockMesh.get_slice([0]), True, True, 0.0005, False, None),
+                        lambda geometry: None)
+            assert_equal(pool.pool is not None, pool.has_workers())
+            pool.finish()
+        finally:
+            pool.shutdown()
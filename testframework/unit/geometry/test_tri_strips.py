@@ -0,0 +1,77 @@
+import nose
+from nose.tools import assert_equal
+
+import random
+
+from pyffi.utils.tristrip import triangulate
+
+from io_scene_nif.geometrysys import tri_strips
+
+
+def grid_triangles(size):
+    """The triangles of a size x size grid of quads, row by row."""
+    triangles = []
+    for row in range(size):
+        for col in range(size):
+            v = row * (size + 1) + col
+            triangles.append((v, v + 1, v + size + 2))
+            triangles.append((v, v + size + 2, v + size + 1))
+    return triangles
+
+
+def get_faces(triangles):
+    """The triangles, rotated to start with their lowest vertex, so triangles
+    with the same winding compare equal."""
+    faces = []
+    for tri in triangles:
+        i = tri.index(min(tri))
+        faces.append(tuple(tri[i:]) + tuple(tri[:i]))
+    return sorted(faces)
+
+
+class Test_Tri_Strips:
+
+    def check_strips(self, triangles, stitchstrips):
+        strips = tri_strips.stripify(triangles, stitchstrips=stitchstrips)
+        if stitchstrips:
+            assert_equal(len(strips), 1)
+        assert_equal(get_faces(triangulate(strips)), get_faces(triangles))
+        return strips
+
+    def test_adjacency(self):
+        # two triangles sharing the edge 1-2
+        assert_equal(tri_strips.get_adjacency([(0, 1, 2), (2, 1, 3)]).tolist(),
+                     [-1, 3, -1, 1, -1, -1])
+
+    def test_single_strip(self):
+        strips = self.check_strips([(0, 1, 2), (2, 1, 3), (2, 3, 4), (4, 3, 5)], False)
+        assert_equal(strips, [[0, 1, 2, 3, 4, 5]])
+
+    def test_grid(self):
+        triangles = grid_triangles(20)
+        strips = self.check_strips(triangles, False)
+        # every row of quads is a single strip
+        assert_equal(len(strips), 20)
+        self.check_strips(triangles, True)
+
+    def test_shuffled(self):
+        triangles = grid_triangles(20)
+        random.seed(0)
+        random.shuffle(triangles)
+        self.check_strips(triangles, False)
+        self.check_strips(triangles, True)
+
+    def test_degenerate(self):
+        assert_equal(tri_strips.stripify([(0, 1, 2), (3, 3, 4)]), [[0, 1, 2]])
+
+    def test_empty(self):
+        assert_equal(tri_strips.stripify([]), [])
+        assert_equal(tri_strips.stripify([], stitchstrips=True), [])
+
+    def test_stitch(self):
+        # the second strip starts at an even position in both cases
+        assert_equal(tri_strips.stitch_strips([[0, 1, 2, 3], [4, 5, 6]]),
+                     [0, 1, 2, 3, 3, 4, 4, 5, 6])
+        assert_equal(tri_strips.stitch_strips([[0, 1, 2], [4, 5, 6]]),
+                     [0, 1, 2, 2, 4, 4, 4, 5, 6])
+        assert_equal(tri_strips.get_num_degenerates([[0, 1, 2, 3, 3, 4, 4, 5, 6]]), 4)
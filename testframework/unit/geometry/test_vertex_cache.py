@@ -0,0 +1,49 @@
+import nose
+from nose.tools import assert_equal
+
+import random
+
+from io_scene_nif.geometrysys import vertex_cache
+
+
+def grid_triangles(size):
+    """The triangles of a size x size grid of quads, row by row."""
+    triangles = []
+    for row in range(size):
+        for col in range(size):
+            v = row * (size + 1) + col
+            triangles.append((v, v + 1, v + size + 2))
+            triangles.append((v, v + size + 2, v + size + 1))
+    return triangles
+
+
+class Test_Vertex_Cache:
+
+    def test_acmr(self):
+        assert_equal(vertex_cache.get_acmr([]), 0.0)
+        assert_equal(vertex_cache.get_acmr([(0, 1, 2), (0, 2, 3)]), 2.0)
+        # vertex 0 is evicted from a cache of three vertices
+        assert_equal(vertex_cache.get_acmr([(0, 1, 2), (2, 1, 3), (3, 1, 0)], 3), 5 / 3)
+
+    def test_triangle_order(self):
+        triangles = grid_triangles(40)
+        random.seed(0)
+        random.shuffle(triangles)
+        order = vertex_cache.get_triangle_order(triangles, 41 * 41)
+        assert_equal(sorted(order), list(range(len(triangles))))
+        acmr_before = vertex_cache.get_acmr(triangles)
+        acmr_after = vertex_cache.get_acmr([triangles[i] for i in order])
+        assert_equal(acmr_after < 0.8, True)
+        assert_equal(acmr_after < acmr_before / 2, True)
+
+    def test_triangle_order_disconnected(self):
+        # two separate triangles, and an unused vertex
+        order = vertex_cache.get_triangle_order([(0, 1, 2), (4, 5, 6)], 7)
+        assert_equal(sorted(order), [0, 1])
+
+    def test_triangle_order_empty(self):
+        assert_equal(vertex_cache.get_triangle_order([], 0), [])
+
+    def test_vertex_order(self):
+        assert_equal(vertex_cache.get_vertex_order([(3, 1, 0), (0, 1, 4)], 6),
+                     [3, 1, 0, 4, 2, 5])
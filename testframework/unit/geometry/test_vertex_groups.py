@@ -0,0 +1,44 @@
+import nose
+from nose.tools import assert_equal
+
+from io_scene_nif.geometrysys import vertex_groups
+
+
+class Test_Group_Weights:
+
+    def test_group_weights(self):
+        groups = vertex_groups.group_weights([0, 1, 2, 3, 4], [0.5, 1.0, 0.5, 0.25, 1.0])
+        assert_equal(groups, [(0.25, [3]), (0.5, [0, 2]), (1.0, [1, 4])])
+
+    def test_last_weight_wins(self):
+        # vertex 1 is listed twice, as happens when NIF vertices are welded
+        groups = vertex_groups.group_weights([1, 0, 1], [0.5, 0.5, 1.0])
+        assert_equal(groups, [(0.5, [0]), (1.0, [1])])
+
+    def test_no_weights(self):
+        assert_equal(vertex_groups.group_weights([], []), [])
+
+
+class Test_Vertex_Group_Weights:
+
+    @classmethod
+    def setup_class(cls):
+        # vertex 2 is in no group, vertex 3 only in group 2
+        cls.weights = vertex_groups.VertexGroupWeights(
+            [[(0, 0.5), (1, 0.5)], [(0, 1.0)], [], [(2, 0.25)]])
+
+    def test_get_weights(self):
+        vertices, weights = self.weights.get_weights(0)
+        assert_equal(vertices.tolist(), [0, 1])
+        assert_equal(weights.tolist(), [0.5, 1.0])
+
+    def test_get_vertices(self):
+        assert_equal(self.weights.get_vertices(1), {0})
+        assert_equal(self.weights.get_vertices(3), set())
+
+    def test_get_unweighted(self):
+        assert_equal(self.weights.get_unweighted().tolist(), [2])
+
+    def test_get_norms(self):
+        assert_equal(self.weights.get_norms([0, 1]).tolist(), [1.0, 1.0, 0.0, 0.0])
+        assert_equal(self.weights.get_norms([2]).tolist(), [0.0, 0.0, 0.0, 0.25])
@@ -0,0 +1,121 @@
+import random
+
+import nose
+from nose.tools import assert_equal
+
+import numpy
+
+from io_scene_nif.geometrysys.vertex_hash import VertexHash, find_vertices
+
+
+def linear_scan(quads, epsilon):
+    """Reference implementation: scan all vertices added so far."""
+    vertmap = {}
+    result = []
+    num_added = 0
+    for vertex_index, attributes in quads:
+        found = None
+        for j, other in vertmap.get(vertex_index, []):
+            if all(abs(a - b) <= epsilon for a, b in zip(attributes, other)):
+                found = j
+                break
+        if found is None:
+            found = num_added
+            vertmap.setdefault(vertex_index, []).append((found, attributes))
+            num_added += 1
+        result.append(found)
+    return result
+
+
+def hash_scan(quads, epsilon):
+    vertex_hash = VertexHash(epsilon)
+    result = []
+    num_added = 0
+    for vertex_index, attributes in quads:
+        found = vertex_hash.find(vertex_index, attributes)
+        if found is None:
+            found = num_added
+            vertex_hash.add(vertex_index, attributes, found)
+            num_added += 1
+        result.append(found)
+    return result
+
+
+def batch_scan(quads, epsilon):
+    indices, added = find_vertices(
+        [vertex_index for vertex_index, attributes in quads],
+        [attributes for vertex_index, attributes in quads], epsilon)
+    # every vertex is added by the first row that has it
+    assert_equal(indices[added].tolist(), list(range(len(added))))
+    assert_equal(added.tolist(), sorted(added.tolist()))
+    return indices.tolist()
+
+
+class TestVertexHash:
+
+    def test_find(self):
+        vertex_hash = VertexHash(0.01)
+        vertex_hash.add(0, (0.5, 0.5), 0)
+        assert_equal(vertex_hash.find(0, (0.505, 0.495)), 0)
+        assert_equal(vertex_hash.find(0, (0.52, 0.5)), None)
+        # other blender vertex
+        assert_equal(vertex_hash.find(1, (0.5, 0.5)), None)
+
+    def test_cell_border(self):
+        # 0.5 is a cell border for epsilon 0.01
+        vertex_hash = VertexHash(0.01)
+        vertex_hash.add(0, (0.497,), 0)
+        assert_equal(vertex_hash.find(0, (0.503,)), 0)
+
+    def test_first_match_wins(self):
+        vertex_hash = VertexHash(0.01)
+        vertex_hash.add(0, (0.492,), 0)
+        vertex_hash.add(0, (0.508,), 1)
+        # both match, in different cells
+        assert_equal(vertex_hash.find(0, (0.5,)), 0)
+
+    def test_common_values(self):
+        # 0.0, 0.5 and 1.0 are far from the cell borders
+        vertex_hash = VertexHash(0.0005)
+        for value in (0.0, 0.5, 1.0, -1.0):
+            assert_equal(len(vertex_hash.get_cells((value,))), 1)
+
+    def test_exact(self):
+        vertex_hash = VertexHash(0.0)
+        vertex_hash.add(0, (0.25, 1.0), 0)
+        assert_equal(vertex_hash.find(0, (0.25, 1.0)), 0)
+        assert_equal(vertex_hash.find(0, (0.25, 0.999)), None)
+
+    def test_random(self):
+        rand = random.Random(0)
+        epsilon = 0.01
+        quads = [(rand.randrange(20),
+                  # around the cell border at 0.5
+                  tuple(0.479 + rand.randrange(8) * 0.007 for _ in range(5)))
+                 for _ in range(2000)]
+        assert_equal(hash_scan(quads, epsilon), linear_scan(quads, epsilon))
+        assert_equal(batch_scan(quads, epsilon), linear_scan(quads, epsilon))
+
+    def test_random_sparse(self):
+        # mostly rows alone in their cell, some repeated or close
+        rand = random.Random(1)
+        epsilon = 0.01
+        quads = []
+        for _ in range(2000):
+            if quads and rand.random() < 0.3:
+                vertex_index, attributes = rand.choice(quads)
+                quads.append((vertex_index, tuple(
+                    value + rand.choice((0.0, 0.006, -0.012)) for value in attributes)))
+            else:
+                quads.append((rand.randrange(50), tuple(rand.uniform(-1, 1) for _ in range(3))))
+        assert_equal(batch_scan(quads, epsilon), linear_scan(quads, epsilon))
+
+    def test_find_vertices_no_attributes(self):
+        indices, added = find_vertices([3, 1, 3], numpy.zeros((3, 0)), 0.01)
+        assert_equal(indices.tolist(), [0, 1, 0])
+        assert_equal(added.tolist(), [0, 1])
+
+    def test_find_vertices_empty(self):
+        indices, added = find_vertices([], [], 0.01)
+        assert_equal(indices.tolist(), [])
+        assert_equal(added.tolist(), [])
@@ -0,0 +1,67 @@
+import nose
+from nose.tools import assert_equal
+
+import numpy
+
+from io_scene_nif.geometrysys import vertex_weld
+
+
+def reference_weld(coords, normals, vertex_resolution, normal_resolution):
+    """Per vertex dictionary based welding, as done by the original importer."""
+    n_map = {}
+    v_map = []
+    unique = []
+    for i, v in enumerate(coords):
+        k = tuple(int(x * vertex_resolution) for x in v)
+        if normals is not None:
+            k += tuple(int(x * normal_resolution) for x in normals[i])
+        if k not in n_map:
+            n_map[k] = len(unique)
+            unique.append(i)
+        v_map.append(n_map[k])
+    return v_map, unique
+
+
+class Test_Vertex_Weld:
+
+    def check_weld(self, coords, normals):
+        v_map, unique = vertex_weld.weld_vertices(coords, normals, 1000, 100)
+        ref_v_map, ref_unique = reference_weld(coords, normals, 1000, 100)
+        assert_equal(list(v_map), ref_v_map)
+        assert_equal(list(unique), ref_unique)
+
+    def test_weld_with_normals(self):
+        coords = numpy.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0),
+                              (0.0, 0.0, 0.0), (1.0004, 0.0, 0.0),
+                              (0.0, 0.0, 0.0)])
+        normals = numpy.array([(0.0, 0.0, 1.0), (0.0, 0.0, 1.0),
+                               (0.0, 0.0, 1.0), (0.0, 0.0, 1.0),
+                               (0.0, 1.0, 0.0)])
+        self.check_weld(coords, normals)
+
+    def test_weld_without_normals(self):
+        coords = numpy.array([(0.5, 0.5, 0.5), (0.0, 0.0, 0.0),
+                              (0.5, 0.5, 0.5), (0.0, 0.0, 0.0)])
+        self.check_weld(coords, None)
+
+    def test_weld_truncates_towards_zero(self):
+        # -0.0004 and 0.0004 both truncate to 0, -0.0014 to -1
+        coords = numpy.array([(-0.0004, 0.0, 0.0), (0.0004, 0.0, 0.0),
+                              (-0.0014, 0.0, 0.0), (-0.001, 0.0, 0.0)])
+        self.check_weld(coords, None)
+
+    def test_weld_random(self):
+        numpy.random.seed(0)
+        coords = numpy.round(numpy.random.uniform(-2, 2, (500, 3)), 1)
+        normals = numpy.round(numpy.random.uniform(-1, 1, (500, 3)))
+        self.check_weld(coords, normals)
+
+    def test_weld_empty(self):
+        v_map, unique = vertex_weld.weld_vertices(numpy.zeros((0, 3)), None, 1000, 100)
+        assert_equal(len(v_map), 0)
+        assert_equal(len(unique), 0)
+
+    def test_inverse_map(self):
+        # the last vertex mapped to a welded vertex wins, unmapped ones get -1
+        inverse = vertex_weld.inverse_map([0, 1, 0, 2, 1], 4)
+        assert_equal(list(inverse), [2, 4, 3, -1])
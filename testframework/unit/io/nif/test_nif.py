@@ -3,8 +3,11 @@ import nose
 import bpy
 import os
 
-from io_scene_nif.io.nif import NifFile
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.io.nif import NifFile, _SelectiveReader
 from io_scene_nif.utility.nif_logging import NifLog
+from io_scene_nif.utility.nif_utils import NifError
 
 class Test_Nif_IO:
  
@@ -23,3 +26,32 @@ class Test_Nif_IO:
     @nose.tools.raises(Exception)
     def test_load_unsupported_file(self):
         NifFile.load_nif(self.working_dir + os.sep + "notnif.txt")
+
+    def test_load_selective_all(self):
+        data = NifFile.load_nif_selective(self.working_dir + os.sep + "selectable.nif")
+        nose.tools.assert_equal(len(data.blocks), 5)
+        nose.tools.assert_equal(len(data.roots[0].children[1].data.vertices), 3)
+
+    def test_load_selective_skip_types(self):
+        data = NifFile.load_nif_selective(self.working_dir + os.sep + "selectable.nif",
+                                          skip_types=(NifFormat.NiGeometryData,))
+        # the shape data block is linked, but not read
+        nose.tools.assert_equal(len(data.roots[0].children[1].data.vertices), 0)
+
+    def test_load_selective_names(self):
+        data = NifFile.load_nif_selective(self.working_dir + os.sep + "selectable.nif", names={"Body"})
+        nose.tools.assert_equal([root.name for root in data.roots], [b"Body"])
+        nose.tools.assert_equal(len(data.blocks), 2)
+
+    def test_load_selective_old_version(self):
+        # no block sizes: the whole file is read, and the roots selected
+        data = NifFile.load_nif_selective(self.working_dir + os.sep + "readable.nif", names=set())
+        nose.tools.assert_equal(data.roots, [])
+
+    @nose.tools.raises(NifError)
+    def test_selective_invalid_block_index(self):
+        with open(self.working_dir + os.sep + "selectable.nif", "rb") as nif_stream:
+            data = NifFormat.Data()
+            data.inspect_version_only(nif_stream)
+            data.header.read(nif_stream, data=data)
+            _SelectiveReader(data, nif_stream, ()).create_block(data.header.num_blocks)
@@ -0,0 +1,70 @@
+import nose
+
+import os
+import threading
+
+from io_scene_nif.io.loader import FileLoader
+from io_scene_nif.io.nif import NifFile
+from io_scene_nif.utility.nif_logging import NifLog
+
+
+class _RecordingOperator():
+    def __init__(self):
+        self.messages = []
+
+    def report(self, level, message):
+        self.messages.append(message)
+
+
+class Test_File_Loader:
+
+    @classmethod
+    def setup_class(cls):
+        cls.working_dir = os.path.join(os.path.dirname(__file__), "nif")
+
+    def setup(self):
+        self.op = NifLog.op
+        NifLog.op = _RecordingOperator()
+
+    def teardown(self):
+        NifLog.op = self.op
+
+    def test_load_concurrently(self):
+        with FileLoader() as loader:
+            future1 = loader.submit(NifFile.load_nif, self.working_dir + os.sep + "readable.nif")
+            future2 = loader.submit(NifFile.load_nif, self.working_dir + os.sep + "readable.nif")
+            nose.tools.assert_equal(loader.result(future1).version, 335544325)
+            nose.tools.assert_equal(loader.result(future2).version, 335544325)
+        # messages logged by the workers reach the operator
+        nose.tools.assert_true("Reading file" in NifLog.op.messages)
+
+    @nose.tools.raises(Exception)
+    def test_load_error(self):
+        with FileLoader() as loader:
+            future = loader.submit(NifFile.load_nif, self.working_dir + os.sep + "notnif.txt")
+            loader.result(future)
+
+    def test_no_file(self):
+        with FileLoader() as loader:
+            nose.tools.assert_equal(loader.result(None), None)
+
+    def test_shutdown_without_wait(self):
+        # once an import failed, loads which have not started are dropped
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            started.set()
+            release.wait()
+
+        loader = FileLoader(max_workers=1)
+        try:
+            running = loader.submit(load)
+            pending = loader.submit(NifFile.load_nif, self.working_dir + os.sep + "readable.nif")
+            started.wait()
+            loader.shutdown(wait=False)
+            nose.tools.assert_true(pending.cancelled())
+            nose.tools.assert_false(running.done())
+        finally:
+            # never leave the worker blocked
+            release.set()
@@ -0,0 +1,104 @@
+import nose
+from nose.tools import assert_equal, raises
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.objectsys.object_export import ObjectHelper
+from io_scene_nif.utility import nif_utils
+
+
+class MockExport:
+    """Holds the export dictionaries which the object helper fills in."""
+
+    def __init__(self):
+        self.dict_blocks = {}
+        self.dict_blocks_by_type = {}
+        self.dict_nodes_by_name = {}
+        self.unnamed_nodes = {}
+        self.dict_node_keys = {}
+        self.block_counter = 0
+
+
+class Test_Block_Registry:
+
+    def setup(self):
+        self.objecthelper = ObjectHelper(MockExport())
+
+    def test_type_index(self):
+        n_node = self.objecthelper.create_block("NiNode")
+        n_shape = self.objecthelper.create_block("NiTriShape")
+        assert_equal(self.objecthelper.nif_export.dict_blocks_by_type,
+                     {NifFormat.NiNode: [n_node], NifFormat.NiTriShape: [n_shape]})
+
+    def test_named_nodes(self):
+        n_root = self.objecthelper.create_block("NiNode")
+        n_bone = self.objecthelper.create_block("NiNode")
+        # nodes are named after they are registered
+        n_root.name = b"Scene Root"
+        assert_equal(self.objecthelper.get_named_node("Bip01"), None)
+        n_bone.name = b"Bip01"
+        assert_equal(self.objecthelper.get_named_node("Bip01"), n_bone)
+        assert_equal(self.objecthelper.get_named_nodes("Scene Root"), [n_root])
+
+    def test_named_nodes_order(self):
+        n_first = self.objecthelper.create_block("NiNode")
+        n_second = self.objecthelper.create_block("NiNode")
+        n_second.name = b"Bip01"
+        self.objecthelper.get_named_nodes("Bip01")
+        n_first.name = b"Bip01"
+        assert_equal(self.objecthelper.get_named_nodes("Bip01"), [n_first, n_second])
+
+    @raises(nif_utils.NifError)
+    def test_multiple_names(self):
+        for i in range(2):
+            self.objecthelper.create_block("NiNode").name = b"Bip01"
+        self.objecthelper.get_named_node("Bip01")
+
+    def test_get_blocks(self):
+        n_node = self.objecthelper.create_block("NiNode")
+        n_anim_node = self.objecthelper.create_block("NiBSAnimationNode")
+        self.objecthelper.create_block("NiTriShape")
+        assert_equal(self.objecthelper.get_blocks(NifFormat.NiBSAnimationNode), [n_anim_node])
+        assert_equal(set(self.objecthelper.get_blocks(NifFormat.NiNode)), {n_node, n_anim_node})
+
+    def test_replace_block(self):
+        n_root = self.objecthelper.create_block("NiNode")
+        n_node = self.objecthelper.create_block("NiNode", "b_obj")
+        n_node.name = b"Bip01"
+        n_root.add_child(n_node)
+        n_anim_node = NifFormat.NiBSAnimationNode().deepcopy(n_node)
+        self.objecthelper.replace_block(n_root, n_node, n_anim_node)
+        assert_equal(n_root.children[0], n_anim_node)
+        assert_equal(self.objecthelper.nif_export.dict_blocks, {n_root: None, n_anim_node: "b_obj"})
+        assert_equal(self.objecthelper.get_blocks(NifFormat.NiBSAnimationNode), [n_anim_node])
+        assert_equal(self.objecthelper.get_named_nodes("Bip01"), [n_anim_node])
+
+    def test_replace_block_order(self):
+        n_root = self.objecthelper.create_block("NiNode")
+        n_first = self.objecthelper.create_block("NiNode")
+        n_second = self.objecthelper.create_block("NiNode")
+        n_root.add_child(n_first)
+        n_root.add_child(n_second)
+        n_first.name = b"Bip01"
+        n_second.name = b"Bip01"
+        self.objecthelper.get_named_nodes("Bip01")
+        # the replacement keeps the place of the first node
+        n_anim_node = NifFormat.NiBSAnimationNode().deepcopy(n_first)
+        self.objecthelper.replace_block(n_root, n_first, n_anim_node)
+        self.objecthelper.create_block("NiNode").name = b"Bip01"
+        assert_equal(self.objecthelper.get_named_nodes("Bip01")[:2], [n_anim_node, n_second])
+
+    def test_unregister_block(self):
+        n_first = self.objecthelper.create_block("NiNode")
+        n_second = self.objecthelper.create_block("NiNode")
+        n_first.name = b"Bip01"
+        self.objecthelper.get_named_nodes("Bip01")
+        assert_equal(self.objecthelper.get_node_order(n_first), 0)
+        assert_equal(self.objecthelper.get_node_order(n_second), 1)
+        # named and unnamed nodes leave every index
+        for n_node in (n_first, n_second):
+            self.objecthelper.unregister_block(n_node)
+            assert_equal(self.objecthelper.get_node_order(n_node), None)
+        assert_equal(self.objecthelper.nif_export.dict_node_keys, {})
+        assert_equal(self.objecthelper.nif_export.unnamed_nodes, {})
+        assert_equal(self.objecthelper.get_named_nodes("Bip01"), [])
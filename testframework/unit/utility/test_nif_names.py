@@ -0,0 +1,41 @@
+import random
+
+import nose
+from nose.tools import assert_equal
+
+from io_scene_nif.utility.nif_names import NameRegistry
+
+
+def get_unique_name_scan(names, name):
+    """Reference implementation: probe suffixes from 0 against a list."""
+    unique_name = name
+    unique_int = 0
+    while unique_name in names:
+        unique_name = "%s.%02d" % (name, unique_int)
+        unique_int += 1
+    names.append(unique_name)
+    return unique_name
+
+
+class Test_Name_Registry:
+
+    def test_unique_name(self):
+        registry = NameRegistry()
+        assert_equal(registry.get_unique_name("Bip01"), "Bip01")
+        assert_equal(registry.get_unique_name("Bip01"), "Bip01.00")
+        assert_equal(registry.get_unique_name("Bip01"), "Bip01.01")
+        assert_equal(registry.get_unique_name("Bip01.00"), "Bip01.00.00")
+
+    def test_taken_suffix(self):
+        # names recovered from a previous import take suffixes too
+        registry = NameRegistry(["Tri Body", "Tri Body.01"])
+        assert_equal(registry.get_unique_name("Tri Body"), "Tri Body.00")
+        assert_equal(registry.get_unique_name("Tri Body"), "Tri Body.02")
+
+    def test_random(self):
+        rand = random.Random(0)
+        registry = NameRegistry()
+        names = []
+        for _ in range(1000):
+            name = rand.choice(["a", "b", "a.00", "a.01", "b.00.00", "b.00"])
+            assert_equal(registry.get_unique_name(name), get_unique_name_scan(names, name))